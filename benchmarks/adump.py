@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+
+"""Benchmark of dumping in the shared thread pool: the longest stall of a caller loop, e.g. an
+event loop which ticks every millisecond, while a large document is dumped by :func:`lazyxml.dumps`
+in the caller against :func:`lazyxml.adump` to a writer with ``drain()``.
+
+Run with ``python -m benchmarks.adump``.
+"""
+
+import os
+import time
+
+from .common import report
+
+import lazyxml
+
+
+def rows(count):
+    for i in xrange(count):
+        yield {'id': str(i), 'name': 'item-{}'.format(i), 'price': '{}.5'.format(i % 1000)}
+
+
+class Writer(object):
+    """A writer of /dev/null whose ``drain()`` flushes the buffer."""
+
+    def __init__(self, fp):
+        self.fp = fp
+
+    def write(self, chunk):
+        self.fp.write(chunk)
+
+    def drain(self):
+        self.fp.flush()
+
+
+def ticks(done, interval=0.001):
+    """Tick every ``interval`` seconds until ``done()``, return the longest gap and the elapsed milliseconds."""
+    start = last = time.time()
+    stall = 0
+    while not done():
+        time.sleep(interval)
+        now = time.time()
+        stall = max(stall, now - last)
+        last = now
+    return stall * 1000, (time.time() - start) * 1000
+
+
+def main():
+    count = 200000
+    with open(os.devnull, 'w') as devnull:
+        start = time.time()
+        devnull.write(lazyxml.dumps({'rows': {'row': rows(count)}}))
+        blocking = (time.time() - start) * 1000
+        result = lazyxml.adump({'rows': {'row': rows(count)}}, Writer(devnull))
+        stall, elapsed = ticks(result.ready)
+        result.get()
+    print 'dump: {} rows, dumps {:.2f} ms, adump {:.2f} ms'.format(count, blocking, elapsed)
+    report('longest stall of caller loop', [
+        ('dumps in caller', blocking),
+        ('adump', stall),
+    ])
+
+
+if __name__ == '__main__':
+    main()
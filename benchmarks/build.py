@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+
+"""Benchmark of :meth:`Builder.build_tree`: the recursive builder of lazyxml 1.3 which formats the
+indent and the tags of every node against the explicit stack with the indent table and the caches
+of tags and attributes.
+
+Run with ``python -m benchmarks.build``.
+"""
+
+import collections
+import types
+
+from .common import bench, report
+
+from lazyxml import utils
+from lazyxml.builder import Builder
+
+
+class LegacyBuilder(Builder):
+    """The recursive :meth:`build_tree` of lazyxml 1.3."""
+
+    def __init__(self, **options):
+        super(LegacyBuilder, self).__init__(**options)
+        self.indent = options.get('indent')
+        self.ksort = options.get('ksort', False)
+        self.reverse = options.get('reverse', False)
+        self.hasattr = options.get('hasattr', False)
+        self.cdata = options.get('cdata', True)
+
+    def build_tree(self, data, tagname, attrs=None, depth=0, tree=None):
+        if tree is None:
+            tree = []
+        if data is None:
+            data = ''
+        indent = ('\n%s' % (self.indent * depth)) if self.indent else ''
+        if isinstance(data, collections.Mapping):
+            if self.hasattr and self.check_structure(data.keys()):
+                attrs, values = self.pickdata(data)
+                self.build_tree(values, tagname, attrs, depth, tree)
+            else:
+                tree.append('{}{}'.format(indent, self.tag_start(tagname, attrs)))
+                iter = data.iteritems()
+                if self.ksort:
+                    iter = sorted(iter, key=lambda x: x[0], reverse=self.reverse)
+                for k, v in iter:
+                    attrs = {}
+                    if (self.hasattr and isinstance(v, collections.Mapping)
+                            and self.check_structure(v.keys())):
+                        attrs, v = self.pickdata(v)
+                    self.build_tree(v, k, attrs, depth + 1, tree)
+                tree.append('{}{}'.format(indent, self.tag_end(tagname)))
+        elif utils.is_iterable(data) and not isinstance(data, types.StringTypes):
+            for v in data:
+                self.build_tree(v, tagname, attrs, depth, tree)
+        else:
+            tree.append(indent)
+            data = self.safedata(data, self.cdata)
+            tree.append(self.build_tag(tagname, data, attrs))
+        return tree
+
+
+def records(count=100000):
+    return {'catalog': {'item': [{'id': str(i), 'name': 'item-{}'.format(i), 'price': '{}.5'.format(i % 1000),
+                                  'tags': ['a', 'b']} for i in xrange(count)]}}
+
+
+def attr_records(count=50000):
+    return {'catalog': {'item': [
+        {'{attrs}': {'currency': 'USD', 'status': 'active'},
+         '{values}': {'name': {'{attrs}': {'lang': 'en'}, '{values}': 'item-{}'.format(i)},
+                      'stock': {'{attrs}': {'unit': 'pcs', 'warehouse': 'W{}'.format(i % 4)}, '{values}': str(i)}}}
+        for i in xrange(count)]}}
+
+
+def deep(depth=800):
+    data = 'leaf'
+    for _ in xrange(depth):
+        data = {'node': data}
+    return data
+
+
+def main():
+    samples = [
+        ('records, 100000 items', records(), {}),
+        ('records, indent', records(), {'indent': ' ' * 4}),
+        ('records, ksort', records(), {'ksort': True}),
+        ('repeated attributes, 50000 items', attr_records(), {'hasattr': True}),
+        ('deep, 800 levels x 100', {'root': [deep()] * 100}, {'indent': '  '}),
+    ]
+    for title, data, options in samples:
+        legacy, builder = LegacyBuilder(**options), Builder(**options)
+        assert legacy.object2xml(data) == builder.object2xml(data)
+        report('dumps: {}'.format(title), [
+            ('recursive (1.3)', bench(lambda: legacy.object2xml(data), number=3)),
+            ('explicit stack', bench(lambda: builder.object2xml(data), number=3)),
+        ])
+
+
+if __name__ == '__main__':
+    main()
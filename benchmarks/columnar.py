@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+
+"""Benchmark of loading repeated records to typed columns.
+
+Run with ``python -m benchmarks.columnar``.
+"""
+
+import array
+from cStringIO import StringIO
+
+from .common import bench, peak_memory, report
+
+import lazyxml
+from lazyxml.backends import BACKENDS
+
+COLUMNS = {'@id': int, 'sku': str, 'price': float, 'qty': int}
+
+
+def rows_xml(count=200000):
+    row = '<row id="{0}"><sku>SKU-{0}</sku><price>{1}.25</price><qty>{2}</qty><note>n</note></row>'
+    return '<rows>{}</rows>'.format(''.join(row.format(i, i % 1000, i % 7) for i in xrange(count)))
+
+
+def transpose(xml, backend):
+    """Build the records with :func:`lazyxml.iterload` and transpose them."""
+    columns = dict((name, []) for name in COLUMNS)
+    for record in lazyxml.iterload(StringIO(xml), 'rows/row', strip_root=False, strip_attr=False, backend=backend):
+        record = record['row']
+        values = record['values']
+        columns['@id'].append(record['attrs']['id'])
+        for name in ('sku', 'price', 'qty'):
+            columns[name].append(values[name]['values'])
+    return dict((name, texts if COLUMNS[name] is str else array.array('l' if COLUMNS[name] is int else 'd',
+                                                                      map(COLUMNS[name], texts)))
+                for name, texts in columns.iteritems())
+
+
+def main():
+    xml = rows_xml()
+    for backend in sorted(BACKENDS, key=lambda name: name != 'etree'):
+        funcs = [('iterload + transpose', lambda: transpose(xml, backend)),
+                 ('loads_columnar', lambda: lazyxml.loads_columnar(xml, 'rows/row', COLUMNS, backend=backend))]
+        # measure memory before timing, so freed buffers of previous runs do not hide the peak
+        memory = [peak_memory(func) for _, func in funcs]
+        rows = [(name, bench(func, number=1), mb) for (name, func), mb in zip(funcs, memory)]
+        report('{} records to columns: {}'.format(200000, backend), rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+
+import gc
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+def bench(func, number=5, repeat=3):
+    """Return the best time of ``repeat`` runs of ``number`` calls in milliseconds per call.
+    """
+    gc.collect()
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number * 1000
+
+
+def _status(field):
+    with open('/proc/self/status') as fp:
+        for line in fp:
+            if line.startswith(field + ':'):
+                return int(line.split()[1])
+    return 0
+
+
+def peak_memory(func):
+    """Run ``func`` in a forked process and return the growth of peak resident memory in MB.
+    """
+    r, w = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(r)
+        gc.collect()
+        before = _status('VmRSS')
+        func()
+        os.write(w, str(_status('VmHWM') - before))
+        os._exit(0)
+    os.close(w)
+    data = os.read(r, 64)
+    os.close(r)
+    os.waitpid(pid, 0)
+    return float(data or 0) / 1024
+
+
+def peak_anon_memory(func, interval=0.001):
+    """Run ``func`` in a forked process and return the growth of peak anonymous resident memory in MB.
+
+    The pages of file mappings are reclaimable page cache, they are counted by ``VmHWM`` but not here.
+    The kernel keeps no peak of ``RssAnon``, so it is sampled by a thread every ``interval`` seconds.
+    """
+    import threading
+    r, w = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(r)
+        gc.collect()
+        before = _status('RssAnon')
+        samples = [before]
+        done = threading.Event()
+
+        def sample():
+            while not done.is_set():
+                samples.append(_status('RssAnon'))
+                done.wait(interval)
+
+        thread = threading.Thread(target=sample)
+        thread.start()
+        func()
+        done.set()
+        thread.join()
+        samples.append(_status('RssAnon'))
+        os.write(w, str(max(samples) - before))
+        os._exit(0)
+    os.close(w)
+    data = os.read(r, 64)
+    os.close(r)
+    os.waitpid(pid, 0)
+    return float(data or 0) / 1024
+
+
+def deep_size(obj):
+    """Return the size in MB of the objects reachable from ``obj`` through containers.
+    """
+    seen = set()
+    size = 0
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.iterkeys())
+            stack.extend(obj.itervalues())
+        elif isinstance(obj, (list, tuple)):
+            stack.extend(obj)
+        else:
+            stack.extend(getattr(obj, name) for cls in type(obj).__mro__
+                         for name in getattr(cls, '__slots__', ()))
+    return size / 1024.0 / 1024
+
+
+def report(title, rows):
+    """Print a table of ``(name, milliseconds[, megabytes])`` rows, the first row is the baseline.
+    """
+    print title
+    baseline = rows[0][1]
+    for row in rows:
+        name, ms = row[:2]
+        memory = '{:>9.1f} MB'.format(row[2]) if len(row) > 2 else ''
+        if ms is None:
+            print '    {:<32} {:>12}'.format(name, 'failed')
+        elif baseline is None:
+            print '    {:<32} {:>9.2f} ms {:>8} {}'.format(name, ms, '', memory)
+        else:
+            print '    {:<32} {:>9.2f} ms {:>7.2f}x {}'.format(name, ms, baseline / ms, memory)
+    print
+
+
+def wide_xml(count=100000):
+    items = ''.join('<item id="{0}"><name>item-{0}</name><price>{0}.5</price></item>'.format(i)
+                    for i in xrange(count))
+    return '<catalog>{}</catalog>'.format(items)
+
+
+def fields_xml(count=20000, fields=30):
+    item = ''.join('<field{0}>value-{0}</field{0}>'.format(i) for i in xrange(fields))
+    return '<catalog>{}</catalog>'.format(''.join(
+        '<item><id>{}</id>{}</item>'.format(i, item) for i in xrange(count)))
+
+
+def catalog_xml(count=50000):
+    item = ('<item id="{0}" sku="SKU-{0}" currency="USD" status="active">'
+            '<name lang="en">item-{0}</name><price currency="USD">{1}.5</price>'
+            '<stock unit="pcs" warehouse="W{2}">{1}</stock></item>')
+    return '<catalog>{}</catalog>'.format(''.join(item.format(i, i % 100, i % 4) for i in xrange(count)))
+
+
+def deep_xml(depth=5000):
+    return '{}leaf{}'.format('<node a="1">' * depth, '</node>' * depth)
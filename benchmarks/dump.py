@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+
+"""Benchmark of dumping a large export: :func:`lazyxml.dumps` of a list of rows which builds the whole
+document against :func:`lazyxml.dump` and :func:`lazyxml.iterdumps` of a generator of rows which
+write the chunks as the rows are produced.
+
+Run with ``python -m benchmarks.dump``.
+"""
+
+import os
+
+from .common import bench, peak_memory, report
+
+import lazyxml
+
+
+def rows(count):
+    for i in xrange(count):
+        yield {'id': str(i), 'name': 'item-{}'.format(i), 'price': '{}.5'.format(i % 1000), 'tags': ['a', 'b']}
+
+
+def main():
+    count = 200000
+    with open(os.devnull, 'w') as devnull:
+        funcs = [
+            ('dumps list', lambda: devnull.write(lazyxml.dumps({'rows': {'row': list(rows(count))}}))),
+            ('dump generator', lambda: lazyxml.dump({'rows': {'row': rows(count)}}, devnull)),
+            ('iterdumps generator', lambda: sum(len(chunk) for chunk in lazyxml.iterdumps({'rows': {'row': rows(count)}}))),
+        ]
+        memory = [peak_memory(func) for _, func in funcs]
+        report('dump: {} rows'.format(count), [
+            (label, bench(func, number=1), mb) for (label, func), mb in zip(funcs, memory)])
+
+
+if __name__ == '__main__':
+    main()
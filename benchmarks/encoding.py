@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+
+"""Benchmark of loading non UTF-8 content: decoding the whole document and encoding it to
+UTF-8 before parsing (lazyxml 1.3) against feeding the bytes to the parser.
+
+Run with ``python -m benchmarks.encoding``.
+"""
+
+import re
+
+from .common import bench, peak_memory, report
+
+import lazyxml
+from lazyxml.parser import Parser
+
+LEGACY_ENCODING = re.compile(r'<\?xml\s.*?encoding="(.*?)".*?\?>', re.I | re.S)
+LEGACY_HEADER = re.compile(r'<\?xml.*?\?>', re.I | re.S)
+
+
+def legacy_loads(content):
+    """Guess encoding by a regex over the whole content, decode, strip header and encode it, then parse."""
+    matchobj = LEGACY_ENCODING.match(content)
+    encoding = matchobj and matchobj.group(1).lower() or 'utf-8'
+    if encoding != 'utf-8':
+        content = LEGACY_HEADER.sub('', content.decode(encoding)).encode('utf-8')
+    return lazyxml.loads(content)
+
+
+def text_xml(text, count=100000):
+    items = u''.join(u'<item id="{0}"><name>{1}-{0}</name><price>{0}.5</price></item>'.format(i, text)
+                     for i in xrange(count))
+    return u'<catalog>{}</catalog>'.format(items)
+
+
+def main():
+    samples = [
+        ('gbk', u'商品'),
+        ('shift_jis', u'商品'),
+        ('utf-16', u'商品'),
+        ('iso-8859-1', u'café'),
+    ]
+    for encoding, text in samples:
+        content = u'<?xml version="1.0" encoding="{}"?>{}'.format(encoding, text_xml(text)).encode(encoding)
+        funcs = [('decode whole document (1.3)', lambda: legacy_loads(content)),
+                 ('byte-native', lambda: lazyxml.loads(content))]
+        memory = [peak_memory(func) for _, func in funcs]
+        report('loads: {} ({:.1f} MB)'.format(encoding, len(content) / 1024.0 / 1024), [
+            (label, bench(func), mb) for (label, func), mb in zip(funcs, memory)])
+    # a declaration without encoding, the regex of 1.3 searches the whole content for ``encoding="``
+    content = '<?xml version="1.0"?>' + text_xml('item').encode('utf-8')
+    report('guess_xml_encoding: no encoding declared ({:.1f} MB)'.format(len(content) / 1024.0 / 1024), [
+        ('whole content regex (1.3)', bench(lambda: LEGACY_ENCODING.match(content), number=20)),
+        ('bounded sniff', bench(lambda: Parser.guess_xml_encoding(content), number=20)),
+    ])
+
+
+if __name__ == '__main__':
+    main()
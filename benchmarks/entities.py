@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+
+"""Benchmark of the ``unescape`` option: decoding the entities of the whole document before
+parsing (lazyxml 1.3) against decoding the text nodes after parsing.
+
+Run with ``python -m benchmarks.entities``.
+"""
+
+import htmlentitydefs
+import re
+
+from .common import bench, peak_memory, report, wide_xml
+
+import lazyxml
+
+HTML_ENTITY = re.compile('&(\w+?);')
+
+
+def legacy_decode_char(matchobj, defs=htmlentitydefs.entitydefs):
+    try:
+        return defs[matchobj.group(1)]
+    except KeyError:
+        return matchobj.group(0)
+
+
+def legacy_loads(content):
+    """The whole-document regex unescape of lazyxml 1.3, then parse."""
+    return lazyxml.loads(HTML_ENTITY.sub(legacy_decode_char, content))
+
+
+def escaped_xml(count=20000):
+    payload = '&lt;order&gt;&lt;id&gt;{0}&lt;/id&gt;&lt;total&gt;{0}.5&lt;/total&gt;&lt;/order&gt;'
+    items = ''.join('<item><id>{0}</id><payload>{1}</payload></item>'.format(i, payload.format(i))
+                    for i in xrange(count))
+    return '<catalog>{}</catalog>'.format(items)
+
+
+def main():
+    plain = wide_xml(100000)
+    # the 1.3 table decodes to latin-1 bytes, so only the ascii entities are comparable
+    sparse = plain.replace('<name>item-1', '<name>&quot;item-1')
+    dense = plain.replace('<name>item-', '<name>&quot;item&quot;&#45;')
+    for name, content in [('no entity', plain), ('10% nodes with entity', sparse),
+                          ('all names with entities', dense)]:
+        escaped = content.replace('&', '&amp;')
+        funcs = [('whole document (1.3)', lambda: legacy_loads(content)),
+                 ('per text node', lambda: lazyxml.loads(content, unescape=True)),
+                 ('no unescape', lambda: lazyxml.loads(escaped))]
+        memory = [peak_memory(func) for _, func in funcs]
+        report('unescape: {} ({:.1f} MB)'.format(name, len(content) / 1024.0 / 1024), [
+            (label, bench(func), mb) for (label, func), mb in zip(funcs, memory)])
+    content = escaped_xml()
+
+    def first_payloads(count=100):
+        result = lazyxml.loads(content, unescape=True, lazy=True)['item']
+        return [result[i]['payload']['order']['id'] for i in xrange(count)]
+
+    funcs = [('eager sub-parse', lambda: lazyxml.loads(content, unescape=True)),
+             ('lazy, 100 payloads read', first_payloads)]
+    memory = [peak_memory(func) for _, func in funcs]
+    report('unescape: escaped xml payloads ({:.1f} MB)'.format(len(content) / 1024.0 / 1024), [
+        (label, bench(func), mb) for (label, func), mb in zip(funcs, memory)])
+
+
+if __name__ == '__main__':
+    main()
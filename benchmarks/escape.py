@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+
+"""Benchmark of escaping the values of :class:`~lazyxml.builder.Builder`: ``cgi.escape(str(data), True)``
+and the CDATA format of lazyxml 1.3 against :mod:`lazyxml.escaping`.
+
+Run with ``python -m benchmarks.escape``.
+"""
+
+import cgi
+
+from .common import bench, report
+
+import lazyxml
+from lazyxml.builder import Builder
+
+
+def legacy_safedata(data, cdata=True):
+    if cdata:
+        return '<![CDATA[{}]]>'.format(data)
+    return cgi.escape(str(data), True)
+
+
+class LegacyBuilder(Builder):
+    """The builder with the escaping of lazyxml 1.3."""
+
+    safedata = staticmethod(legacy_safedata)
+
+
+def records(count=100000):
+    return {'catalog': {'item': [{'id': i, 'name': 'item number {}'.format(i), 'sku': 'SKU-{:06d}'.format(i),
+                                  'price': '{}.5'.format(i % 1000)} for i in xrange(count)]}}
+
+
+def main():
+    values = ['item number {}'.format(i) for i in xrange(100000)]
+    dirty = ['item <{}> & "co"'.format(i) for i in xrange(100000)]
+    for title, samples in (('clean ascii', values), ('with special characters', dirty)):
+        for cdata in (False, True):
+            report('safedata: {}, cdata={}, 100000 values'.format(title, cdata), [
+                ('cgi.escape / format (1.3)', bench(lambda: [legacy_safedata(v, cdata) for v in samples])),
+                ('escaping', bench(lambda: [Builder.safedata(v, cdata) for v in samples])),
+            ])
+    data = records()
+    for cdata in (False, True):
+        legacy, builder = LegacyBuilder(cdata=cdata), Builder(cdata=cdata)
+        assert legacy.object2xml(data) == builder.object2xml(data)
+        report('dumps: clean ascii records, cdata={}'.format(cdata), [
+            ('cgi.escape / format (1.3)', bench(lambda: legacy.object2xml(data), number=3)),
+            ('escaping', bench(lambda: builder.object2xml(data), number=3)),
+        ])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+
+"""Benchmark of preprocessing xml content before parsing.
+
+Run with ``python -m benchmarks.filter``.
+"""
+
+from .common import bench, peak_memory, report, wide_xml
+
+from lazyxml import utils
+from lazyxml.parser import Parser
+
+
+def legacy_filter(content, unescape=False):
+    """The multi-pass :meth:`Parser.xml_filter` of lazyxml 1.3."""
+    content = content.replace('\r', '').replace('\n', '').replace('\t', '').replace('\x0B', '').strip()
+    encoding = Parser.guess_xml_encoding(content) or 'utf-8'
+    if encoding.lower() != 'utf-8':
+        content = Parser.strip_xml_header(content.decode(encoding, 'strict'))
+        content = content.encode('utf-8')
+    if unescape:
+        content = utils.html_entity_decode(content)
+    return content
+
+
+def main():
+    xml = wide_xml(200000).replace('</item>', '</item>\n\t')
+    samples = [
+        ('utf-8', '<?xml version="1.0" encoding="utf-8"?>\n' + xml, False),
+        ('gbk', u'<?xml version="1.0" encoding="gbk"?>\n{}'.format(
+            xml.replace('item-', u'商品-')).encode('gbk'), False),
+        ('utf-8 unescape', '<?xml version="1.0" encoding="utf-8"?>\n' + xml.replace(
+            '.5<', '.5&amp;&lt;<'), True),
+    ]
+    for name, content, unescape in samples:
+        parser = Parser(unescape=unescape)
+        legacy = lambda: legacy_filter(content, unescape)
+        current = lambda: parser.xml_filter(content)
+        chunks = lambda: [len(chunk) for chunk in parser.filter_chunks(content)]
+        funcs = [('multi-pass (1.3)', legacy), ('single pass', current), ('single pass chunks', chunks)]
+        # measure memory before timing, so freed buffers of previous runs do not hide the peak
+        memory = [peak_memory(func) for _, func in funcs]
+        report('xml_filter: {} ({:.1f} MB)'.format(name, len(content) / 1024.0 / 1024), [
+            (label, bench(func), mb) for (label, func), mb in zip(funcs, memory)])
+
+
+if __name__ == '__main__':
+    main()
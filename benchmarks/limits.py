@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+
+"""Benchmark of the ``limits`` option: the overhead of checking the limits of a document
+within them, and the early abort of a document out of them.
+
+Run with ``python -m benchmarks.limits``.
+"""
+
+from cStringIO import StringIO
+
+from .common import bench, peak_memory, report, wide_xml
+
+import lazyxml
+
+LIMITS = {'max_bytes': 1 << 30, 'max_elements': 1 << 24, 'max_depth': 256,
+          'max_text_size': 1 << 20, 'max_entity_expansion': 1 << 16}
+
+
+def lol_xml(levels=9):
+    """The billion laughs, a reference to the last entity expands to ``3 * 10 ** levels`` characters."""
+    entities = ['<!ENTITY lol0 "lol">']
+    for i in xrange(1, levels + 1):
+        entities.append('<!ENTITY lol{} "{}">'.format(i, '&lol{};'.format(i - 1) * 10))
+    return '<?xml version="1.0"?><!DOCTYPE lolz [{}]><lolz>&lol{};</lolz>'.format(''.join(entities), levels)
+
+
+def aborted(func):
+    def wrapper():
+        try:
+            func()
+        except lazyxml.LimitExceeded:
+            pass
+    return wrapper
+
+
+def main():
+    content = wide_xml(100000)
+    size = '{:.1f} MB'.format(len(content) / 1024.0 / 1024)
+    for backend in ('etree', 'expat'):
+        report('loads: {}, {}'.format(backend, size), [
+            ('no limits', bench(lambda: lazyxml.loads(content, backend=backend))),
+            ('max_bytes', bench(lambda: lazyxml.loads(content, backend=backend,
+                                                      limits={'max_bytes': 1 << 30}))),
+            ('all limits', bench(lambda: lazyxml.loads(content, backend=backend, limits=LIMITS))),
+        ])
+    report('iterload: catalog/item, {}'.format(size), [
+        ('no limits', bench(lambda: sum(1 for _ in lazyxml.iterload(StringIO(content), 'catalog/item')))),
+        ('all limits', bench(lambda: sum(1 for _ in lazyxml.iterload(StringIO(content), 'catalog/item',
+                                                                    limits=LIMITS)))),
+    ])
+    content = wide_xml(400000)
+    funcs = [('no limits', lambda: lazyxml.loads(content)),
+             ('max_elements=10000', aborted(lambda: lazyxml.loads(content, limits={'max_elements': 10000}))),
+             ('max_bytes=1MB', aborted(lambda: lazyxml.loads(content, limits={'max_bytes': 1 << 20})))]
+    memory = [peak_memory(func) for _, func in funcs]
+    report('loads: early abort, {:.1f} MB'.format(len(content) / 1024.0 / 1024), [
+        (label, bench(func, number=1), mb) for (label, func), mb in zip(funcs, memory)])
+    content = lol_xml()
+    report('loads: billion laughs, 3 GB expanded', [
+        ('max_entity_expansion', bench(aborted(lambda: lazyxml.loads(content, limits=LIMITS)), number=100)),
+    ])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+
+"""Benchmark of loading a large xml file by reading it or by a memory mapping, and of
+loading a compressed file by decompressing it first or as it is parsed.
+
+Run with ``python -m benchmarks.load_file``.
+"""
+
+import gzip
+import os
+import tempfile
+
+from .common import bench, peak_anon_memory, peak_memory, report
+
+import lazyxml
+from lazyxml.backends import BACKENDS
+
+
+def write_xml(path, count=400000):
+    item = '<item id="{0}"><name>item-{0}</name><price>{0}.5</price><note>{1}</note></item>'
+    with open(path, 'wb') as fp:
+        fp.write('<catalog>')
+        for i in xrange(0, count, 1000):
+            fp.write(''.join(item.format(j, 'n' * (j % 64)) for j in xrange(i, i + 1000)))
+        fp.write('</catalog>')
+
+
+def iterate(path, backend, mmap):
+    count = 0
+    for _ in lazyxml.iterload(path, 'catalog/item', backend=backend, mmap=mmap):
+        count += 1
+    return count
+
+
+def compress_file(path):
+    with open(path, 'rb') as src:
+        fp = gzip.open(path + '.gz', 'wb', 6)
+        for chunk in iter(lambda: src.read(1024 * 1024), ''):
+            fp.write(chunk)
+        fp.close()
+    return path + '.gz'
+
+
+def decompress_iterate(path):
+    """Decompress the whole file, then iterate the records of the content."""
+    from cStringIO import StringIO
+    with gzip.open(path, 'rb') as fp:
+        content = fp.read()
+    return sum(1 for _ in lazyxml.iterload(StringIO(content), 'catalog/item'))
+
+
+def main():
+    fd, path = tempfile.mkstemp(suffix='.xml')
+    os.close(fd)
+    try:
+        write_xml(path)
+        size = os.path.getsize(path) / 1024.0 / 1024
+        for backend in sorted(BACKENDS, key=lambda name: name != 'etree'):
+            for name, funcs in [
+                ('load', [('fp.read()', lambda: lazyxml.load(path, backend=backend)),
+                          ('mmap', lambda: lazyxml.load(path, backend=backend, mmap=True))]),
+                ('iterload', [('fp.read(chunk)', lambda: iterate(path, backend, False)),
+                              ('mmap', lambda: iterate(path, backend, True))]),
+            ]:
+                # memory is measured before timing, so freed buffers of previous runs do not hide the peak
+                rows = []
+                for label, func in funcs:
+                    anon, rss = peak_anon_memory(func), peak_memory(func)
+                    rows.append(('{} (rss {:.1f} MB)'.format(label, rss), bench(func, number=1), anon))
+                report('{} {:.1f} MB file: {}, peak anonymous memory'.format(name, size, backend), rows)
+
+        gz = compress_file(path)
+        try:
+            funcs = [('gzip.open().read() + loads', lambda: lazyxml.loads(gzip.open(gz, 'rb').read())),
+                     ('load streaming', lambda: lazyxml.load(gz))]
+            rows = [(name, bench(func, number=1), peak_anon_memory(func)) for name, func in funcs]
+            report('load {:.1f} MB gzip file, peak anonymous memory'.format(os.path.getsize(gz) / 1024.0 / 1024), rows)
+            funcs = [('gzip.open().read() + iterload', lambda: decompress_iterate(gz)),
+                     ('iterload streaming', lambda: iterate(gz, 'etree', False))]
+            rows = [(name, bench(func, number=1), peak_anon_memory(func)) for name, func in funcs]
+            report('iterload gzip file, peak anonymous memory', rows)
+        finally:
+            os.remove(gz)
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+
+"""Benchmark of loading many small xml contents with worker pools.
+
+Run with ``python -m benchmarks.loads_many``.
+"""
+
+import multiprocessing
+
+from .common import bench, report
+
+import lazyxml
+
+CALLBACK = ('<xml><appid>wx{0:08d}</appid><mch_id>{0}</mch_id><nonce_str>{0:032x}</nonce_str>'
+            '<result_code>SUCCESS</result_code><total_fee>{0}</total_fee>'
+            '<transaction_id>{0:028d}</transaction_id></xml>')
+
+
+def main():
+    docs = [CALLBACK.format(i) for i in xrange(20000)]
+    print 'cpu count: {}'.format(multiprocessing.cpu_count())
+    print
+    rows = [('loads loop', bench(lambda: [lazyxml.loads(doc) for doc in docs], number=1))]
+    for executor in ('process', 'thread'):
+        for workers in (1, 2, 4, 8):
+            func = lambda: list(lazyxml.loads_many(docs, workers=workers, executor=executor, chunksize=256))
+            func()  # warm up the shared pool
+            rows.append(('{} workers={}'.format(executor, workers), bench(func, number=1)))
+    report('loads_many: 20000 documents', rows)
+
+
+if __name__ == '__main__':
+    main()
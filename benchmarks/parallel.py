@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+
+"""Scaling benchmark of loading the records of a large xml file in parallel shards.
+
+Run with ``python -m benchmarks.parallel``. The speedup is bounded by the number of cores.
+"""
+
+import multiprocessing
+import os
+import tempfile
+
+from .common import bench, report
+from .load_file import write_xml
+
+import lazyxml
+
+
+def count(records):
+    return sum(1 for _ in records)
+
+
+def main():
+    fd, path = tempfile.mkstemp(suffix='.xml')
+    os.close(fd)
+    try:
+        write_xml(path, 200000)
+        size = os.path.getsize(path) / 1024.0 / 1024
+        rows = [('iterload', bench(lambda: count(lazyxml.iterload(path, 'catalog/item')), number=1))]
+        for workers in (1, 2, 4, 8, 16):
+            for ordered in (True, False):
+                func = lambda: count(lazyxml.load_parallel(path, 'item', workers=workers, ordered=ordered))
+                func()  # start the workers of the shared pool
+                rows.append(('workers={} ordered={}'.format(workers, ordered), bench(func, number=1)))
+        report('load_parallel {:.1f} MB file, {} cores'.format(size, multiprocessing.cpu_count()), rows)
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
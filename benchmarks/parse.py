@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+
+"""Benchmark of converting element tree to python object.
+
+Run with ``python -m benchmarks.parse``.
+"""
+
+import collections
+
+from .common import bench, catalog_xml, deep_xml, fields_xml, deep_size, peak_memory, report, wide_xml
+
+import lazyxml
+from lazyxml.backends import BACKENDS
+from lazyxml.cache import ParseCache
+from lazyxml.consts import Regex
+from lazyxml.namespaces import TagCache
+from lazyxml.parser import ET, Parser
+
+
+class LegacyParser(Parser):
+    """The recursive conversion of lazyxml 1.3."""
+
+    @classmethod
+    def parse(cls, element):
+        values = {}
+        for child in element:
+            node = cls.get_node(child)
+            subs = cls.parse(child)
+            value = subs or node['value']
+            if node['tag'] not in values:
+                values[node['tag']] = value
+            else:
+                if not isinstance(values[node['tag']], list):
+                    values[node['tag']] = [values.pop(node['tag'])]
+                values[node['tag']].append(value)
+        return values
+
+    @classmethod
+    def parse_full(cls, element):
+        values = collections.defaultdict(dict)
+        for child in element:
+            node = cls.get_node(child)
+            subs = cls.parse_full(child)
+            value = subs or {'values': node['value']}
+            value['attrs'] = node['attr']
+            if node['tag'] not in values['values']:
+                values['values'][node['tag']] = value
+            else:
+                if not isinstance(values['values'][node['tag']], list):
+                    values['values'][node['tag']] = [values['values'].pop(node['tag'])]
+                values['values'][node['tag']].append(value)
+        return values
+
+    @staticmethod
+    def split_namespace(tag):
+        matchobj = Regex.XML_NS.search(tag)
+        return matchobj.groups() if matchobj else ('', tag)
+
+
+def run(func, element):
+    try:
+        func(element)
+    except RuntimeError:
+        return None
+    return bench(lambda: func(element))
+
+
+def main():
+    for name, xml in [('wide tree (100000 records)', wide_xml()),
+                      ('deep tree (depth 800)', deep_xml(800)),
+                      ('deep tree (depth 5000)', deep_xml(5000))]:
+        element = ET.fromstring(xml)
+        for method in ('parse', 'parse_full'):
+            legacy, current = getattr(LegacyParser, method), getattr(Parser, method)
+            report('{}: {}'.format(name, method), [
+                ('recursive (1.3)', run(legacy, element)),
+                ('explicit stack', run(current, element)),
+            ])
+
+    xml = wide_xml()
+    for strip_attr in (True, False):
+        rows = []
+        for backend in sorted(BACKENDS, key=lambda name: name != 'etree'):
+            func = lambda: lazyxml.loads(xml, strip_attr=strip_attr, backend=backend)
+            rows.append((backend, bench(func, number=3), peak_memory(func)))
+        report('loads by backend: strip_attr={}'.format(strip_attr), rows)
+
+    xml = fields_xml()
+    include = ['catalog/item/id']
+    rows = []
+    for backend in sorted(BACKENDS, key=lambda name: name != 'etree'):
+        for paths in (None, include):
+            func = lambda: lazyxml.loads(xml, backend=backend, include=paths)
+            name = '{} include={}'.format(backend, paths and ','.join(paths))
+            rows.append((name, bench(func, number=3), peak_memory(func)))
+    report('loads with projection: 20000 records of 31 fields', rows)
+
+    xml = catalog_xml()
+    rows = []
+    for backend in sorted(BACKENDS, key=lambda name: name != 'etree'):
+        for compact in (False, True):
+            func = lambda: lazyxml.loads(xml, strip_attr=False, backend=backend, compact=compact)
+            rows.append(('{} compact={}'.format(backend, compact), bench(func, number=1), deep_size(func())))
+    report('loads strip_attr=False, result size: {:.1f} MB catalog'.format(len(xml) / 1024.0 / 1024), rows)
+
+    xml = '<resp><header><status>ok</status></header><body>{}</body></resp>'.format(wide_xml(20000))
+    report('loads and read a status field', [
+        ('eager', bench(lambda: lazyxml.loads(xml)['header']['status'])),
+        ('lazy', bench(lambda: lazyxml.loads(xml, lazy=True)['header']['status'])),
+        ('lazy materialize', bench(lambda: lazyxml.loads(xml, lazy=True).materialize())),
+    ])
+
+    tags = [element.tag for element in ET.fromstring(
+        wide_xml(20000).replace('<item ', '<item xmlns="urn:catalog" ')).iter()]
+    names = TagCache()
+    report('split namespace: {} tags'.format(len(tags)), [
+        ('regex (1.3)', bench(lambda: [LegacyParser.split_namespace(tag) for tag in tags])),
+        ('tag cache', bench(lambda: [names.split(tag) for tag in tags])),
+    ])
+
+    docs = [wide_xml(200 + i) for i in xrange(20)]
+    cache = ParseCache()
+    report('loads 2000 repeated contents of 20 distinct documents', [
+        ('uncached', bench(lambda: [lazyxml.loads(docs[i % 20]) for i in xrange(2000)], number=1)),
+        ('cache', bench(lambda: [lazyxml.loads(docs[i % 20], cache=cache) for i in xrange(2000)], number=1)),
+    ])
+    print(cache.cache_info())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+"""Benchmark of dumping fixed-shape API responses: the generic compiled builder against the
+serializer compiled from the schema of the response, see :mod:`lazyxml.schema`.
+
+Run with ``python -m benchmarks.schema``.
+"""
+
+from collections import OrderedDict
+
+from .common import bench, report
+
+import lazyxml
+
+ORDER = {'{attrs}': {'id': int, 'currency': str},
+         '{values}': {'sku': str, 'name': unicode, 'qty': int, 'price': float, 'tags': [str]}}
+SCHEMA = {'response': {'code': int, 'message': str, 'request_id': str,
+                       'user': {'id': int, 'name': unicode, 'email': str, 'active': bool, 'score': float},
+                       'orders': {'order': [ORDER]}}}
+
+
+def ordered(schema):
+    """Return the schema, or the data of :func:`response`, with its mappings as ``OrderedDict`` of the same order.
+    """
+    if isinstance(schema, dict):
+        return OrderedDict((key, ordered(value)) for key, value in schema.iteritems())
+    if isinstance(schema, list):
+        return [ordered(item) for item in schema]
+    return schema
+
+
+def response(i, orders=10):
+    return {'response': {
+        'code': 200, 'message': 'ok', 'request_id': 'req-{:08d}'.format(i),
+        'user': {'id': i, 'name': u'user {}'.format(i), 'email': 'user{}@example.com'.format(i),
+                 'active': True, 'score': i * 0.5},
+        'orders': {'order': [
+            {'{attrs}': {'id': i * 100 + j, 'currency': 'USD'},
+             '{values}': {'sku': 'SKU-{:06d}'.format(j), 'name': u'item {}'.format(j), 'qty': j,
+                          'price': j * 1.25, 'tags': ['new', 'sale']}}
+            for j in xrange(orders)]},
+    }}
+
+
+def main():
+    docs = [response(i) for i in xrange(1000)]
+    small = [response(i, orders=0) for i in xrange(1000)]
+    ordered_schema = ordered(SCHEMA)
+    ordered_docs = [ordered(doc) for doc in docs]
+    ordered_small = [ordered(doc) for doc in small]
+    for options in ({'ksort': True, 'hasattr': True},
+                    {'ksort': True, 'hasattr': True, 'cdata': False, 'indent': '  '},
+                    {'hasattr': True},
+                    {'hasattr': True, 'cdata': False, 'indent': '  '}):
+        generic = lazyxml.compile_builder(**options)
+        compiled = lazyxml.compile_builder(SCHEMA, **options)
+        builders = [('schema compiled', compiled, docs, small)]
+        if not options.get('ksort'):
+            # without ksort, the items of a dict schema are dispatched by key, an OrderedDict schema is
+            # dumped in its fixed order for the data of the same order.
+            builders.append(('schema compiled, OrderedDict data', compiled, ordered_docs, ordered_small))
+            builders.append(('OrderedDict schema compiled', lazyxml.compile_builder(ordered_schema, **options),
+                             ordered_docs, ordered_small))
+        for title, many in (('10 orders', True), ('no orders', False)):
+            rows = [('generic builder', bench(lambda: [generic.dumps(doc) for doc in (docs if many else small)]))]
+            for name, compiled, samples, small_samples in builders:
+                samples = samples if many else small_samples
+                assert [generic.dumps(doc) for doc in samples] == [compiled.dumps(doc) for doc in samples]
+                rows.append((name, bench(lambda: [compiled.dumps(doc) for doc in samples])))
+            report('dumps: 1000 responses, {}, {}'.format(title, ', '.join(sorted(options))), rows)
+    mismatched = [response(i) for i in xrange(1000)]
+    for doc in mismatched:
+        doc['response']['extra'] = 'x'
+    generic = lazyxml.compile_builder(ksort=True, hasattr=True)
+    compiled = lazyxml.compile_builder(SCHEMA, ksort=True, hasattr=True)
+    report('dumps: 1000 responses which do not match the schema', [
+        ('generic builder', bench(lambda: [generic.dumps(doc) for doc in mismatched])),
+        ('schema compiled, fallback', bench(lambda: [compiled.dumps(doc) for doc in mismatched])),
+    ])
+
+
+if __name__ == '__main__':
+    main()
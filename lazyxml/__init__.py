@@ -5,7 +5,10 @@
 
 from __future__ import absolute_import, with_statement
 
-from . import builder, parser
+from . import backends, builder, cache as parse_cache, compression as compress, executor, parser, shards, utils
+from . import schema as schema_builder
+from .executor import imap_loads
+from .limits import LimitExceeded, Limits
 
 __title__ = 'lazyxml'
 __description__ = 'A simple xml parse and build library.'
@@ -17,7 +20,9 @@ __copyright__ = 'Copyright (c) 2014 Zonglong Fan'
 
 
 def loads(content, encoding=None, unescape=False, strip_root=True,
-          strip_attr=True, strip=True, errors='strict'):
+          strip_attr=True, strip=True, errors='strict', backend=None,
+          include=None, exclude=None, namespaces=None,
+          compact=False, lazy=False, cache=None, limits=None):
     """Load xml content to python object.
 
     >>> import lazyxml
@@ -34,6 +39,20 @@ def loads(content, encoding=None, unescape=False, strip_root=True,
     >>> lazyxml.loads(xml)
     {'bar': ['1', '2'], 'foo': 'foo'}
 
+    >>> xml = '<order><id>1</id><note>...</note><lines><line><sku>A</sku><qty>1</qty></line></lines></order>'
+    >>> lazyxml.loads(xml, include=['order/id', 'order/lines/line/sku'])
+    {'id': '1', 'lines': {'line': {'sku': 'A'}}}
+
+    >>> xml = '<resp><header><status>ok</status></header><body>...</body></resp>'
+    >>> lazyxml.loads(xml, lazy=True)['header']['status']
+    'ok'
+    >>> lazyxml.loads(xml, cache=True)['header']['status']
+    'ok'
+
+    >>> xml = '<a:demo xmlns:a="urn:a" xmlns:b="urn:b"><a:id>1</a:id><b:id>2</b:id></a:demo>'
+    >>> lazyxml.loads(xml, namespaces={'urn:a': 'a', 'urn:b': 'b'})
+    {'a:id': '1', 'b:id': '2'}
+
     >>> xml = '<root xmlns:h="http://www.w3.org/TR/html4/">&lt;demo&gt;&lt;foo&gt;foo&lt;/foo&gt;&lt;bar&gt;bar&lt;/bar&gt;&lt;/demo&gt;</root>'
     >>> lazyxml.loads(xml, unescape=True, strip_root=False)
     {'root': {'demo': {'bar': 'bar', 'foo': 'foo'}}}
@@ -45,23 +64,44 @@ def loads(content, encoding=None, unescape=False, strip_root=True,
     :param bool strip_attr: whether to strip tag attrs. Default to ``True``.
     :param bool strip: whether to strip whitespace. Default to ``True``.
     :param string errors: the xml content decode error handling scheme. Default to ``strict``.
+    :param str backend: parse backend name, such as ``etree``, ``expat`` and ``lxml``. if not set, ``consts.Default.BACKEND`` used.
+    :param list include: element paths to include, e.g. ``['order/id', 'order/lines/line/sku']``, the other elements are skipped. Default to ``None``.
+    :param list exclude: element paths to exclude. Default to ``None``.
+    :param namespaces: keep namespaces in keys, ``True`` for ``{namespace}tag`` or a dict which maps namespace to prefix for ``prefix:tag``. Default to ``None``, the namespaces are dropped.
+    :param bool compact: return :class:`~lazyxml.nodes.Node` with shared names and short values instead of dicts if ``strip_attr`` is ``False``, see :func:`lazyxml.nodes.to_dict`. Default to ``False``.
+    :param bool lazy: return a read-only mapping which converts the children on first access, ``.materialize()`` of it returns the eager result. Default to ``False``.
+    :param cache: a :class:`~lazyxml.cache.ParseCache`, or ``True`` for the shared cache, the cached results are read-only. Default to ``None``, the content is always parsed.
+    :param limits: the resource limits of the document, a :class:`~lazyxml.limits.Limits` or a dict of its arguments, e.g. ``{'max_bytes': 1 << 20, 'max_depth': 64}``. :class:`~lazyxml.limits.LimitExceeded` is raised as soon as a limit is crossed. Default to ``None``, unlimited.
     :rtype: dict
 
     .. versionchanged:: 1.2.1
         The ``strip_attr`` option supported to decide whether return the element attributes for parse result.
+
+    .. versionchanged:: 1.4
+        The ``backend``, ``include``, ``exclude``, ``namespaces``, ``compact``, ``lazy``, ``cache`` and ``limits`` options supported.
     """
-    return parser.Parser(encoding=encoding, unescape=unescape,
-                         strip_root=strip_root, strip_attr=strip_attr,
-                         strip=strip, errors=errors).xml2object(content)
+    options = dict(encoding=encoding, unescape=unescape, strip_root=strip_root,
+                   strip_attr=strip_attr, strip=strip, errors=errors,
+                   backend=backend, include=include, exclude=exclude,
+                   namespaces=namespaces, compact=compact, lazy=lazy, limits=limits)
+    if cache:
+        if cache is True:
+            cache = parse_cache.get_default_cache()
+        return cache.loads(content, options)
+    return parser.Parser(**options).xml2object(content)
 
 
 def load(fp, encoding=None, unescape=False, strip_root=True,
-         strip_attr=True, strip=True, errors='strict'):
+         strip_attr=True, strip=True, errors='strict', backend=None,
+         include=None, exclude=None, namespaces=None,
+         compact=False, lazy=False, cache=None, limits=None, mmap=False, compression=None):
     """Load xml content from file and convert to python object.
 
     >>> import lazyxml
     >>> with open('demo.xml', 'rb') as fp:
     >>>     lazyxml.load(fp)
+    >>> lazyxml.load('demo.xml', mmap=True)
+    >>> lazyxml.load('demo.xml.gz')
 
     >>> from cStringIO import StringIO
     >>> buf = StringIO('<?xml version="1.0" encoding="utf-8"?><demo><foo><![CDATA[<foo>]]></foo><bar><![CDATA[1]]></bar><bar><![CDATA[2]]></bar></demo>')
@@ -69,22 +109,309 @@ def load(fp, encoding=None, unescape=False, strip_root=True,
     {'bar': ['1', '2'], 'foo': '<foo>'}
     >>> buf.close()
 
-    :param fp: a file or file-like object that support ``.read()`` to read the xml content
+    :param fp: a file or file-like object that support ``.read()`` to read the xml content, or a filename
     :param str encoding: xml content encoding. if not set, will guess from xml header declare if possible.
     :param bool unescape: whether to unescape xml html entity character. Default to ``False``.
     :param bool strip_root: whether to strip root. Default to ``True``.
     :param bool strip_attr: whether to strip tag attrs. Default to ``True``.
     :param bool strip: whether to strip whitespace. Default to ``True``.
     :param string errors: the xml content decode error handling scheme. Default to ``strict``.
+    :param str backend: parse backend name, such as ``etree``, ``expat`` and ``lxml``. if not set, ``consts.Default.BACKEND`` used.
+    :param list include: element paths to include, e.g. ``['order/id', 'order/lines/line/sku']``, the other elements are skipped. Default to ``None``.
+    :param list exclude: element paths to exclude. Default to ``None``.
+    :param namespaces: keep namespaces in keys, ``True`` for ``{namespace}tag`` or a dict which maps namespace to prefix for ``prefix:tag``. Default to ``None``, the namespaces are dropped.
+    :param bool compact: return :class:`~lazyxml.nodes.Node` with shared names and short values instead of dicts if ``strip_attr`` is ``False``, see :func:`lazyxml.nodes.to_dict`. Default to ``False``.
+    :param bool lazy: return a read-only mapping which converts the children on first access, ``.materialize()`` of it returns the eager result. Default to ``False``.
+    :param cache: a :class:`~lazyxml.cache.ParseCache`, or ``True`` for the shared cache, the cached results are read-only. Default to ``None``, the content is always parsed.
+    :param limits: the resource limits of the document, a :class:`~lazyxml.limits.Limits` or a dict of its arguments, e.g. ``{'max_bytes': 1 << 20, 'max_depth': 64}``. :class:`~lazyxml.limits.LimitExceeded` is raised as soon as a limit is crossed. Default to ``None``, unlimited.
+    :param bool mmap: parse a memory mapping of the file instead of reading it to a string, so there is no copy of the file in memory. ``fp`` must be a filename or a file that support ``.fileno()``. Default to ``False``.
+    :param str compression: the compression of file, ``gzip``, ``bz2`` or ``xz`` if lzma is installed. if not set, the compressed file is detected by magic bytes. The file is decompressed as it is parsed.
     :rtype: dict
 
     .. versionchanged:: 1.2.1
         The ``strip_attr`` option supported to decide whether return the element attributes for parse result.
+
+    .. versionchanged:: 1.4
+        The ``backend``, ``include``, ``exclude``, ``namespaces``, ``compact``, ``lazy``, ``cache``, ``limits``, ``mmap`` and ``compression`` options supported, and ``fp`` can be a filename.
+    """
+    options = dict(encoding=encoding, unescape=unescape, strip_root=strip_root,
+                   strip_attr=strip_attr, strip=strip, errors=errors,
+                   backend=backend, include=include, exclude=exclude,
+                   namespaces=namespaces, compact=compact, lazy=lazy, limits=limits)
+    if not cache:
+        return parser.Parser(**options).load(fp, mmap, compression)
+    with parser.Parser.open_content(fp, mmap, compression) as content:
+        if utils.is_file(content):
+            content = content.read()
+        return loads(content, cache=cache, **options)
+
+
+def iterload(fp, record_path=None, encoding=None, unescape=False,
+             strip_root=True, strip_attr=True, strip=True, errors='strict',
+             backend=None, include=None, exclude=None, namespaces=None,
+             compact=False, limits=None, mmap=False, compression=None):
+    """Load xml content from file incrementally and iterate the records as python object.
+
+    The file is read in chunks and every record is released once it has been yielded,
+    so the memory usage does not grow with the size of the file.
+
+    >>> import lazyxml
+    >>> with open('catalog.xml', 'rb') as fp:
+    >>>     for item in lazyxml.iterload(fp, 'catalog/item'):
+    >>>         print item
+    >>> for item in lazyxml.iterload('catalog.xml', 'catalog/item', mmap=True):
+    >>>     print item
+
+    >>> from cStringIO import StringIO
+    >>> buf = StringIO('<catalog><item><id>1</id></item><item><id>2</id></item></catalog>')
+    >>> list(lazyxml.iterload(buf, 'catalog/item'))
+    [{'id': '1'}, {'id': '2'}]
+    >>> buf.close()
+
+    :param fp: a file or file-like object that support ``.read()`` to read the xml content, or a filename
+    :param str record_path: slash separated element names from the root, ``*`` matches any element. if not set, the root element is the only record.
+    :param str encoding: xml content encoding. if not set, will guess from xml header declare if possible.
+    :param bool unescape: whether to unescape xml html entity character. Default to ``False``.
+    :param bool strip_root: whether to strip the record root. Default to ``True``.
+    :param bool strip_attr: whether to strip tag attrs. Default to ``True``.
+    :param bool strip: whether to strip whitespace. Default to ``True``.
+    :param string errors: the xml content decode error handling scheme. Default to ``strict``.
+    :param str backend: parse backend name, such as ``etree``, ``expat`` and ``lxml``. if not set, ``consts.Default.BACKEND`` used.
+    :param list include: element paths from the record element to include, e.g. ``['item/id']``, the other elements are skipped. Default to ``None``.
+    :param list exclude: element paths to exclude. Default to ``None``.
+    :param namespaces: keep namespaces in keys, ``True`` for ``{namespace}tag`` or a dict which maps namespace to prefix for ``prefix:tag``. Default to ``None``, the namespaces are dropped.
+    :param bool compact: return :class:`~lazyxml.nodes.Node` with shared names and short values instead of dicts if ``strip_attr`` is ``False``, see :func:`lazyxml.nodes.to_dict`. Default to ``False``.
+    :param limits: the resource limits of the document, a :class:`~lazyxml.limits.Limits` or a dict of its arguments, e.g. ``{'max_bytes': 1 << 20, 'max_depth': 64}``. :class:`~lazyxml.limits.LimitExceeded` is raised as soon as a limit is crossed. Default to ``None``, unlimited.
+    :param bool mmap: feed the slices of a memory mapping of the file instead of reading it. ``fp`` must be a filename or a file that support ``.fileno()``. Default to ``False``.
+    :param str compression: the compression of file, ``gzip``, ``bz2`` or ``xz`` if lzma is installed. if not set, the compressed file is detected by magic bytes. The file is decompressed as it is parsed.
+    :rtype: generator
+
+    .. versionadded:: 1.4
+    """
+    return parser.Parser(encoding=encoding, unescape=unescape,
+                         strip_root=strip_root, strip_attr=strip_attr,
+                         strip=strip, errors=errors,
+                         backend=backend, include=include,
+                         exclude=exclude, namespaces=namespaces,
+                         compact=compact, limits=limits).iterparse(fp, record_path, mmap, compression)
+
+
+def loads_columnar(content, record_path, columns, encoding=None,
+                   unescape=False, strip=True, errors='strict', backend=None,
+                   namespaces=None, use_numpy=True, limits=None):
+    """Load the records of xml content to typed columns.
+
+    No python object is built for records, the texts of every column are converted at once
+    to an :class:`array.array`, or a numpy array if numpy is installed.
+
+    >>> import lazyxml
+    >>> xml = '<rows><row id="1"><price>1.5</price><qty>2</qty></row><row id="2"><price>3</price><qty>4</qty></row></rows>'
+    >>> lazyxml.loads_columnar(xml, 'rows/row', {'@id': str, 'price': float, 'qty': int}, use_numpy=False)
+    {'@id': ['1', '2'], 'price': array('d', [1.5, 3.0]), 'qty': array('l', [2, 4])}
+
+    :param content: xml content, or a file or file-like object that support ``.read()`` to read the xml content
+    :param str record_path: slash separated element names from the root, ``*`` matches any element.
+    :param columns: a dict of column name to type such as ``int``, ``float``, ``bool`` and ``str``, or a list of column names of ``str`` type.
+        A column name is a slash separated element path from the record element, the last name can be an ``@attribute``.
+    :param str encoding: xml content encoding. if not set, will guess from xml header declare if possible.
+    :param bool unescape: whether to unescape xml html entity character. Default to ``False``.
+    :param bool strip: whether to strip whitespace. Default to ``True``.
+    :param string errors: the xml content decode error handling scheme. Default to ``strict``.
+    :param str backend: parse backend name, such as ``etree``, ``expat`` and ``lxml``. if not set, ``consts.Default.BACKEND`` used.
+    :param namespaces: keep namespaces in keys, ``True`` for ``{namespace}tag`` or a dict which maps namespace to prefix for ``prefix:tag``. Default to ``None``, the namespaces are dropped.
+    :param bool use_numpy: build numpy arrays if numpy is installed. Default to ``True``.
+    :param limits: the resource limits of the document, a :class:`~lazyxml.limits.Limits` or a dict of its arguments, e.g. ``{'max_bytes': 1 << 20, 'max_depth': 64}``. :class:`~lazyxml.limits.LimitExceeded` is raised as soon as a limit is crossed. Default to ``None``, unlimited.
+    :rtype: dict
+
+    .. versionadded:: 1.4
+    """
+    return parser.Parser(encoding=encoding, unescape=unescape, strip=strip,
+                         errors=errors, backend=backend,
+                         namespaces=namespaces, limits=limits).xml2columns(content, columns, record_path, use_numpy)
+
+
+def aloads(content, encoding=None, unescape=False, strip_root=True,
+           strip_attr=True, strip=True, errors='strict', backend=None,
+           include=None, exclude=None, namespaces=None, compact=False,
+           limits=None, workers=None, callback=None):
+    """Load xml content to python object in the shared thread pool of aloads.
+
+    At most ``workers`` contents are parsed at once by the threads of the pool, the others wait
+    in queue, so the caller (e.g. an event loop) is never blocked by the parse. The pool is apart
+    from the thread pool of :func:`loads_many`, see :func:`lazyxml.executor.apply_async`.
+
+    >>> import lazyxml
+    >>> result = lazyxml.aloads('<demo><foo>foo</foo><bar>bar</bar></demo>')
+    >>> result.get()
+    {'bar': 'bar', 'foo': 'foo'}
+
+    .. note::
+        There is no ``aload`` of a stream reader which yields the records as an async iterator,
+        lazyxml only supports Python 2.7 which has no asyncio. To parse the content while it is
+        being received, feed the chunks to :meth:`lazyxml.parser.Parser.feed` from the data
+        handler of the stream, it returns the records completed by every chunk, and call
+        :meth:`lazyxml.parser.Parser.close` at the end of the stream.
+
+    :param str content: xml content.
+    :param str encoding: xml content encoding. if not set, will guess from xml header declare if possible.
+    :param bool unescape: whether to unescape xml html entity character. Default to ``False``.
+    :param bool strip_root: whether to strip root. Default to ``True``.
+    :param bool strip_attr: whether to strip tag attrs. Default to ``True``.
+    :param bool strip: whether to strip whitespace. Default to ``True``.
+    :param string errors: the xml content decode error handling scheme. Default to ``strict``.
+    :param str backend: parse backend name, such as ``etree``, ``expat`` and ``lxml``. if not set, ``consts.Default.BACKEND`` used.
+    :param list include: element paths to include, e.g. ``['order/id', 'order/lines/line/sku']``, the other elements are skipped. Default to ``None``.
+    :param list exclude: element paths to exclude. Default to ``None``.
+    :param namespaces: keep namespaces in keys, ``True`` for ``{namespace}tag`` or a dict which maps namespace to prefix for ``prefix:tag``. Default to ``None``, the namespaces are dropped.
+    :param bool compact: return :class:`~lazyxml.nodes.Node` with shared names and short values instead of dicts if ``strip_attr`` is ``False``, see :func:`lazyxml.nodes.to_dict`. Default to ``False``.
+    :param limits: the resource limits of the document, a :class:`~lazyxml.limits.Limits` or a dict of its arguments, e.g. ``{'max_bytes': 1 << 20, 'max_depth': 64}``. :class:`~lazyxml.limits.LimitExceeded` is raised as soon as a limit is crossed. Default to ``None``, unlimited.
+    :param int workers: the maximum number of parses running at once, see :func:`lazyxml.executor.apply_async`. if not set, ``consts.Default.WORKERS`` used.
+    :param callback: a callable called with the python object when the parse succeeds.
+    :rtype: :class:`multiprocessing.pool.AsyncResult`
+
+    .. versionadded:: 1.4
+    """
+    kwargs = dict(encoding=encoding, unescape=unescape, strip_root=strip_root,
+                  strip_attr=strip_attr, strip=strip, errors=errors,
+                  backend=backend, include=include, exclude=exclude,
+                  namespaces=namespaces, compact=compact, limits=limits)
+    return executor.apply_async('thread', loads, (content,), kwargs, callback, workers, executor.ALOADS_POOL)
+
+
+def loads_many(contents, encoding=None, unescape=False, strip_root=True,
+               strip_attr=True, strip=True, errors='strict', backend=None,
+               include=None, exclude=None, namespaces=None, compact=False,
+               limits=None, workers=None, executor='process',
+               chunksize=None, ordered=True):
+    """Load many xml contents to python objects in the shared process or thread pool.
+
+    The contents are sent to the warm workers in batches. The error of a content is returned
+    in place of its result instead of aborting the others.
+
+    >>> import lazyxml
+    >>> list(lazyxml.loads_many(['<demo><foo>1</foo></demo>', '<demo>', '<demo><foo>2</foo></demo>']))
+    [{'foo': '1'}, ParseError('no element found: line 1, column 6',), {'foo': '2'}]
+    >>> sorted(lazyxml.loads_many(['<demo><foo>1</foo></demo>', '<demo><foo>2</foo></demo>'], ordered=False))
+    [(0, {'foo': '1'}), (1, {'foo': '2'})]
+
+    :param contents: an iterable of xml contents.
+    :param str encoding: xml content encoding. if not set, will guess from xml header declare if possible.
+    :param bool unescape: whether to unescape xml html entity character. Default to ``False``.
+    :param bool strip_root: whether to strip root. Default to ``True``.
+    :param bool strip_attr: whether to strip tag attrs. Default to ``True``.
+    :param bool strip: whether to strip whitespace. Default to ``True``.
+    :param string errors: the xml content decode error handling scheme. Default to ``strict``.
+    :param str backend: parse backend name, such as ``etree``, ``expat`` and ``lxml``. if not set, ``consts.Default.BACKEND`` used.
+    :param list include: element paths to include, e.g. ``['order/id', 'order/lines/line/sku']``, the other elements are skipped. Default to ``None``.
+    :param list exclude: element paths to exclude. Default to ``None``.
+    :param namespaces: keep namespaces in keys, ``True`` for ``{namespace}tag`` or a dict which maps namespace to prefix for ``prefix:tag``. Default to ``None``, the namespaces are dropped.
+    :param bool compact: return :class:`~lazyxml.nodes.Node` with shared names and short values instead of dicts if ``strip_attr`` is ``False``, see :func:`lazyxml.nodes.to_dict`. Default to ``False``.
+    :param limits: the resource limits of the document, a :class:`~lazyxml.limits.Limits` or a dict of its arguments, e.g. ``{'max_bytes': 1 << 20, 'max_depth': 64}``. :class:`~lazyxml.limits.LimitExceeded` is raised as soon as a limit is crossed. Default to ``None``, unlimited.
+    :param int workers: the number of workers. if not set, ``consts.Default.WORKERS`` used.
+    :param str executor: ``process`` or ``thread``. Default to ``process``.
+    :param int chunksize: the number of contents sent to a worker at once. if not set, ``consts.Default.BATCH_SIZE`` used.
+    :param bool ordered: yield results in input order, or ``(index, result)`` pairs in completion order. Default to ``True``.
+    :rtype: generator
+
+    .. versionadded:: 1.4
+    """
+    options = dict(encoding=encoding, unescape=unescape, strip_root=strip_root,
+                   strip_attr=strip_attr, strip=strip, errors=errors,
+                   backend=backend, include=include, exclude=exclude,
+                   namespaces=namespaces, compact=compact, limits=limits)
+    return imap_loads(contents, options, workers=workers, executor=executor,
+                      chunksize=chunksize, ordered=ordered)
+
+
+def load_parallel(path, record_tag, encoding=None, unescape=False,
+                  strip_root=True, strip_attr=True, strip=True, errors='strict',
+                  backend=None, include=None, exclude=None, namespaces=None,
+                  compact=False, limits=None, workers=None, ordered=True, shard_size=None):
+    """Load the records of a large xml file in parallel by the shared process pool.
+
+    The file is split at record boundaries by a scan of tags, every shard is wrapped in the
+    envelope of the document, the xml declaration and the start tags of the ancestors of
+    records with their namespace declarations, and parsed by a worker process. The records
+    must not be nested in records of the same tag, see :mod:`lazyxml.shards`.
+
+    >>> import lazyxml
+    >>> for item in lazyxml.load_parallel('catalog.xml', 'item', workers=8):
+    >>>     print item
+
+    :param str path: the xml file path.
+    :param str record_tag: the raw tag of records in the document, e.g. ``item`` or ``ns:item``.
+    :param str encoding: xml content encoding. if not set, will guess from xml header declare if possible.
+    :param bool unescape: whether to unescape xml html entity character. Default to ``False``.
+    :param bool strip_root: whether to strip the record root. Default to ``True``.
+    :param bool strip_attr: whether to strip tag attrs. Default to ``True``.
+    :param bool strip: whether to strip whitespace. Default to ``True``.
+    :param string errors: the xml content decode error handling scheme. Default to ``strict``.
+    :param str backend: parse backend name, such as ``etree``, ``expat`` and ``lxml``. if not set, ``consts.Default.BACKEND`` used.
+    :param list include: element paths from the record element to include, e.g. ``['item/id']``, the other elements are skipped. Default to ``None``.
+    :param list exclude: element paths to exclude. Default to ``None``.
+    :param namespaces: keep namespaces in keys, ``True`` for ``{namespace}tag`` or a dict which maps namespace to prefix for ``prefix:tag``. Default to ``None``, the namespaces are dropped.
+    :param bool compact: return :class:`~lazyxml.nodes.Node` with shared names and short values instead of dicts if ``strip_attr`` is ``False``, see :func:`lazyxml.nodes.to_dict`. Default to ``False``.
+    :param limits: the resource limits of every shard, a :class:`~lazyxml.limits.Limits` or a dict of its arguments, e.g. ``{'max_bytes': 1 << 20, 'max_depth': 64}``. :class:`~lazyxml.limits.LimitExceeded` is raised as soon as a limit is crossed. Default to ``None``, unlimited.
+    :param int workers: the number of worker processes. if not set, ``consts.Default.WORKERS`` used.
+    :param bool ordered: yield records in document order, or the records of every shard as soon as it is parsed. Default to ``True``.
+    :param int shard_size: the approximate size of a shard in bytes. if not set, the file is split into four shards per worker of at most ``consts.Default.SHARD_SIZE``.
+    :rtype: generator
+
+    .. versionadded:: 1.4
+    """
+    options = dict(encoding=encoding, unescape=unescape, strip_root=strip_root,
+                   strip_attr=strip_attr, strip=strip, errors=errors,
+                   backend=backend, include=include, exclude=exclude,
+                   namespaces=namespaces, compact=compact, limits=limits)
+    return shards.imap_shards(path, record_tag, options, workers=workers,
+                              ordered=ordered, shard_size=shard_size)
+
+
+def compile_parser(**options):
+    """Compile a reusable parser whose options are validated and prepared once.
+
+    The compiled parser keeps no state of calls, so an instance can be shared by threads.
+
+    >>> import lazyxml
+    >>> parser = lazyxml.compile_parser(strip_root=False, backend='expat')
+    >>> parser.loads('<demo><foo>foo</foo></demo>')
+    {u'demo': {u'foo': u'foo'}}
+
+    :param options: the options of :func:`loads`, and ``record_path`` of :meth:`~lazyxml.parser.CompiledParser.iterload`.
+    :rtype: :class:`~lazyxml.parser.CompiledParser`
+    :raise ValueError: if an option is invalid.
+
+    .. versionadded:: 1.4
+    """
+    return parser.CompiledParser(**options)
+
+
+def compile_builder(schema=None, **options):
+    """Compile a reusable builder whose options are validated and prepared once.
+
+    The compiled builder keeps no state of calls, so an instance can be shared by threads.
+    If ``schema`` is set, the documents of the shape are dumped by python code generated
+    for it, and the others by the generic builder, see :mod:`lazyxml.schema`.
+
+    >>> import lazyxml
+    >>> builder = lazyxml.compile_builder(header_declare=False)
+    >>> builder.dumps({'demo': {'foo': 1}})
+    u'<demo><foo><![CDATA[1]]></foo></demo>'
+
+    >>> builder = lazyxml.compile_builder({'demo': {'foo': int, 'bar': [str]}}, header_declare=False)
+    >>> builder.dumps({'demo': {'foo': 1, 'bar': ['a', 'b']}})
+    u'<demo><bar><![CDATA[a]]></bar><bar><![CDATA[b]]></bar><foo><![CDATA[1]]></foo></demo>'
+
+    :param schema: the schema of data, e.g. ``{'user': {'id': int, 'tags': [str]}}``. Default to ``None``.
+    :param options: the options of :func:`dumps`
+    :rtype: :class:`~lazyxml.builder.CompiledBuilder`, or :class:`~lazyxml.schema.SchemaBuilder` if ``schema`` is set.
+    :raise ValueError: if the schema or an option is invalid.
+
+    .. versionadded:: 1.4
     """
-    content = fp.read()
-    return loads(content, encoding=encoding, unescape=unescape,
-                 strip_root=strip_root, strip_attr=strip_attr, strip=strip,
-                 errors=errors)
+    if schema is not None:
+        return schema_builder.SchemaBuilder(schema, **options)
+    return builder.CompiledBuilder(**options)
 
 
 def dumps(obj, encoding=None, header_declare=True, version=None, root=None,
@@ -144,14 +471,111 @@ def dumps(obj, encoding=None, header_declare=True, version=None, root=None,
                            valuekey=valuekey).object2xml(obj)
 
 
+def iterdumps(obj, encoding=None, header_declare=True, version=None, root=None,
+              cdata=True, indent=None, ksort=False, reverse=False, errors='strict',
+              hasattr=False, attrkey=None, valuekey=None, chunk_size=None):
+    """Dump python object to xml as a generator of encoded chunks, e.g. the body of a WSGI response.
+
+    The iterators and generators of ``obj`` are consumed as the chunks are iterated, so the rows of
+    a database cursor are dumped with constant memory. ``''.join(...)`` of the chunks equals the encoded
+    :func:`dumps`.
+
+    >>> import lazyxml
+    >>> rows = ({'id': i} for i in xrange(3))
+    >>> list(lazyxml.iterdumps({'rows': {'row': rows}}, header_declare=False))
+    ['<rows><row><id><![CDATA[0]]></id></row><row><id><![CDATA[1]]></id></row><row><id><![CDATA[2]]></id></row></rows>']
+
+    :param obj: data for dump to xml.
+    :param str encoding: xml content encoding. if not set, ``consts.Default.ENCODING`` used.
+    :param bool header_declare: declare xml header. Default to ``True``.
+    :param str version: xml version. if not set, ``consts.Default.VERSION`` used.
+    :param str root: xml root. Default to ``None``.
+    :param bool cdata: use cdata. Default to ``True``.
+    :param str indent: xml pretty indent. Default to ``None``.
+    :param bool ksort: sort xml element keys. Default to ``False``.
+    :param bool reverse: sort xml element keys but reverse. Default to ``False``.
+    :param str errors: xml content decode error handling scheme. Default to ``strict``.
+    :param bool hasattr: data element has attributes. Default to ``False``.
+    :param str attrkey: element tag attribute identification. if not set, ``consts.Default.KEY_ATTR`` used.
+    :param str valuekey: element tag value identification. if not set, ``consts.Default.KEY_VALUE`` used.
+    :param int chunk_size: the minimal size of chunk, the last one may be shorter. if not set, ``consts.Default.CHUNK_SIZE`` used.
+    :return: the ``str`` chunks of xml content.
+    :rtype: generator
+
+    .. versionadded:: 1.4
+    """
+    return builder.Builder(encoding=encoding, header_declare=header_declare,
+                           version=version, root=root, cdata=cdata,
+                           indent=indent, ksort=ksort, reverse=reverse,
+                           errors=errors, hasattr=hasattr, attrkey=attrkey,
+                           valuekey=valuekey).object2chunks(obj, chunk_size, encoded=True)
+
+
+def adump(obj, writer, encoding=None, header_declare=True, version=None, root=None,
+          cdata=True, indent=None, ksort=False, reverse=False, errors='strict',
+          hasattr=False, attrkey=None, valuekey=None, chunk_size=None, workers=None, callback=None):
+    """Dump python object to a writer in the shared writer pool.
+
+    The encoded chunks of :func:`iterdumps` are written by ``writer.write(chunk)`` and followed by
+    ``writer.drain()`` if the writer has it, which blocks the worker until the buffer of writer is
+    drained, so the caller (e.g. an event loop) is never blocked by the dump and a slow consumer is
+    never flooded. The writers run in a thread pool of their own, the slow consumers never stall
+    :func:`aloads`, see :func:`lazyxml.executor.write_async`.
+
+    The iterators and generators of ``obj``, e.g. the rows of a database cursor, are consumed by
+    the worker as the chunks are written.
+
+    .. note::
+        There is no async iterable on Python 2.7, the data which is produced by an event loop
+        has to be collected first, or be read by a blocking generator in the worker.
+
+    >>> import lazyxml
+    >>> from cStringIO import StringIO
+    >>> buf = StringIO()
+    >>> result = lazyxml.adump({'demo': {'foo': 1}}, buf, header_declare=False)
+    >>> result.get()
+    37
+    >>> buf.getvalue()
+    '<demo><foo><![CDATA[1]]></foo></demo>'
+
+    :param obj: data for dump to xml.
+    :param writer: a file-like object that support ``.write()`` of ``str``, and optional ``.drain()`` which blocks until the written data is flushed.
+    :param str encoding: xml content encoding. if not set, ``consts.Default.ENCODING`` used.
+    :param bool header_declare: declare xml header. Default to ``True``.
+    :param str version: xml version. if not set, ``consts.Default.VERSION`` used.
+    :param str root: xml root. Default to ``None``.
+    :param bool cdata: use cdata. Default to ``True``.
+    :param str indent: xml pretty indent. Default to ``None``.
+    :param bool ksort: sort xml element keys. Default to ``False``.
+    :param bool reverse: sort xml element keys but reverse. Default to ``False``.
+    :param str errors: xml content decode error handling scheme. Default to ``strict``.
+    :param bool hasattr: data element has attributes. Default to ``False``.
+    :param str attrkey: element tag attribute identification. if not set, ``consts.Default.KEY_ATTR`` used.
+    :param str valuekey: element tag value identification. if not set, ``consts.Default.KEY_VALUE`` used.
+    :param int chunk_size: the minimal size of chunk written at once. if not set, ``consts.Default.CHUNK_SIZE`` used.
+    :param int workers: the maximum number of dumps running at once, see :func:`lazyxml.executor.write_async`. if not set, ``consts.Default.WORKERS`` used.
+    :param callback: a callable called with the number of bytes written when the dump succeeds.
+    :return: the result of the number of bytes written.
+    :rtype: :class:`multiprocessing.pool.AsyncResult`
+
+    .. versionadded:: 1.4
+    """
+    chunks = iterdumps(obj, encoding=encoding, header_declare=header_declare,
+                       version=version, root=root, cdata=cdata, indent=indent,
+                       ksort=ksort, reverse=reverse, errors=errors, hasattr=hasattr,
+                       attrkey=attrkey, valuekey=valuekey, chunk_size=chunk_size)
+    return executor.write_async(chunks, writer, callback=callback, workers=workers)
+
+
 def dump(obj, fp, encoding=None, header_declare=True, version=None, root=None,
          cdata=True, indent=None, ksort=False, reverse=False, errors='strict',
-         hasattr=False, attrkey=None, valuekey=None):
+         hasattr=False, attrkey=None, valuekey=None, compression=None):
     """Dump python object to file.
 
     >>> import lazyxml
     >>> data = {'demo': {'foo': 1, 'bar': 2}}
     >>> lazyxml.dump(data, 'dump.xml')
+    >>> lazyxml.dump(data, 'dump.xml.gz')
     >>> with open('dump-fp.xml', 'w') as fp:
     >>>     lazyxml.dump(data, fp)
 
@@ -177,17 +601,18 @@ def dump(obj, fp, encoding=None, header_declare=True, version=None, root=None,
     :param bool hasattr: data element has attributes. Default to ``False``.
     :param str attrkey: element tag attribute identification. if not set, ``consts.Default.KEY_ATTR`` used.
     :param str valuekey: element tag value identification. if not set, ``consts.Default.KEY_VALUE`` used.
+    :param str compression: the compression of file, ``gzip``, ``bz2`` or ``xz`` if lzma is installed. if not set, detected by the extension of filename or ``fp.name``, e.g. ``.gz``.
 
     .. versionchanged:: 1.2
         The `fp` is a filename of string before this. It can now be a file or file-like object that support ``.write()`` to write the xml content.
+
+    .. versionchanged:: 1.4
+        The ``compression`` option supported. The xml content is written in chunks as ``obj`` is walked,
+        the iterators and generators of ``obj`` are consumed as they are written, see :func:`iterdumps`.
     """
-    xml = dumps(obj, encoding=encoding, header_declare=header_declare,
-                version=version, root=root, cdata=cdata, indent=indent,
-                ksort=ksort, reverse=reverse, errors=errors, hasattr=hasattr,
-                attrkey=attrkey, valuekey=valuekey)
-    func = getattr(fp, 'write', None)
-    if func and callable(func):
-        func(xml)
-    else:
-        with open(fp, 'w') as fobj:
-            fobj.write(xml)
+    chunks = builder.Builder(encoding=encoding, header_declare=header_declare,
+                             version=version, root=root, cdata=cdata,
+                             indent=indent, ksort=ksort, reverse=reverse,
+                             errors=errors, hasattr=hasattr, attrkey=attrkey,
+                             valuekey=valuekey).object2chunks(obj)
+    compress.write_file(fp, chunks, compression)
@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+
+"""Parse backends of :class:`~lazyxml.parser.Parser`.
+
+A backend provides the xml tokenizer. Backends that build element tree are converted by
+:meth:`~lazyxml.parser.Parser.parse` and :meth:`~lazyxml.parser.Parser.parse_full`, the others drive
+a parser target such as :class:`~lazyxml.parser.RecordBuilder` to build python object directly.
+
+.. versionadded:: 1.4
+"""
+
+from xml.parsers import expat
+
+try:
+    import xml.etree.cElementTree as ET
+except ImportError:
+    import xml.etree.ElementTree as ET
+
+try:
+    from lxml import etree as lxml_etree
+except ImportError:
+    lxml_etree = None
+
+from .consts import Default
+
+BACKENDS = {}
+
+
+def register_backend(backend):
+    """Register a parse backend class by its ``name``.
+
+    :param backend: a :class:`Backend` subclass
+    :return: the backend class, so it can be used as class decorator.
+    """
+    BACKENDS[backend.name] = backend
+    return backend
+
+
+def get_backend(name):
+    """Get a parse backend instance by name.
+
+    :param str name: backend name
+    :rtype: Backend
+    """
+    try:
+        return BACKENDS[name]()
+    except KeyError:
+        raise ValueError('unknown parse backend: {!r}, available: {}'.format(
+            name, ', '.join(sorted(BACKENDS))))
+
+
+class Backend(object):
+    """Base class of parse backends.
+    """
+
+    #: backend name used by ``Parser(backend=...)``.
+    name = None
+    #: whether :meth:`fromstring` builds element tree.
+    element_tree = True
+
+    def fromstring(self, content):
+        """Parse xml content to element tree.
+
+        :param content: xml content
+        :return: the root element
+        """
+        raise NotImplementedError
+
+    def create_parser(self, target=None):
+        """Create an incremental parser which supports ``.feed()`` and ``.close()``.
+
+        :param target: parser target which has ``start(tag, attrib)``, ``data(data)``, ``end(tag)``
+            and ``close()`` methods, the tag is in ``{namespace}tag`` notation. if not set,
+            the parser builds element tree and ``.close()`` returns the root element, which
+            is only supported by the backends building element tree.
+        """
+        raise NotImplementedError
+
+    def iterparse(self, chunks):
+        """Build element tree from the chunks of xml content and iterate its events as they are parsed.
+
+        Only supported by the backends building element tree.
+
+        :param chunks: the chunks of xml content in the native encoding of xml parser
+        :return: an iterator of the ``('start', element)`` and ``('end', element)`` events, which has
+            the root element as ``.root`` when it is exhausted, like :func:`xml.etree.ElementTree.iterparse`.
+        """
+        raise NotImplementedError
+
+
+@register_backend
+class ElementTreeBackend(Backend):
+    """Parse backend of :mod:`xml.etree.cElementTree`.
+    """
+
+    name = 'etree'
+
+    def fromstring(self, content):
+        return ET.fromstring(content)
+
+    def create_parser(self, target=None):
+        if target is None:
+            return ET.XMLParser()
+        return ET.XMLParser(target=target)
+
+    def iterparse(self, chunks):
+        return ET.iterparse(ChunkReader(chunks), ('start', 'end'))
+
+
+class ChunkReader(object):
+    """File-like object which reads an iterable of chunks a chunk per ``.read()``.
+    """
+
+    def __init__(self, chunks):
+        self.__chunks = iter(chunks)
+
+    def read(self, size=-1):
+        return next(self.__chunks, '')
+
+
+@register_backend
+class ExpatBackend(Backend):
+    """Parse backend of :mod:`xml.parsers.expat` which builds no element tree.
+    """
+
+    name = 'expat'
+    element_tree = False
+
+    def create_parser(self, target):
+        return ExpatParser(target)
+
+
+class ExpatParser(object):
+    """Incremental expat parser which drives parser target in ``{namespace}tag`` notation.
+
+    Targets which declare ``expat_names = True`` get the ``namespace}tag`` names of expat without
+    conversion.
+    """
+
+    def __init__(self, target):
+        self.__target = target
+        self.__parser = parser = expat.ParserCreate(None, '}')
+        parser.buffer_text = True
+        parser.CharacterDataHandler = target.data
+        if getattr(target, 'expat_names', False):
+            parser.StartElementHandler = target.start
+            parser.EndElementHandler = target.end
+        else:
+            parser.StartElementHandler = self.start
+            parser.EndElementHandler = self.end
+
+    def start(self, tag, attrib):
+        if '}' in tag:
+            tag = '{' + tag
+        if attrib:
+            for key in [key for key in attrib if '}' in key]:
+                attrib['{' + key] = attrib.pop(key)
+        self.__target.start(tag, attrib)
+
+    def end(self, tag):
+        if '}' in tag:
+            tag = '{' + tag
+        self.__target.end(tag)
+
+    def feed(self, data, final=False):
+        if isinstance(data, unicode):
+            data = data.encode(Default.ENCODING)
+        try:
+            self.__parser.Parse(data, final)
+        except expat.error as e:
+            err = ET.ParseError(str(e))
+            err.code = e.code
+            err.position = (e.lineno, e.offset)
+            raise err
+
+    def close(self):
+        self.feed('', True)
+        return self.__target.close()
+
+
+if lxml_etree is not None:
+    @register_backend
+    class LxmlBackend(Backend):
+        """Parse backend of :mod:`lxml.etree`, available if lxml is installed.
+        """
+
+        name = 'lxml'
+
+        @staticmethod
+        def create_xml_parser(**kwargs):
+            return lxml_etree.XMLParser(remove_comments=True, remove_pis=True,
+                                        huge_tree=True, **kwargs)
+
+        def fromstring(self, content):
+            if isinstance(content, unicode):
+                content = content.encode(Default.ENCODING)
+            return lxml_etree.fromstring(content, self.create_xml_parser())
+
+        def create_parser(self, target=None):
+            return self.create_xml_parser(target=target)
+
+        def iterparse(self, chunks):
+            return LxmlIterparse(lxml_etree.XMLPullParser(
+                ('start', 'end'), remove_comments=True, remove_pis=True, huge_tree=True), chunks)
+
+
+    class LxmlIterparse(object):
+        """Iterator of the events of a :class:`lxml.etree.XMLPullParser` fed by the chunks of xml content.
+        """
+
+        root = None
+
+        def __init__(self, parser, chunks):
+            self.__parser = parser
+            self.__chunks = chunks
+
+        def __iter__(self):
+            parser = self.__parser
+            for chunk in self.__chunks:
+                parser.feed(chunk)
+                for event in parser.read_events():
+                    yield event
+            self.root = parser.close()
+            for event in parser.read_events():
+                yield event
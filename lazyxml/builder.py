@@ -1,12 +1,32 @@
 # -*- coding: utf-8 -*-
 
-import cgi
+import codecs
 import collections
+import itertools
 import types
 
-from . import utils
+from . import compression as compress, escaping, utils
 from .consts import Default
 
+#: the types of scalar values, which are neither mapping nor iterable of values.
+SCALAR_TYPES = frozenset([str, unicode, int, long, float, bool])
+
+
+class IndentTable(dict):
+    """The indents of depths, an indent is computed on the first lookup of its depth.
+
+    >>> IndentTable('  ')[2]
+    '\\n    '
+    """
+
+    def __init__(self, indent=None):
+        super(IndentTable, self).__init__()
+        self.indent = indent
+
+    def __missing__(self, depth):
+        indent = self[depth] = ('\n%s' % (self.indent * depth)) if self.indent else ''
+        return indent
+
 
 class Builder(object):
     """Simple xml builder
@@ -42,7 +62,7 @@ class Builder(object):
         self.__hasattr = hasattr
         self.__attrkey = attrkey or Default.KEY_ATTR
         self.__valuekey = valuekey or Default.KEY_VALUE
-        self.__tree = []
+        self.__header = self.build_xml_header(self.__encoding, self.__version) if header_declare else ''
 
     def dict2xml(self, data):
         """Convert dict to xml.
@@ -61,10 +81,11 @@ class Builder(object):
         :rtype: str or unicode
 
         .. versionadded:: 1.2
+
+        .. versionchanged:: 1.4
+            The builder keeps no state of the call, so it can be reused and shared by threads.
         """
-        if self.__header_declare:
-            self.__tree.append(
-                self.build_xml_header(self.__encoding, self.__version))
+        tree = [self.__header]
 
         root = self.__root
         if not root:
@@ -72,13 +93,55 @@ class Builder(object):
                 'if root not specified, the data that dict object and length must be one required.'
             root, data = data.items()[0]
 
-        self.build_tree(data, root)
-        xml = unicode(''.join(self.__tree).strip())
+        self.build_tree(data, root, tree=tree)
+        xml = unicode(''.join(tree).strip())
 
         if self.__encoding != Default.ENCODING:
             xml = xml.encode(self.__encoding, errors=self.__errors)
         return xml
 
+    def object2chunks(self, data, chunk_size=None, encoded=False):
+        """Convert python object to xml chunks as the data is walked.
+
+        The fragments are joined to chunks of at least ``chunk_size`` characters, the last one may be
+        shorter. The iterators and generators of ``data`` are consumed as the chunks are iterated, so
+        a large document is never held in memory. ``''.join(...)`` of chunks equals :meth:`object2xml`.
+
+        :param data: data for build xml, see :meth:`object2xml`.
+        :param int chunk_size: the minimal size of chunk. if not set, ``consts.Default.CHUNK_SIZE`` used.
+        :param bool encoded: encode the chunks of ``consts.Default.ENCODING`` too, so they are always ``str``. Default to ``False``.
+        :return: the chunks of the same type as :meth:`object2xml`, or ``str`` if ``encoded``.
+        :rtype: iterator
+
+        .. versionadded:: 1.4
+        """
+        chunk_size = chunk_size or Default.CHUNK_SIZE
+        root = self.__root
+        if not root:
+            assert (isinstance(data, collections.Mapping) and len(data) == 1), \
+                'if root not specified, the data that dict object and length must be one required.'
+            root, data = data.items()[0]
+
+        return self.iter_chunks(data, root, chunk_size, encoded or self.__encoding != Default.ENCODING)
+
+    def iter_chunks(self, data, root, chunk_size, encode):
+        # the whitespace at the beginning and the end of document is stripped, as object2xml does
+        strip = unicode.lstrip
+        tree = [self.__header]
+        chunks, size = [], 0
+        for _ in self.iter_tree(data, root, tree=tree, batch=Default.BATCH_FRAGMENTS):
+            chunks.append(''.join(tree))
+            size += len(chunks[-1])
+            del tree[:]
+            if size >= chunk_size:
+                chunk = strip(unicode(''.join(chunks)))
+                chunks, size, strip = [], 0, unicode
+                yield chunk.encode(self.__encoding, errors=self.__errors) if encode else chunk
+        chunks.extend(tree)
+        chunk = strip(unicode(''.join(chunks))).rstrip()
+        if chunk:
+            yield chunk.encode(self.__encoding, errors=self.__errors) if encode else chunk
+
     @staticmethod
     def build_xml_header(encoding=None, version=None):
         """Build xml header include version and encoding.
@@ -86,7 +149,7 @@ class Builder(object):
         return '<?xml version="{}" encoding="{}"?>'.format(
             version or Default.VERSION, encoding or Default.ENCODING)
 
-    def build_tree(self, data, tagname, attrs=None, depth=0):
+    def build_tree(self, data, tagname, attrs=None, depth=0, tree=None):
         """Build xml tree.
 
         :param data: data for build xml.
@@ -95,35 +158,155 @@ class Builder(object):
         :type attrs: dict or None
         :param depth: element depth of the hierarchy. Default：``0``.
         :type depth: int
+        :param tree: the list which the xml fragments are appended to. if not set, a new list used.
+        :type tree: list or None
+        :return: the xml fragments
+        :rtype: list
+
+        .. versionchanged:: 1.4
+            The ``tree`` option supported. The data is walked by :meth:`iter_tree`, deep data no longer hits the recursion limit.
         """
-        if data is None:
-            data = ''
-        indent = ('\n%s' % (self.__indent * depth)) if self.__indent else ''
-        if isinstance(data, collections.Mapping):
-            if self.__hasattr and self.check_structure(data.keys()):
-                attrs, values = self.pickdata(data)
-                self.build_tree(values, tagname, attrs, depth)
+        if tree is None:
+            tree = []
+        for _ in self.iter_tree(data, tagname, attrs, depth, tree):
+            pass
+        return tree
+
+    def iter_tree(self, data, tagname, attrs=None, depth=0, tree=None, batch=None):
+        """Build xml tree with an explicit stack, as a generator which yields the fragments in batches.
+
+        The stack holds the closing tags and the iterators of the pending ``(data, tagname, attrs, depth)``
+        nodes, an iterable value is consumed only when its turn comes. The fragments are appended to
+        ``tree``, which is yielded once it has ``batch`` fragments, the caller takes them out of it.
+
+        :param data: data for build xml.
+        :param tagname: element tag name.
+        :param attrs: element attributes. Default：``None``.
+        :param depth: element depth of the hierarchy. Default：``0``.
+        :param tree: the list which the xml fragments are appended to. if not set, a new list used.
+        :param int batch: the number of fragments to yield ``tree``. if not set, it is never yielded.
+        :rtype: generator
+
+        .. versionadded:: 1.4
+        """
+        if tree is None:
+            tree = []
+        append = tree.append
+        safedata, cdata, hasattr = self.safedata, self.__cdata, self.__hasattr
+        # the escaping functions are called directly unless safedata is overridden
+        escape = None
+        if type(self).safedata is Builder.safedata:
+            escape = escaping.escape_cdata if cdata else escaping.escape_text
+        indents = IndentTable(self.__indent)
+        # the tags and the attributes are rendered once per document, bounded as the tag names are data
+        starts, ends, attr_starts = {}, {}, {}
+        cache_size = Default.TAG_CACHE_SIZE
+        stack = [iter([(data, tagname, attrs, depth)])]
+        while stack:
+            top = stack[-1]
+            if isinstance(top, basestring):
+                append(stack.pop())
+                continue
+            node = next(top, None)
+            if node is None:
+                stack.pop()
+                continue
+            data, tagname, attrs, depth = node
+            if data is None:
+                data = ''
+            cls = type(data)
+            if cls is dict or (cls not in SCALAR_TYPES and cls is not list
+                               and isinstance(data, collections.Mapping)):
+                if hasattr and self.check_structure(data.keys()):
+                    attrs, values = self.pickdata(data)
+                    stack.append(iter([(values, tagname, attrs, depth)]))
+                    continue
+                indent = indents[depth]
+                append(indent + self.cached_tag_start(tagname, attrs, starts, attr_starts, cache_size))
+                end = ends.get(tagname) if tagname.__class__ is str else None
+                if end is None:
+                    end = self.cached_tag_end(tagname, ends, cache_size)
+                stack.append(indent + end)
+                stack.append(self.iter_children(data, depth + 1))
+            elif cls is list or cls is tuple or (cls not in SCALAR_TYPES and utils.is_iterable(data)
+                                                 and not isinstance(data, types.StringTypes)):
+                stack.append(itertools.izip(
+                    data, itertools.repeat(tagname), itertools.repeat(attrs), itertools.repeat(depth)))
             else:
-                self.__tree.append(
-                    '{}{}'.format(indent, self.tag_start(tagname, attrs)))
-                iter = data.iteritems()
-                if self.__ksort:
-                    iter = sorted(iter, key=lambda x: x[0],
-                                  reverse=self.__reverse)
-                for k, v in iter:
-                    attrs = {}
-                    if (self.__hasattr and isinstance(v, collections.Mapping)
-                            and self.check_structure(v.keys())):
-                        attrs, v = self.pickdata(v)
-                    self.build_tree(v, k, attrs, depth + 1)
-                self.__tree.append('{}{}'.format(indent, self.tag_end(tagname)))
-        elif utils.is_iterable(data) and not isinstance(data, types.StringTypes):
-            for v in data:
-                self.build_tree(v, tagname, attrs, depth)
+                end = ends.get(tagname) if tagname.__class__ is str else None
+                if end is None:
+                    end = self.cached_tag_end(tagname, ends, cache_size)
+                if escape is None:
+                    text = safedata(data, cdata)
+                else:
+                    text = escape(data if cls is str or cls is unicode else escaping.to_text(data))
+                append(indents[depth] + self.cached_tag_start(tagname, attrs, starts, attr_starts, cache_size)
+                       + text + end)
+            if batch and len(tree) >= batch:
+                yield tree
+
+    def cached_tag_start(self, tagname, attrs, starts, attr_starts, cache_size):
+        """Get the started tag from the caches of tags and attributes, it is built and cached on miss.
+
+        The attributes are keyed by their items and the types of them, the equal values of different
+        types such as ``1``, ``True`` and ``1.0`` are rendered differently. The attributes of unhashable
+        values are not cached.
+        """
+        key = tagname if tagname.__class__ is str else self.tag_key(tagname)
+        if not attrs:
+            start = starts.get(key)
+            if start is None:
+                start = self.tag_start(tagname)
+                if len(starts) < cache_size:
+                    starts[key] = start
+            return start
+        try:
+            key = (key, frozenset((name, name.__class__, value, value.__class__) for name, value in attrs.iteritems()))
+            start = attr_starts.get(key)
+        except TypeError:
+            return self.tag_start(tagname, attrs)
+        if start is None:
+            start = self.tag_start(tagname, attrs)
+            if len(attr_starts) < cache_size:
+                attr_starts[key] = start
+        return start
+
+    def cached_tag_end(self, tagname, ends, cache_size):
+        """Get the ended tag from the cache of tags, it is built and cached on miss.
+        """
+        key = self.tag_key(tagname)
+        end = ends.get(key)
+        if end is None:
+            end = self.tag_end(tagname)
+            if len(ends) < cache_size:
+                ends[key] = end
+        return end
+
+    @staticmethod
+    def tag_key(tagname):
+        """Get the cache key of a tag name, the equal names of different types such as ``1`` and ``True``
+        are rendered differently, so the names other than ``str`` are keyed with their types.
+        """
+        return tagname if tagname.__class__ is str else (tagname.__class__, tagname)
+
+    def iter_children(self, data, depth):
+        """Iterate the ``(data, tagname, attrs, depth)`` nodes of the items of a mapping.
+        """
+        if self.__ksort:
+            items = sorted(data.iteritems(), key=lambda x: x[0], reverse=self.__reverse)
+            values, keys = [v for _, v in items], [k for k, _ in items]
         else:
-            self.__tree.append(indent)
-            data = self.safedata(data, self.__cdata)
-            self.__tree.append(self.build_tag(tagname, data, attrs))
+            values, keys = data.itervalues(), data.iterkeys()
+        if not self.__hasattr:
+            return itertools.izip(values, keys, itertools.repeat(None), itertools.repeat(depth))
+        return self.iter_attr_children(values, keys, depth)
+
+    def iter_attr_children(self, values, keys, depth):
+        for v, k in itertools.izip(values, keys):
+            attrs = {}
+            if isinstance(v, collections.Mapping) and self.check_structure(v.keys()):
+                attrs, v = self.pickdata(v)
+            yield v, k, attrs, depth
 
     def check_structure(self, keys):
         """Check structure availability by ``attrkey`` and ``valuekey`` option.
@@ -145,13 +328,20 @@ class Builder(object):
         """Convert xml special chars to entities.
 
         :param data: the data will be converted safe.
-        :param cdata: whether to use cdata. Default：``True``. If not, use :func:`cgi.escape` to convert data.
+        :param cdata: whether to use cdata. Default：``True``. If not, use :func:`~lazyxml.escaping.escape_text` to convert data.
         :type cdata: bool
-        :rtype: str
+        :rtype: str or unicode
+
+        .. versionchanged:: 1.4
+            ``]]>`` of data is split into two CDATA sections, the unicode data is kept unicode. The data
+            without special characters is returned without copy, see :mod:`lazyxml.escaping`.
         """
+        cls = type(data)
+        if cls is not str and cls is not unicode:
+            data = escaping.to_text(data)
         if cdata:
-            return '<![CDATA[{}]]>'.format(data)
-        return cgi.escape(str(data), True)
+            return escaping.escape_cdata(data)
+        return escaping.escape_text(data)
 
     @classmethod
     def build_tag(cls, tag, text='', attrs=None):
@@ -163,8 +353,7 @@ class Builder(object):
         :type attrs: dict or None
         :rtype: str
         """
-        return '{}{}{}'.format(cls.tag_start(tag, attrs), text,
-                               cls.tag_end(tag))
+        return '%s%s%s' % (cls.tag_start(tag, attrs), text, cls.tag_end(tag))
 
     @staticmethod
     def build_attr(attrs):
@@ -173,9 +362,12 @@ class Builder(object):
         :param attrs: tag attributes
         :type attrs: dict
         :rtype: str
+
+        .. versionchanged:: 1.4
+            The attribute values are escaped by :func:`~lazyxml.escaping.escape_attr`.
         """
         attrs = sorted(attrs.iteritems(), key=lambda x: x[0])
-        return ' '.join(['{}="{}"'.format(k, v) for k, v in attrs])
+        return ' '.join(['%s="%s"' % (k, escaping.escape_attr(escaping.to_text(v))) for k, v in attrs])
 
     @classmethod
     def tag_start(cls, tag, attrs=None):
@@ -187,8 +379,8 @@ class Builder(object):
         :rtype: str
         """
         if attrs:
-            return '<{} {}>'.format(tag, cls.build_attr(attrs))
-        return '<{}>'.format(tag)
+            return '<%s %s>' % (tag, cls.build_attr(attrs))
+        return '<%s>' % tag
 
     @staticmethod
     def tag_end(tag):
@@ -197,4 +389,70 @@ class Builder(object):
         :param tag: tag name
         :rtype: str
         """
-        return '</{}>'.format(tag)
+        return '</%s>' % tag
+
+
+class CompiledBuilder(object):
+    """Builder whose options are validated and prepared once.
+
+    It keeps no state of calls, so an instance can be reused and shared by threads.
+
+    >>> builder = CompiledBuilder(header_declare=False)
+    >>> builder.dumps({'demo': {'foo': 1}})
+    u'<demo><foo><![CDATA[1]]></foo></demo>'
+
+    .. versionadded:: 1.4
+    """
+
+    def __init__(self, **options):
+        """Constructor for CompiledBuilder.
+
+        :param options: the options of :class:`Builder`
+        :raise ValueError: if an option is invalid.
+        """
+        try:
+            codecs.lookup(options.get('encoding') or Default.ENCODING)
+            codecs.lookup_error(options.get('errors') or 'strict')
+        except LookupError as e:
+            raise ValueError(str(e))
+        indent = options.get('indent')
+        if indent is not None and not isinstance(indent, types.StringTypes):
+            raise ValueError('indent must be a string: {!r}'.format(indent))
+        if (options.get('attrkey') or Default.KEY_ATTR) == (options.get('valuekey') or Default.KEY_VALUE):
+            raise ValueError('attrkey and valuekey must be different')
+        self.__builder = Builder(**options)
+        self.__options = options
+
+    @property
+    def options(self):
+        """The options of builder.
+
+        :rtype: dict
+        """
+        return dict(self.__options)
+
+    def dumps(self, obj):
+        """Dump python object to xml, see :func:`lazyxml.dumps`.
+
+        :param obj: data for dump to xml.
+        :rtype: str
+        """
+        return self.__builder.object2xml(obj)
+
+    def iterdumps(self, obj, chunk_size=None):
+        """Dump python object to the encoded chunks of xml, see :func:`lazyxml.iterdumps`.
+
+        :param obj: data for dump to xml.
+        :param int chunk_size: the minimal size of chunk. if not set, ``consts.Default.CHUNK_SIZE`` used.
+        :rtype: generator
+        """
+        return self.__builder.object2chunks(obj, chunk_size, encoded=True)
+
+    def dump(self, obj, fp, compression=None):
+        """Dump python object to file, see :func:`lazyxml.dump`.
+
+        :param obj: data for dump to xml.
+        :param fp: a filename or a file or file-like object that support ``.write()`` to write the xml content.
+        :param str compression: the compression of file. if not set, detected by the file extension.
+        """
+        compress.write_file(fp, self.__builder.object2chunks(obj), compression)
@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+
+"""Content addressed parse cache of :func:`lazyxml.loads`.
+
+The results are keyed by the digest of the raw content and the parser options, and evicted
+in least recently used order once the entry or byte budget is exceeded. The cached results
+are frozen, so a caller can not corrupt the cache by mutating a result. The defaultdicts of
+``strip_attr=False`` results keep their defaults, and the nodes of ``compact=True`` results are
+read-only as well.
+
+.. versionadded:: 1.4
+"""
+
+import collections
+import hashlib
+import sys
+import threading
+
+from . import nodes, parser
+from .consts import Default
+
+CacheInfo = collections.namedtuple(
+    'CacheInfo', 'hits misses evictions hit_rate maxsize currsize maxbytes currbytes')
+
+
+class FrozenDict(dict):
+    """Read-only dict of cached results.
+    """
+
+    def __readonly(self, *args, **kwargs):
+        raise TypeError('cached result is read-only, copy it before modifying')
+
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = __readonly
+
+    def __copy__(self):
+        return dict(self)
+
+    copy = __copy__
+
+    def __reduce__(self):
+        return dict, (dict(self),)
+
+
+class FrozenDefaultDict(collections.defaultdict):
+    """Read-only defaultdict of cached results, a missing key gets the default without inserting it.
+    """
+
+    def __readonly(self, *args, **kwargs):
+        raise TypeError('cached result is read-only, copy it before modifying')
+
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = __readonly
+
+    def __missing__(self, key):
+        if self.default_factory is None:
+            raise KeyError(key)
+        return self.default_factory()
+
+    def __copy__(self):
+        return collections.defaultdict(self.default_factory, self)
+
+    copy = __copy__
+
+    def __reduce__(self):
+        return collections.defaultdict, (self.default_factory, dict(self))
+
+
+class FrozenList(list):
+    """Read-only list of cached results.
+    """
+
+    def __readonly(self, *args, **kwargs):
+        raise TypeError('cached result is read-only, copy it before modifying')
+
+    __setitem__ = __delitem__ = __setslice__ = __delslice__ = __iadd__ = __imul__ = __readonly
+    append = extend = insert = pop = remove = reverse = sort = __readonly
+
+    def __reduce__(self):
+        return list, (list(self),)
+
+
+class FrozenNode(nodes.Node):
+    """Read-only :class:`~lazyxml.nodes.Node` of cached results.
+    """
+
+    __slots__ = ()
+
+    def __readonly(self, *args, **kwargs):
+        raise TypeError('cached result is read-only, copy it before modifying')
+
+    __setattr__ = __delattr__ = __readonly
+
+    def __init__(self, value, attrs=None):
+        object.__setattr__(self, 'value', value)
+        object.__setattr__(self, 'attrs', attrs)
+
+    def __reduce__(self):
+        return nodes.Node, (self.value, self.attrs)
+
+
+class FrozenRoot(FrozenNode, nodes.Root):
+    """Read-only :class:`~lazyxml.nodes.Root` of cached results.
+    """
+
+    __slots__ = ()
+
+    def __reduce__(self):
+        return nodes.Root, (self.value, self.attrs)
+
+
+#: the node types to their read-only types.
+FROZEN_NODES = {nodes.Node: FrozenNode, nodes.Root: FrozenRoot}
+
+
+def freeze(obj):
+    """Convert the dicts, lists and nodes of result to read-only ones.
+
+    :param obj: parse result
+    :return: a pair of (frozen result, approximate size in bytes)
+    :rtype: tuple
+    """
+    size = 0
+    root = [obj]
+    stack = [(root, 0, obj)]
+    while stack:
+        parent, key, value = stack.pop()
+        size += sys.getsizeof(value)
+        if isinstance(value, collections.defaultdict):
+            items = value.items()
+            value = FrozenDefaultDict(value.default_factory, items)
+            stack.extend((value, k, v) for k, v in items)
+        elif isinstance(value, dict):
+            items = value.items()
+            value = FrozenDict(items)
+            stack.extend((value, k, v) for k, v in items)
+        elif isinstance(value, list):
+            value = FrozenList(value)
+            stack.extend((value, i, v) for i, v in enumerate(value))
+        elif isinstance(value, nodes.Node):
+            if value.attrs:
+                size += sum(sys.getsizeof(s) for s in value.attrs)
+            value = FROZEN_NODES[type(value)](value.value, value.attrs)
+            stack.append((value, 'value', value.value))
+        else:
+            continue
+        if isinstance(parent, nodes.Node):
+            object.__setattr__(parent, 'value', value)
+        elif isinstance(parent, dict):
+            dict.__setitem__(parent, key, value)
+        else:
+            list.__setitem__(parent, key, value)
+    return root[0], size
+
+
+def options_key(options):
+    """Get a hashable key of parser options.
+
+    :param dict options: the options of :class:`~lazyxml.parser.Parser`
+    :rtype: tuple
+    """
+    items = []
+    for name, value in sorted(options.iteritems()):
+        if isinstance(value, dict):
+            value = tuple(sorted(value.iteritems()))
+        elif isinstance(value, list):
+            value = tuple(value)
+        items.append((name, value))
+    return tuple(items)
+
+
+class ParseCache(object):
+    """Thread-safe LRU cache of parse results with entry and byte budgets.
+
+    >>> cache = ParseCache(maxsize=128)
+    >>> cache.loads('<demo><foo>1</foo></demo>', {})
+    {'foo': '1'}
+    >>> cache.loads('<demo><foo>1</foo></demo>', {})
+    {'foo': '1'}
+    >>> cache.cache_info().hits
+    1
+    """
+
+    def __init__(self, maxsize=None, maxbytes=None):
+        """Constructor for ParseCache.
+
+        :param int maxsize: the maximum number of results. if not set, ``consts.Default.CACHE_SIZE`` used.
+        :param int maxbytes: the maximum approximate bytes of results. if not set, ``consts.Default.CACHE_BYTES`` used.
+        """
+        self.maxsize = maxsize or Default.CACHE_SIZE
+        self.maxbytes = maxbytes or Default.CACHE_BYTES
+        self.__lock = threading.Lock()
+        self.__entries = collections.OrderedDict()
+        self.__bytes = 0
+        self.__hits = self.__misses = self.__evictions = 0
+
+    @staticmethod
+    def digest(content):
+        """Get the digest of raw content.
+
+        :param content: xml content
+        :rtype: str
+        """
+        if isinstance(content, unicode):
+            return 'u' + hashlib.sha1(content.encode('utf-8')).digest()
+        return hashlib.sha1(content).digest()
+
+    def loads(self, content, options):
+        """Load xml content to python object, or get the cached result.
+
+        :param content: xml content
+        :param dict options: the options of :class:`~lazyxml.parser.Parser`
+        :return: the frozen result
+        :rtype: dict
+        """
+        if options.get('lazy'):
+            return parser.Parser(**options).xml2object(content)
+        key = (self.digest(content), options_key(options))
+        with self.__lock:
+            entry = self.__entries.pop(key, None)
+            if entry is not None:
+                self.__entries[key] = entry
+                self.__hits += 1
+                return entry[0]
+            self.__misses += 1
+        result, size = freeze(parser.Parser(**options).xml2object(content))
+        with self.__lock:
+            if key not in self.__entries and size <= self.maxbytes:
+                self.__entries[key] = (result, size)
+                self.__bytes += size
+                while len(self.__entries) > self.maxsize or self.__bytes > self.maxbytes:
+                    _, (_, evicted) = self.__entries.popitem(last=False)
+                    self.__bytes -= evicted
+                    self.__evictions += 1
+        return result
+
+    def cache_info(self):
+        """Get the cache statistics.
+
+        :rtype: CacheInfo
+        """
+        with self.__lock:
+            total = self.__hits + self.__misses
+            return CacheInfo(self.__hits, self.__misses, self.__evictions,
+                             float(self.__hits) / total if total else 0.0,
+                             self.maxsize, len(self.__entries), self.maxbytes, self.__bytes)
+
+    def cache_clear(self):
+        """Clear the cache and statistics.
+        """
+        with self.__lock:
+            self.__entries.clear()
+            self.__bytes = 0
+            self.__hits = self.__misses = self.__evictions = 0
+
+
+_lock = threading.Lock()
+_default = []
+
+
+def get_default_cache():
+    """Get the shared cache of ``lazyxml.loads(cache=True)``.
+
+    :rtype: ParseCache
+    """
+    with _lock:
+        if not _default:
+            _default.append(ParseCache())
+        return _default[0]
@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+
+"""Columnar results of :meth:`~lazyxml.parser.Parser.xml2columns`.
+
+The texts of the selected fields of every record are collected into a list per column by a
+streaming parser target, no python object is built for records. Every column is converted
+at once to an :class:`array.array`, or a numpy array if numpy is installed.
+
+.. versionadded:: 1.4
+"""
+
+import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from . import entities, limits as resource_limits, namespaces as ns_cache, utils
+
+#: the array typecodes of column types.
+TYPECODES = {int: 'l', long: 'l', float: 'd'}
+#: the text of missing float cells.
+MISSING_FLOAT = 'nan'
+#: the texts of ``bool`` cells, the lexical values of ``xsd:boolean``.
+BOOL_TEXTS = {'true': True, 'false': False, '1': True, '0': False}
+
+
+def convert_column(name, texts, type, use_numpy=True):
+    """Convert the texts of a column.
+
+    :param str name: column name
+    :param list texts: the texts of the column, ``None`` for missing cells.
+    :param type: the type of the column, ``int``, ``float``, ``bool``, ``str``, ``unicode`` or a callable
+    :param bool use_numpy: build numpy array if numpy is installed. Default to ``True``.
+    :return: an :class:`array.array` or numpy array of ``int`` and ``float`` columns, otherwise a list.
+    :raise ValueError: if a text is invalid or out of the range of the column type.
+    """
+    typecode = TYPECODES.get(type)
+    if typecode is None:
+        if type in (str, unicode, None):
+            return texts
+        if type is bool:
+            values = map(BOOL_TEXTS.get, texts)
+            if None in values:
+                i = values.index(None)
+                raise ValueError('invalid value of bool column: {!r}, record: {}, {!r}'.format(name, i, texts[i]))
+            return values
+        return map(type, texts)
+    if type is float:
+        texts = [MISSING_FLOAT if text is None else text for text in texts]
+    elif None in texts:
+        raise ValueError('missing value of int column: {!r}, record: {}'.format(name, texts.index(None)))
+    try:
+        if use_numpy and numpy is not None:
+            return numpy.array(texts, dtype=type)
+        return array.array(typecode, map(type, texts))
+    except (ValueError, OverflowError) as e:
+        raise ValueError('invalid value of column: {!r}, {}'.format(name, e))
+
+
+class ColumnBuilder(object):
+    """Xml parser target which collects the texts of columns of the matched records.
+
+    A column is a slash separated element path from the record element, the last name of
+    it can be an ``@attribute``, e.g. ``price``, ``stock/qty``, ``@id``. The first matched
+    element of a record is taken, the missing cells are ``None``. The text of a column is the
+    text of the element and its descendants, a column can be nested in another, e.g. ``item``
+    and ``item/sub``.
+    """
+
+    #: accept the ``namespace}tag`` names of expat as well as ``{namespace}tag``.
+    expat_names = True
+
+    def __init__(self, columns, record_path=None, unescape=False, strip=True, names=None, limits=None):
+        """Constructor for ColumnBuilder.
+
+        :param list columns: column names
+        :param str record_path: slash separated element names from the root. if not set, the root element is the only record.
+        :param bool unescape: unescape xml html entity character of text. Default to ``False``.
+        :param bool strip: strip whitespace. Default to ``True``.
+        :param names: the :class:`~lazyxml.namespaces.TagCache` which converts tags to keys. if not set, the namespaces are dropped.
+        :param limits: the :class:`~lazyxml.limits.Limits` of elements. Default to ``None``.
+        """
+        from .parser import RecordBuilder
+        self.__path = RecordBuilder.split_path(record_path)
+        self.__trie = self.compile(columns)
+        self.__columns = [[] for _ in columns]
+        self.__unescape = unescape
+        self.__strip = strip
+        self.__key = (names or ns_cache.DEFAULT_CACHE).key
+        self.__depth = 0
+        self.__matched = 0
+        self.__nodes = []
+        #: the ``(node, texts)`` of the open elements of text columns, a column can be nested in another.
+        self.__texts = []
+        self.__count = 0
+        self.__usage = resource_limits.Usage(limits) if limits is not None and limits.element_limits else None
+
+    @staticmethod
+    def compile(columns):
+        """Compile column paths to a trie.
+
+        :param list columns: column names
+        :return: the root trie node ``[children, attributes, index]``
+        :rtype: list
+        """
+        root = [{}, {}, None]
+        for index, column in enumerate(columns):
+            node = root
+            names = [name for name in column.split('/') if name]
+            if names and names[-1].startswith('@'):
+                node_names, attr = names[:-1], names[-1][1:]
+            else:
+                node_names, attr = names, None
+            for name in node_names:
+                node = node[0].setdefault(name, [{}, {}, None])
+            if attr is not None:
+                node[1][attr] = index
+            elif node is not root:
+                node[2] = index
+            else:
+                raise ValueError('invalid column: {!r}'.format(column))
+        return root
+
+    def pop_records(self):
+        return []
+
+    def start(self, tag, attrib):
+        usage = self.__usage
+        if usage is not None:
+            usage.elements += 1
+            usage.depth += 1
+            usage.text_size = 0
+            if usage.elements > usage.max_elements or usage.depth > usage.max_depth:
+                usage.exceed()
+        nodes = self.__nodes
+        if nodes:
+            parent = nodes[-1]
+            if parent is None:
+                nodes.append(None)
+                return
+            node = parent[0].get(self.__key(tag))
+            nodes.append(node)
+            if node is not None:
+                self.start_node(node, attrib)
+            return
+        depth = self.__depth
+        self.__depth += 1
+        if (self.__matched == depth < len(self.__path)
+                and self.__path[depth] in ('*', self.__key(tag))):
+            self.__matched += 1
+            if self.__matched == len(self.__path):
+                self.__count += 1
+                for column in self.__columns:
+                    column.append(None)
+                nodes.append(self.__trie)
+                self.start_node(self.__trie, attrib)
+
+    def start_node(self, node, attrib):
+        columns = self.__columns
+        if node[1]:
+            for name, index in node[1].iteritems():
+                value = attrib.get(name)
+                if value is not None and columns[index][-1] is None:
+                    columns[index][-1] = entities.decode(value) if self.__unescape else value
+        if node[2] is not None and columns[node[2]][-1] is None:
+            self.__texts.append((node, []))
+
+    def data(self, data):
+        usage = self.__usage
+        if usage is not None:
+            usage.text_size += len(data)
+            if usage.text_size > usage.max_text_size:
+                usage.exceed()
+        for _, texts in self.__texts:
+            texts.append(data)
+
+    def end(self, tag):
+        usage = self.__usage
+        if usage is not None:
+            usage.depth -= 1
+            usage.text_size = 0
+        nodes = self.__nodes
+        if nodes:
+            node = nodes.pop()
+            if self.__texts and self.__texts[-1][0] is node:
+                text = ''.join(self.__texts.pop()[1])
+                text = utils.strip_whitespace(text, True) if self.__strip else text.strip()
+                if self.__unescape:
+                    text = entities.decode(text)
+                self.__columns[node[2]][-1] = text
+            if nodes:
+                return
+        self.__depth -= 1
+        if self.__matched > self.__depth:
+            self.__matched = self.__depth
+
+    def close(self):
+        return None
+
+    def columns(self):
+        """Get the texts of columns.
+
+        :rtype: list
+        """
+        return self.__columns
+
+    def count(self):
+        """Get the number of records.
+
+        :rtype: int
+        """
+        return self.__count
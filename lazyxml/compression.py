@@ -0,0 +1,303 @@
+# -*- coding: utf-8 -*-
+
+"""Streaming compression of :func:`lazyxml.load` and :func:`lazyxml.dump`.
+
+The compressed input is detected by magic bytes and decompressed chunk by chunk while it is
+parsed, so the uncompressed document is never held in memory. The output is compressed by the
+file extension as it is written.
+
+``gzip`` and ``bz2`` are always available, ``xz`` is available if :mod:`lzma` (``backports.lzma``
+on Python 2) is installed.
+
+.. versionadded:: 1.4
+"""
+
+import bz2
+import itertools
+import zlib
+
+try:
+    import lzma
+except ImportError:
+    try:
+        from backports import lzma
+    except ImportError:
+        lzma = None
+
+from . import utils
+from .consts import Default
+
+COMPRESSIONS = {}
+#: the number of head bytes to detect compression.
+MAGIC_SIZE = 6
+
+
+def register_compression(compression):
+    """Register a compression class by its ``name``.
+
+    :param compression: a :class:`Compression` subclass
+    :return: the compression class, so it can be used as class decorator.
+    """
+    COMPRESSIONS[compression.name] = compression
+    return compression
+
+
+def get_compression(name):
+    """Get a compression instance by name.
+
+    :param str name: compression name
+    :rtype: Compression
+    """
+    try:
+        return COMPRESSIONS[name]()
+    except KeyError:
+        raise ValueError('unknown compression: {!r}, available: {}'.format(
+            name, ', '.join(sorted(COMPRESSIONS))))
+
+
+def detect(head=None, filename=None):
+    """Detect compression by the magic bytes of head or the extension of filename.
+
+    :param str head: the head bytes of content
+    :param str filename: file name
+    :return: the compression, or ``None`` if the content is not compressed.
+    :rtype: Compression or None
+    """
+    for compression in COMPRESSIONS.itervalues():
+        if isinstance(head, str) and head.startswith(compression.magic):
+            return compression()
+        if isinstance(filename, basestring) and filename.endswith(compression.extensions):
+            return compression()
+    return None
+
+
+class Compression(object):
+    """Base class of compressions.
+    """
+
+    #: compression name used by ``load(compression=...)`` and ``dump(compression=...)``.
+    name = None
+    #: the magic bytes at the beginning of compressed content.
+    magic = None
+    #: the file extensions of compressed file.
+    extensions = ()
+
+    def decompressor(self):
+        """Create a decompressor of a single stream, which has ``.decompress(data)`` and ``.unused_data``.
+        """
+        raise NotImplementedError
+
+    def compressor(self):
+        """Create a compressor which has ``.compress(data)`` and ``.flush()``.
+        """
+        raise NotImplementedError
+
+    def decompress_chunks(self, chunks):
+        """Decompress chunks of compressed content, the concatenated streams are decompressed one by one.
+
+        The content ends at the end of a stream which is not followed by the magic bytes, the trailing
+        data such as zero padding is ignored as :class:`gzip.GzipFile` does.
+
+        :param chunks: the chunks of compressed content
+        :rtype: generator
+        """
+        magic = self.magic
+        decompressor = self.decompressor()
+        rest = ''
+        for chunk in chunks:
+            if rest:
+                chunk, rest = rest + chunk, ''
+            while chunk:
+                if decompressor is None:
+                    # the data after a stream, another stream or the trailing data
+                    if len(chunk) < len(magic) and magic.startswith(chunk):
+                        rest = chunk
+                        break
+                    if not chunk.startswith(magic):
+                        return
+                    decompressor = self.decompressor()
+                try:
+                    data = decompressor.decompress(chunk)
+                except EOFError:
+                    # the previous stream ended at the end of the previous chunk
+                    decompressor = None
+                    continue
+                if data:
+                    yield data
+                chunk = decompressor.unused_data
+                if chunk:
+                    decompressor = None
+
+
+@register_compression
+class GzipCompression(Compression):
+    """Compression of gzip format by :mod:`zlib`.
+    """
+
+    name = 'gzip'
+    magic = '\x1f\x8b'
+    extensions = ('.gz', '.gzip')
+
+    def decompressor(self):
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    def compressor(self):
+        return zlib.compressobj(Default.COMPRESS_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+
+@register_compression
+class Bz2Compression(Compression):
+    """Compression of bzip2 format by :mod:`bz2`.
+    """
+
+    name = 'bz2'
+    magic = 'BZh'
+    extensions = ('.bz2',)
+
+    def decompressor(self):
+        return bz2.BZ2Decompressor()
+
+    def compressor(self):
+        return bz2.BZ2Compressor()
+
+
+if lzma is not None:
+    @register_compression
+    class XzCompression(Compression):
+        """Compression of xz format by :mod:`lzma`, available if lzma is installed.
+        """
+
+        name = 'xz'
+        magic = '\xfd7zXZ\x00'
+        extensions = ('.xz',)
+
+        def decompressor(self):
+            return lzma.LZMADecompressor()
+
+        def compressor(self):
+            return lzma.LZMACompressor()
+
+
+class DecompressReader(object):
+    """Read-only file-like object which decompresses a compressed file as it is read.
+
+    ``.read(size)`` returns at most ``size`` bytes, it can return less before the end of file.
+    """
+
+    def __init__(self, fp, compression, head=''):
+        """Constructor for DecompressReader.
+
+        :param fp: a file or file-like object that support ``.read()``
+        :param compression: the :class:`Compression` of file, or ``None`` to read it as it is.
+        :param str head: the bytes already read from the file.
+        """
+        chunks = utils.read_chunks(fp)
+        if head:
+            chunks = itertools.chain([head], chunks)
+        self.__chunks = compression.decompress_chunks(chunks) if compression else chunks
+        self.__buffer = ''
+        self.__offset = 0
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            data = self.__buffer[self.__offset:] + ''.join(self.__chunks)
+            self.__buffer, self.__offset = '', 0
+            return data
+        if self.__offset >= len(self.__buffer):
+            self.__buffer = next(self.__chunks, '')
+            self.__offset = 0
+        data = self.__buffer[self.__offset:self.__offset + size]
+        self.__offset += len(data)
+        return data
+
+
+class CompressWriter(object):
+    """Write-only file-like object which compresses the data as it is written.
+
+    The unicode data is encoded with ``consts.Default.ENCODING``. :meth:`close` writes the end of
+    the compressed stream, the underlying file is not closed.
+    """
+
+    def __init__(self, fp, compression):
+        """Constructor for CompressWriter.
+
+        :param fp: a file or file-like object that support ``.write()``
+        :param Compression compression: the compression of file
+        """
+        self.__fp = fp
+        self.__compressor = compression.compressor()
+
+    def write(self, data):
+        if isinstance(data, unicode):
+            data = data.encode(Default.ENCODING)
+        data = self.__compressor.compress(data)
+        if data:
+            self.__fp.write(data)
+
+    def close(self):
+        if self.__compressor is not None:
+            self.__fp.write(self.__compressor.flush())
+            self.__compressor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def open_reader(fp, compression=None):
+    """Get a file-like object which reads the decompressed content of file.
+
+    :param fp: a file or file-like object that support ``.read()``
+    :param str compression: compression name. if not set, detected by the magic bytes of file.
+    :return: ``fp`` itself if it is not compressed, otherwise a :class:`DecompressReader`.
+    """
+    if compression:
+        return DecompressReader(fp, get_compression(compression))
+    try:
+        offset = fp.tell()
+    except (AttributeError, IOError):
+        # not seekable, the head is read again from the reader
+        head = fp.read(MAGIC_SIZE)
+        return DecompressReader(fp, detect(head), head)
+    head = fp.read(MAGIC_SIZE)
+    fp.seek(offset)
+    compression = detect(head)
+    return DecompressReader(fp, compression) if compression else fp
+
+
+def open_writer(fp, compression=None):
+    """Get a file-like object which writes the compressed content to file.
+
+    :param fp: a file or file-like object that support ``.write()``
+    :param str compression: compression name. if not set, detected by the extension of ``fp.name``.
+    :return: ``fp`` itself if it is not compressed, otherwise a :class:`CompressWriter`.
+    """
+    if compression:
+        return CompressWriter(fp, get_compression(compression))
+    compression = detect(filename=getattr(fp, 'name', None))
+    return CompressWriter(fp, compression) if compression else fp
+
+
+def write_file(fp, data, compression=None):
+    """Write data to file, compressed by the compression or the extension of filename.
+
+    :param fp: a filename, or a file or file-like object that support ``.write()``
+    :param data: the data to write, or an iterable of the chunks of data which are written as they are iterated.
+    :param str compression: compression name. if not set, detected by the extension of filename.
+    """
+    func = getattr(fp, 'write', None)
+    if func and callable(func):
+        writer = open_writer(fp, compression)
+        if isinstance(data, basestring):
+            writer.write(data)
+        else:
+            for chunk in data:
+                writer.write(chunk)
+        if writer is not fp:
+            writer.close()
+        return
+    mode = 'wb' if compression or detect(filename=fp) else 'w'
+    with open(fp, mode) as fobj:
+        write_file(fobj, data, compression)
@@ -8,10 +8,27 @@ class Default(object):
     ENCODING = 'utf-8'
     KEY_ATTR = '{attrs}'
     KEY_VALUE = '{values}'
+    CHUNK_SIZE = 64 * 1024
+    MMAP_CHUNK_SIZE = 1024 * 1024
+    SNIFF_SIZE = 1024
+    COMPRESS_LEVEL = 6
+    BACKEND = 'etree'
+    WORKERS = 4
+    BATCH_SIZE = 32
+    BATCH_FRAGMENTS = 1024
+    SHARD_SIZE = 32 * 1024 * 1024
+    TAG_CACHE_SIZE = 4096
+    INTERN_SIZE = 32
+    INTERN_MAXSIZE = 64 * 1024
+    CACHE_SIZE = 1024
+    CACHE_BYTES = 64 * 1024 * 1024
 
 
 class Regex(object):
     XML_NS = re.compile(r'\{(.*?)\}(.*)')  # XML Namespace
     XML_HEADER = re.compile(r'<\?xml.*?\?>', re.I | re.S)  # XML Header Declare
-    XML_ENCODING = re.compile(r'<\?xml\s.*?encoding="(.*?)".*?\?>', re.I | re.S)  # XML Encoding
-    HTML_ENTITY = re.compile('&(\w+?);')  # HTML Entity Character
+    XML_ENCODING = re.compile(r'<\?xml\s[^>]*?encoding\s*=\s*["\']([A-Za-z][\w.:-]*)["\']', re.I)  # XML Encoding
+    HTML_ENTITY = re.compile(r'&(#[0-9]+|#[xX][0-9a-fA-F]+|[A-Za-z][A-Za-z0-9]*);')  # HTML Entity Character
+    UNDEFINED_ENTITY = re.compile(r'&(?!(?:amp|lt|gt|quot|apos);)(?=[A-Za-z][A-Za-z0-9]*;)')  # Entity Undefined in XML
+    ENTITY_REFERENCE = re.compile(r'&([A-Za-z_:][\w.:-]*);')  # Entity Reference
+    LEADING_SPACE = re.compile(r'\s*')  # Leading Whitespace
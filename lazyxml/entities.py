@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+
+"""Entity decoding of the ``unescape`` option.
+
+The text nodes are decoded one by one after parsing, instead of the whole document before it.
+Only the texts which contain ``&`` are searched, the named entities are looked up in a table
+built once, and the numeric entities ``&#60;`` and ``&#x3C;`` are decoded as well. A text which
+contains markup is parsed as an xml fragment by :meth:`~lazyxml.parser.Parser.unescape_text`,
+the markup in the text around the children of an element is parsed to more children by
+:meth:`~lazyxml.parser.Parser.unescape_mixed`. The attribute values are decoded by :func:`decode_attrs`.
+The result is the same as decoding the whole document before parsing it.
+
+The xml parser rejects the html entities such as ``&nbsp;``, so their ``&`` are escaped as the
+content is fed, which is a plain substitution without python callback. The CDATA sections are
+not escaped, their text is decoded as the other texts.
+
+.. versionadded:: 1.4
+"""
+
+import htmlentitydefs
+import io
+
+from .backends import ET
+from .consts import Default, Regex
+
+
+def build_table():
+    """Build the table of entity to character, the ascii characters are ``str``.
+
+    :rtype: dict
+    """
+    table = {}
+    for name, codepoint in htmlentitydefs.name2codepoint.iteritems():
+        char = unichr(codepoint)
+        table[name] = str(char) if codepoint < 128 else char
+    for codepoint in xrange(128):
+        char = chr(codepoint)
+        table['#{}'.format(codepoint)] = char
+        table['#x{:x}'.format(codepoint)] = char
+        table['#x{:X}'.format(codepoint)] = char
+        table['#X{:x}'.format(codepoint)] = char
+        table['#X{:X}'.format(codepoint)] = char
+    return table
+
+
+#: the table of entity name, without ``&`` and ``;``, to character.
+ENTITIES = build_table()
+
+
+def decode_entity(matchobj, table=ENTITIES):
+    name = matchobj.group(1)
+    try:
+        return table[name]
+    except KeyError:
+        pass
+    if name[0] == '#':
+        try:
+            codepoint = int(name[2:], 16) if name[1] in 'xX' else int(name[1:])
+            return unichr(codepoint)
+        except (ValueError, OverflowError):
+            pass
+    return matchobj.group(0)
+
+
+def decode(s):
+    """Decode the named and numeric entities of text, the unknown entities are kept.
+
+    >>> decode('a &lt; b &amp;&amp; c &#x3E; d &copy;')
+    u'a < b && c > d \\xa9'
+
+    :param s: text
+    :return: ``s`` itself if there is no entity.
+    """
+    if '&' not in s:
+        return s
+    return Regex.HTML_ENTITY.sub(decode_entity, s)
+
+
+def decode_attrs(attrib):
+    """Decode the entities of attribute values.
+
+    >>> decode_attrs({'id': '1&amp;2'})
+    {'id': '1&2'}
+
+    :param dict attrib: element attributes
+    :return: ``attrib`` itself if there is no entity.
+    :rtype: dict
+    """
+    for value in attrib.itervalues():
+        if '&' in value:
+            return dict((name, decode(value)) for name, value in attrib.iteritems())
+    return attrib
+
+
+def escape_undefined(s):
+    """Escape the ``&`` of the named entities which are undefined in xml, e.g. ``&copy;``,
+    so the xml parser keeps them in text and attribute values for :func:`decode`.
+
+    ``s`` must be out of CDATA sections, whose text is kept as it is, see
+    :meth:`lazyxml.parser.StreamDecoder.escape`.
+
+    >>> escape_undefined('&lt;&nbsp;&#160;')
+    '&lt;&amp;nbsp;&#160;'
+
+    :param s: xml content
+    :return: ``s`` itself if there is no ``&``.
+    """
+    if '&' not in s:
+        return s
+    return Regex.UNDEFINED_ENTITY.sub('&amp;', s)
+
+
+def parse_fragment(text, usage=None, depth=0):
+    """Parse the xml fragment of text.
+
+    :param text: the text which contains markup
+    :param usage: the :class:`~lazyxml.limits.Usage` of the document. if set, the elements and texts
+        of fragment are counted as they are parsed, as if they were in the element of text.
+    :param int depth: the depth of the element of text in the document.
+    :return: an element of the fragment, or ``None`` if text is not a well-formed fragment.
+    :raise LimitExceeded: if the fragment crosses a limit of ``usage``.
+    """
+    if isinstance(text, unicode):
+        text = text.encode(Default.ENCODING)
+    content = '<fragment>{}</fragment>'.format(text)
+    try:
+        if usage is None:
+            return ET.fromstring(content)
+        events = ET.iterparse(io.BytesIO(content), ('start', 'end'))
+        # the fragment element stands for the element of text, which is counted already
+        next(events)
+        outer = usage.depth, usage.text_size
+        usage.depth = depth
+        try:
+            usage.check(events)
+        finally:
+            usage.depth, usage.text_size = outer
+        return events.root
+    except SyntaxError:
+        return None
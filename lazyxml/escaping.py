@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+
+"""Escaping of the text, CDATA and attribute values of :class:`~lazyxml.builder.Builder`.
+
+A value without special characters is returned untouched after a few scans in C, which is the
+common case, the special characters of the others are replaced by their entities. ``]]>`` of a
+CDATA section is split into two sections, so any text can be dumped as CDATA. The unicode values
+are kept unicode instead of coerced by ``str()``.
+
+>>> escape_text('a < b && c')
+'a &lt; b &amp;&amp; c'
+>>> escape_attr('say "hi"\\n')
+'say &quot;hi&quot;&#10;'
+>>> escape_cdata('a]]>b')
+'<![CDATA[a]]]]><![CDATA[>b]]>'
+
+.. versionadded:: 1.4
+"""
+
+
+def to_text(value):
+    """Convert a value to text, ``str`` and ``unicode`` are returned as they are.
+
+    :param value: a scalar value
+    :rtype: str or unicode
+    """
+    cls = type(value)
+    if cls is str or cls is unicode or isinstance(value, basestring):
+        return value
+    return str(value)
+
+
+def escape_text(s):
+    """Escape ``&``, ``<``, ``>`` and ``"`` of text, as :func:`cgi.escape` with ``quote``.
+
+    :param s: text
+    :return: ``s`` itself if there is no special character.
+    """
+    if '&' not in s and '<' not in s and '>' not in s and '"' not in s:
+        return s
+    return s.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;').replace('"', '&quot;')
+
+
+def escape_attr(s):
+    """Escape the attribute value in double quotes, the tab and the line breaks are escaped
+    as character references too, so they are not normalized to spaces by the xml parser.
+
+    :param s: attribute value
+    :return: ``s`` itself if there is no special character.
+    """
+    if ('&' not in s and '<' not in s and '>' not in s and '"' not in s
+            and '\n' not in s and '\r' not in s and '\t' not in s):
+        return s
+    s = s.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;').replace('"', '&quot;')
+    return s.replace('\n', '&#10;').replace('\r', '&#13;').replace('\t', '&#9;')
+
+
+def escape_cdata(s):
+    """Wrap text in a CDATA section, ``]]>`` of text is split into two sections.
+
+    :param s: text
+    :rtype: str or unicode
+    """
+    if ']]>' in s:
+        s = s.replace(']]>', ']]]]><![CDATA[>')
+    return '<![CDATA[' + s + ']]>'
@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+
+"""Background execution of parse and build tasks.
+
+The pools are created on first use and shared by all callers, so the worker threads and
+processes stay warm between calls. A pool has as many workers as the largest ``workers``
+requested, and the tasks of a caller in a thread pool are bounded by its own ``workers``,
+see :func:`apply_async`. The parses of :func:`lazyxml.aloads` and the writers of
+:func:`lazyxml.adump` run in thread pools of their own.
+
+.. versionadded:: 1.4
+"""
+
+import Queue
+import atexit
+import cPickle
+import collections
+import functools
+import multiprocessing
+import threading
+import time
+import xml.etree.ElementTree as PyET
+from multiprocessing.pool import ThreadPool
+
+from . import parser, utils
+from .consts import Default
+
+_lock = threading.Lock()
+_pools = {}
+#: the semaphores of ``(pool, workers)`` which bound the running tasks of thread pools.
+_bounds = {}
+EXECUTORS = {'thread': ThreadPool, 'process': multiprocessing.Pool}
+#: the name of the shared thread pool of :func:`lazyxml.aloads`.
+ALOADS_POOL = 'aloads'
+#: the name of the shared thread pool of writers.
+WRITER_POOL = 'writer'
+
+
+def get_pool(executor='thread', workers=None):
+    """Get the shared pool of executor, it has at least ``workers`` workers.
+
+    There is one pool per executor. If more workers are requested than the pool has, it is
+    replaced by a larger pool, the replaced pool is closed and its workers exit when the tasks
+    already sent to it are done. The pools are terminated at exit.
+
+    The pool may have more workers than requested by a caller, the tasks sent by :func:`apply_async`
+    are bounded by the ``workers`` of the caller instead.
+
+    .. note::
+        Send the tasks by :func:`apply_async`, a pool got by this may be replaced and closed
+        by another thread.
+
+    :param str executor: ``thread`` or ``process``. Default to ``thread``.
+    :param int workers: the minimum number of workers. if not set, ``consts.Default.WORKERS`` used.
+    :rtype: :class:`multiprocessing.pool.Pool`
+    """
+    if executor not in EXECUTORS:
+        raise ValueError('unknown executor: {!r}, available: process, thread'.format(executor))
+    with _lock:
+        return _get_pool(executor, EXECUTORS[executor], workers)
+
+
+def _get_pool(name, factory, workers=None):
+    workers = workers or Default.WORKERS
+    size, pool = _pools.get(name, (0, None))
+    if size < workers:
+        if pool is not None:
+            pool.close()
+        pool = factory(workers)
+        _pools[name] = (workers, pool)
+    return pool
+
+
+def apply_async(executor, func, args=(), kwds=None, callback=None, workers=None, pool=None):
+    """Run a task in the shared pool of executor.
+
+    In a thread pool, at most ``workers`` tasks sent with the same ``workers`` run at once, even if
+    the pool is larger for other callers, the others wait for a semaphore in the workers. In a process
+    pool, the callers bound the tasks in flight instead, see :func:`imap_bounded`.
+
+    :param str executor: ``thread`` or ``process``.
+    :param func: the task function
+    :param tuple args: the positional arguments of task
+    :param dict kwds: the keyword arguments of task
+    :param callback: a callable called with the result when the task succeeds.
+    :param int workers: the maximum number of running tasks, and the minimum number of workers of pool,
+        see :func:`get_pool`. if not set, ``consts.Default.WORKERS`` used.
+    :param str pool: the name of a thread pool of its own, e.g. :data:`ALOADS_POOL`. if not set, the pool of executor.
+    :rtype: :class:`multiprocessing.pool.AsyncResult`
+    """
+    if executor not in EXECUTORS:
+        raise ValueError('unknown executor: {!r}, available: process, thread'.format(executor))
+    workers = workers or Default.WORKERS
+    name = pool or executor
+    with _lock:
+        target = _get_pool(name, EXECUTORS[executor], workers)
+        if executor == 'thread':
+            bound = _bounds.get((name, workers))
+            if bound is None:
+                bound = _bounds[name, workers] = threading.BoundedSemaphore(workers)
+            func = functools.partial(run_bounded, bound, func)
+        return target.apply_async(func, args, kwds or {}, callback)
+
+
+def run_bounded(bound, func, *args, **kwds):
+    """Run a task while holding a semaphore.
+
+    :param bound: the semaphore of the running tasks
+    :param func: the task function
+    :return: the result of task
+    """
+    with bound:
+        return func(*args, **kwds)
+
+
+@atexit.register
+def shutdown():
+    """Terminate the shared pools, the pools are created again on next use.
+    """
+    with _lock:
+        pools = [pool for _, pool in _pools.itervalues()]
+        _pools.clear()
+        _bounds.clear()
+    for pool in pools:
+        pool.terminate()
+
+
+def loads_batch(options, batch, portable=False):
+    """Load a batch of xml contents, the error of a content is returned in place of its result.
+
+    :param dict options: the options of :class:`~lazyxml.parser.Parser`
+    :param list batch: a list of ``(index, content)`` pairs
+    :param bool portable: convert the errors which can not be pickled. Default to ``False``.
+    :return: a list of ``(index, result)`` pairs
+    :rtype: list
+    """
+    results = []
+    compiled = parser.Parser(**options)
+    for index, content in batch:
+        try:
+            result = compiled.xml2object(content)
+        except Exception as e:
+            result = portable_error(e) if portable else e
+        results.append((index, result))
+    return results
+
+
+def portable_error(error):
+    """Convert the error to one that can be pickled and sent back from worker process.
+
+    :param error: an exception instance
+    :rtype: Exception
+    """
+    try:
+        # some errors, e.g. the ParseError of lxml, are pickled but can not be unpickled
+        cPickle.loads(cPickle.dumps(error, cPickle.HIGHEST_PROTOCOL))
+    except Exception:
+        if isinstance(error, SyntaxError):
+            portable = PyET.ParseError(*error.args)
+        else:
+            portable = Exception(*error.args)
+        portable.__dict__.update(error.__dict__)
+        return portable
+    return error
+
+
+def write_async(chunks, writer, callback=None, workers=None):
+    """Write the chunks of xml content to writer by :func:`write_chunks` in the shared writer pool.
+
+    A writer may block in ``writer.drain()`` as long as its consumer is slow, so the writers have
+    a thread pool of their own and never hold the workers of :func:`lazyxml.aloads`. The writes
+    beyond ``workers`` wait until a writer is done.
+
+    :param chunks: an iterable of the chunks of xml content
+    :param writer: a file-like object that support ``.write()``, and optional ``.drain()``.
+    :param callback: a callable called with the number of bytes written when the write succeeds.
+    :param int workers: the maximum number of running writes, see :func:`apply_async`.
+    :rtype: :class:`multiprocessing.pool.AsyncResult`
+    """
+    return apply_async('thread', write_chunks, (chunks, writer), callback=callback, workers=workers, pool=WRITER_POOL)
+
+
+def write_chunks(chunks, writer):
+    """Write the chunks of xml content to writer, as :func:`lazyxml.adump` does in the shared writer pool.
+
+    ``writer.drain()`` is called after every chunk if the writer has it, a writer whose buffer is
+    full blocks in it until the buffer is drained, so the dump never runs ahead of the consumer.
+    The worker sleeps ``0`` between chunks to release the GIL, so the thread of the caller, e.g. an
+    event loop, is served while a large document is dumped.
+
+    :param chunks: an iterable of the chunks of xml content
+    :param writer: a file-like object that support ``.write()``, and optional ``.drain()``.
+    :return: the number of bytes written
+    :rtype: int
+    """
+    drain = getattr(writer, 'drain', None)
+    size = 0
+    for chunk in chunks:
+        writer.write(chunk)
+        size += len(chunk)
+        if drain is not None:
+            drain()
+        time.sleep(0)
+    return size
+
+
+def imap_loads(contents, options, workers=None, executor='process',
+               chunksize=None, ordered=True):
+    """Load xml contents in the shared pool.
+
+    The contents are sent to the workers in batches of ``chunksize``, and at most two batches
+    per worker are in flight, so ``contents`` can be an endless iterator.
+
+    :param contents: an iterable of xml contents
+    :param dict options: the options of :class:`~lazyxml.parser.Parser`
+    :param int workers: the number of workers. if not set, ``consts.Default.WORKERS`` used.
+    :param str executor: ``process`` or ``thread``. Default to ``process``.
+    :param int chunksize: the number of contents per batch. if not set, ``consts.Default.BATCH_SIZE`` used.
+    :param bool ordered: yield results in input order, or ``(index, result)`` pairs in completion order. Default to ``True``.
+    :rtype: generator
+    """
+    task = functools.partial(loads_batch, options, portable=executor == 'process')
+    batches = utils.batched(enumerate(contents), chunksize or Default.BATCH_SIZE)
+    for results in imap_bounded(task, batches, executor, workers, ordered):
+        for index, result in results:
+            yield result if ordered else (index, result)
+
+
+def imap_bounded(func, items, executor='process', workers=None, ordered=True):
+    """Apply ``func`` to every item in the shared pool, at most two tasks per worker are in flight.
+
+    :param func: the task function which takes an item
+    :param items: an iterable of items, it can be an endless iterator.
+    :param str executor: ``process`` or ``thread``. Default to ``process``.
+    :param int workers: the number of workers. if not set, ``consts.Default.WORKERS`` used.
+    :param bool ordered: yield results in input order, or in completion order. Default to ``True``.
+    :rtype: generator
+    """
+    workers = workers or Default.WORKERS
+    limit = workers * 2
+    pending = collections.OrderedDict()
+    done = Queue.Queue()
+
+    def pop():
+        if ordered:
+            return pending.popitem(last=False)[1].get()
+        while True:
+            try:
+                key, result = done.get(timeout=0.1)
+            except Queue.Empty:
+                for result in pending.values():
+                    if result.ready() and not result.successful():
+                        result.get()
+            else:
+                del pending[key]
+                return result
+
+    for key, item in enumerate(items):
+        callback = None if ordered else functools.partial(lambda key, result: done.put((key, result)), key)
+        pending[key] = apply_async(executor, func, (item,), callback=callback, workers=workers)
+        while len(pending) >= limit:
+            yield pop()
+    while pending:
+        yield pop()
@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+
+"""Lazy results of :class:`~lazyxml.parser.Parser` with ``lazy=True``.
+
+The result is a read-only mapping around the element tree. The children of an element are
+converted on first access and memoised, so the subtrees which are never read are never built.
+The memoised lists of repeated children, the attributes and the ``{'values', 'attrs'}`` dicts of
+leaves are the read-only types of :mod:`lazyxml.cache`, so a caller can not change what the next
+access returns. :meth:`LazyTree.materialize` returns the same python object as the eager parse.
+
+.. versionadded:: 1.4
+"""
+
+import collections
+
+from . import entities, namespaces as ns_cache, utils
+
+
+class LazyTree(collections.Mapping):
+    """Read-only mapping of the children of an element, in the shape of
+    :meth:`~lazyxml.parser.Parser.parse` or the ``values`` of :meth:`~lazyxml.parser.Parser.parse_full`.
+
+    >>> import lazyxml
+    >>> result = lazyxml.loads('<resp><header><status>ok</status></header><body>...</body></resp>', lazy=True)
+    >>> result['header']['status']
+    'ok'
+    >>> result.materialize()
+    {'body': '...', 'header': {'status': 'ok'}}
+    """
+
+    def __init__(self, element, projection=None, strip=False, names=None, full=False, unescape=False,
+                 usage=None, depth=1):
+        """Constructor for LazyTree.
+
+        :param element: an :class:`~xml.etree.ElementTree.Element` instance
+        :param projection: the :class:`~lazyxml.projection.ProjectionState` of element. if not set, all elements are kept.
+        :param bool strip: remove whitespace ``\\r\\n\\t\\x0B`` from text, too. Default to ``False``.
+        :param names: the :class:`~lazyxml.namespaces.TagCache` which converts tags to keys. if not set, the namespaces are dropped.
+        :param bool full: convert children include the attributes. Default to ``False``.
+        :param bool unescape: decode the entities of text and attribute values, and parse the text which
+            contains markup to a lazy tree, as the children are accessed. The markup in the text around
+            the children is parsed to more children. Default to ``False``.
+        :param usage: the :class:`~lazyxml.limits.Usage` of the document, which counts the fragments
+            parsed with ``unescape`` as they are accessed. Default to ``None``.
+        :param int depth: the depth of element in the document. Default to ``1``.
+        """
+        self.element = element
+        self.projection = projection
+        self.strip = strip
+        self.names = names or ns_cache.DEFAULT_CACHE
+        self.full = full
+        self.unescape = unescape
+        self.usage = usage
+        self.depth = depth
+        self.__index = None
+        self.__values = {}
+        #: the children parsed from the markup around the children, which are decoded already.
+        self.__parsed = set()
+
+    def index(self):
+        """Group the kept children by key, the children are not converted.
+
+        :return: a dict of key to ``(children, state)``
+        :rtype: dict
+        """
+        if self.__index is None:
+            key = self.names.key
+            index = {}
+            for child in self.children():
+                tag = key(child.tag)
+                if tag in index:
+                    index[tag][0].append(child)
+                    continue
+                state = None
+                if self.projection is not None:
+                    state = self.projection.step(tag)
+                    if state is False:
+                        continue
+                index[tag] = ([child], state)
+            self.__index = index
+        return self.__index
+
+    def children(self):
+        """Iterate the children of element, and the elements of the markup around them with ``unescape``.
+
+        :rtype: generator
+        """
+        if not self.unescape:
+            for child in self.element:
+                yield child
+            return
+        texts = [self.element.text]
+        for child in self.element:
+            for text in texts:
+                for parsed in self.parse_markup(text):
+                    yield parsed
+            yield child
+            texts = [child.tail]
+        for text in texts:
+            for parsed in self.parse_markup(text):
+                yield parsed
+
+    def parse_markup(self, text):
+        if not text or '<' not in text:
+            return []
+        fragment = entities.parse_fragment(text.strip(), self.usage, self.depth)
+        if fragment is None:
+            return []
+        self.__parsed.update(fragment)
+        return list(fragment)
+
+    def __getitem__(self, tag):
+        try:
+            return self.__values[tag]
+        except KeyError:
+            pass
+        children, state = self.index()[tag]
+        if len(children) == 1:
+            value = self.convert(children[0], state)
+        else:
+            from .cache import FrozenList
+            value = FrozenList(self.convert(child, state) for child in children)
+        self.__values[tag] = value
+        return value
+
+    def __iter__(self):
+        return iter(self.index())
+
+    def __len__(self):
+        return len(self.index())
+
+    def __contains__(self, tag):
+        return tag in self.index()
+
+    def convert(self, child, state):
+        """Convert a child element.
+
+        :param child: an :class:`~xml.etree.ElementTree.Element` instance
+        :param state: the projection state of child
+        """
+        unescape = self.unescape and child not in self.__parsed
+        attrs = child.attrib
+        if unescape and attrs:
+            attrs = entities.decode_attrs(attrs)
+        if len(child):
+            tree = LazyTree(child, state, self.strip, self.names, self.full, unescape, self.usage, self.depth + 1)
+            return LazyNode(tree, attrs) if self.full else tree
+        value = (child.text or '').strip()
+        if self.strip and value:
+            value = utils.strip_whitespace(value)
+        if unescape and ('&' in value or '<' in value):
+            fragment = entities.parse_fragment(value, self.usage, self.depth + 1) if '<' in value else None
+            if fragment is not None and len(fragment):
+                tree = LazyTree(fragment, state, self.strip, self.names, self.full)
+                return LazyNode(tree, attrs) if self.full else tree
+            value = entities.decode(value)
+        if self.full:
+            from .cache import FrozenDict
+            return FrozenDict(values=value, attrs=FrozenDict(attrs))
+        return value
+
+    def materialize(self):
+        """Convert the whole tree eagerly.
+
+        :rtype: dict
+        """
+        from .parser import Parser
+        if self.full:
+            return Parser.parse_full(self.element, self.projection, self.strip, self.names,
+                                     self.unescape, self.usage, self.depth).get('values', {})
+        return Parser.parse(self.element, self.projection, self.strip, self.names, self.unescape,
+                            self.usage, self.depth)
+
+    def __repr__(self):
+        return '<{} {!r} of {} children>'.format(self.__class__.__name__, self.element.tag, len(self))
+
+
+class LazyNode(collections.Mapping):
+    """Read-only mapping of ``values`` and ``attrs`` of an element, in the shape of
+    :meth:`~lazyxml.parser.Parser.parse_full`.
+    """
+
+    def __init__(self, tree, attrs=None):
+        """Constructor for LazyNode.
+
+        :param LazyTree tree: the children of element
+        :param dict attrs: the attributes of element, which are copied to a read-only dict.
+            if ``None``, there is no ``attrs`` key.
+        """
+        from .cache import FrozenDict
+        self.tree = tree
+        self.attrs = attrs if attrs is None else FrozenDict(attrs)
+
+    def keys(self):
+        keys = ['values'] if self.tree else []
+        if self.attrs is not None:
+            keys.append('attrs')
+        return keys
+
+    def __getitem__(self, key):
+        if key == 'values' and self.tree:
+            return self.tree
+        if key == 'attrs' and self.attrs is not None:
+            return self.attrs
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def materialize(self):
+        """Convert the whole tree eagerly.
+
+        :rtype: dict
+        """
+        node = collections.defaultdict(dict)
+        values = self.tree.materialize()
+        if values:
+            node['values'] = values
+        if self.attrs is not None:
+            node['attrs'] = dict(self.attrs)
+        return node
+
+    def __repr__(self):
+        return '<{} {!r}>'.format(self.__class__.__name__, self.tree.element.tag)
+
+
+class LazyRoot(collections.Mapping):
+    """Read-only mapping of the root element key to its lazy result, if the root is not stripped.
+    """
+
+    def __init__(self, tag, node):
+        """Constructor for LazyRoot.
+
+        :param str tag: the root element key
+        :param node: the :class:`LazyTree` or :class:`LazyNode` of root element
+        """
+        self.tag = tag
+        self.node = node
+
+    def __getitem__(self, key):
+        if key == self.tag:
+            return self.node
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter([self.tag])
+
+    def __len__(self):
+        return 1
+
+    def materialize(self):
+        """Convert the whole tree eagerly.
+
+        :rtype: dict
+        """
+        return {self.tag: self.node.materialize()}
+
+    def __repr__(self):
+        return '<{} {!r}>'.format(self.__class__.__name__, self.tag)
@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+
+"""Resource limits of :class:`~lazyxml.parser.Parser`.
+
+A :class:`Limits` bounds the input bytes, the number of elements, the depth of elements,
+the size of a text node and the expansion of an entity reference of a document. The usage
+is counted by a :class:`Meter` as the content is fed, and :class:`LimitExceeded` is raised
+as soon as a limit is crossed, so the tree of a document out of limits is never built.
+
+* The streaming parser targets, e.g. :class:`~lazyxml.parser.RecordBuilder`, count every
+  element and text by a :class:`Usage` as it is parsed.
+* The backends building element tree are parsed by their ``iterparse``, the ``start`` and
+  ``end`` events are checked by :meth:`Usage.check` as every ``consts.Default.CHUNK_SIZE``
+  bytes are fed. The text and the tail of an element are checked when they are complete,
+  set ``max_bytes`` to bound the text being read.
+* With ``unescape``, the markup in text is parsed as a fragment whose elements and texts are
+  counted by the :class:`Usage` of the document, as if they were in the document, see
+  :func:`lazyxml.entities.parse_fragment`.
+* The internal entities declared in the document type are checked before the root element
+  is parsed, the expansion of a reference is computed from the declarations, so an entity
+  expansion attack such as *billion laughs* is rejected without expanding it.
+
+There is no cost if no limit is set.
+
+>>> import lazyxml
+>>> lazyxml.loads('<a><b><c>1</c></b></a>', limits={'max_depth': 2})
+Traceback (most recent call last):
+    ...
+LimitExceeded: max_depth exceeded: 2
+
+.. versionadded:: 1.4
+"""
+
+import collections
+import sys
+from xml.parsers import expat
+
+from .consts import Regex
+
+
+class LimitExceeded(ValueError):
+    """The document exceeds a limit of :class:`Limits`.
+
+    :ivar str limit: the name of the limit, e.g. ``max_depth``.
+    :ivar int value: the value of the limit.
+    """
+
+    def __init__(self, limit, value):
+        super(LimitExceeded, self).__init__(limit, value)
+        self.limit = limit
+        self.value = value
+
+    def __str__(self):
+        return '{} exceeded: {}'.format(self.limit, self.value)
+
+
+class Limits(collections.namedtuple('Limits', 'max_bytes max_elements max_depth max_text_size max_entity_expansion')):
+    """Resource limits of a document, a limit which is not set is unlimited.
+
+    >>> Limits(max_bytes=1024 * 1024, max_depth=64)
+    Limits(max_bytes=1048576, max_elements=None, max_depth=64, max_text_size=None, max_entity_expansion=None)
+    """
+
+    __slots__ = ()
+
+    def __new__(cls, max_bytes=None, max_elements=None, max_depth=None,
+                max_text_size=None, max_entity_expansion=None):
+        """Constructor for Limits.
+
+        :param int max_bytes: the maximum bytes of the content fed to the xml parser, which is decompressed
+            and converted to the native encoding of xml parser.
+        :param int max_elements: the maximum number of elements.
+        :param int max_depth: the maximum depth of elements, the depth of the root element is 1.
+        :param int max_text_size: the maximum characters of the text of an element.
+        :param int max_entity_expansion: the maximum characters which a reference to an entity declared
+            in the document type expands to.
+        :raise ValueError: if a limit is not a positive integer.
+        """
+        self = super(Limits, cls).__new__(cls, max_bytes, max_elements, max_depth,
+                                          max_text_size, max_entity_expansion)
+        for name, value in zip(self._fields, self):
+            if value is not None and (not isinstance(value, (int, long)) or value < 1):
+                raise ValueError('{} must be a positive integer: {!r}'.format(name, value))
+        return self
+
+    @property
+    def element_limits(self):
+        """Whether a limit of elements is set, which needs the events of elements.
+
+        :rtype: bool
+        """
+        return not (self.max_elements is None and self.max_depth is None and self.max_text_size is None)
+
+
+def get_limits(limits):
+    """Get limits from the ``limits`` option of parser.
+
+    :param limits: a :class:`Limits`, a dict of its arguments, or ``None``.
+    :return: the limits, or ``None`` if no limit is set.
+    :rtype: Limits
+    :raise ValueError: if a limit is unknown or invalid.
+    """
+    if limits is None:
+        return None
+    if isinstance(limits, dict):
+        unknown = set(limits).difference(Limits._fields)
+        if unknown:
+            raise ValueError('unknown limits: {}, available: {}'.format(
+                ', '.join(sorted(unknown)), ', '.join(Limits._fields)))
+        limits = Limits(**limits)
+    elif not isinstance(limits, Limits):
+        raise ValueError('limits must be a Limits or a dict: {!r}'.format(limits))
+    return limits if any(value is not None for value in limits) else None
+
+
+def expansion_sizes(values):
+    """Compute the characters which the internal entities expand to.
+
+    >>> sorted(expansion_sizes({'a': 'xx', 'b': '&a;&a;&a;', 'c': '&b;&b;'}).items())
+    [('a', 2), ('b', 6), ('c', 12)]
+
+    :param dict values: the entity name to its replacement text
+    :return: the entity name to its expansion size, the recursive entities are missing,
+        which are rejected by the xml parser when they are referenced.
+    :rtype: dict
+    """
+    references = dict((name, Regex.ENTITY_REFERENCE.findall(value)) for name, value in values.iteritems())
+    sizes = {}
+    pending = set(values)
+    while pending:
+        resolved = [name for name in pending
+                    if all(ref in sizes or ref not in values for ref in references[name])]
+        if not resolved:
+            break
+        for name in resolved:
+            sizes[name] = len(values[name]) + sum(sizes[ref] - len(ref) - 2
+                                                  for ref in references[name] if ref in sizes)
+            pending.discard(name)
+    return sizes
+
+
+def exceeded(limits, elements=0, depth=0, text_size=0):
+    """Get the error of the first limit which is crossed by the usage.
+
+    :param Limits limits: the limits
+    :param int elements: the number of elements
+    :param int depth: the depth of elements
+    :param int text_size: the characters of a text
+    :rtype: LimitExceeded
+    """
+    for limit, value in (('max_elements', elements), ('max_depth', depth), ('max_text_size', text_size)):
+        maximum = getattr(limits, limit)
+        if maximum is not None and value > maximum:
+            return LimitExceeded(limit, maximum)
+
+
+class Usage(object):
+    """The usage of elements counted by a streaming parser target as the events are parsed.
+
+    The counters are updated by the target inline, which saves a call per event.
+    """
+
+    __slots__ = ('limits', 'max_elements', 'max_depth', 'max_text_size', 'elements', 'depth', 'text_size')
+
+    def __init__(self, limits):
+        """Constructor for Usage.
+
+        :param Limits limits: the limits
+        """
+        self.limits = limits
+        self.max_elements = limits.max_elements or sys.maxint
+        self.max_depth = limits.max_depth or sys.maxint
+        self.max_text_size = limits.max_text_size or sys.maxint
+        self.elements = 0
+        self.depth = 0
+        self.text_size = 0
+
+    def exceed(self):
+        """Raise the error of the first limit which is crossed.
+
+        :raise LimitExceeded:
+        """
+        raise exceeded(self.limits, self.elements, self.depth, self.text_size)
+
+    def check(self, events):
+        """Count the events of element tree as they are parsed.
+
+        The text of an element is complete at its ``end`` event, and its tail is complete
+        at the next event, which is checked at last if the events end by the element.
+
+        :param events: an iterable of the ``('start', element)`` and ``('end', element)`` events,
+            e.g. of :meth:`~lazyxml.backends.Backend.iterparse`.
+        :raise LimitExceeded: if the elements exceed ``max_elements``, ``max_depth`` or ``max_text_size``.
+        """
+        max_elements, max_depth, max_text_size = self.max_elements, self.max_depth, self.max_text_size
+        check_text = self.limits.max_text_size is not None
+        ended = None
+        for event, element in events:
+            if ended is not None:
+                self.text_size = len(ended.tail or '')
+                if self.text_size > max_text_size:
+                    self.exceed()
+                ended = None
+            if event == 'start':
+                self.elements += 1
+                self.depth += 1
+                if self.elements > max_elements or self.depth > max_depth:
+                    self.exceed()
+            else:
+                self.depth -= 1
+                if check_text:
+                    self.text_size = len(element.text or '')
+                    if self.text_size > max_text_size:
+                        self.exceed()
+                    ended = element
+        if ended is not None:
+            self.text_size = len(ended.tail or '')
+            if self.text_size > max_text_size:
+                self.exceed()
+
+
+class Meter(object):
+    """The usage of a document which is checked against limits as the content is fed.
+
+    The elements of the streaming parser targets are checked by the targets themselves,
+    and the events of element tree are checked by :meth:`check`.
+
+    :ivar usage: the :class:`Usage` of the elements of element tree, which counts the fragments
+        of text after the document is parsed.
+    """
+
+    def __init__(self, limits):
+        """Constructor for Meter.
+
+        :param Limits limits: the limits
+        """
+        self.__limits = limits
+        self.__bytes = 0
+        self.usage = Usage(limits)
+        self.__entities = {}
+        self.__prolog = None
+        if limits.max_entity_expansion is not None:
+            self.__prolog = expat.ParserCreate()
+            self.__prolog.EntityDeclHandler = self.entity_decl
+            self.__prolog.EndDoctypeDeclHandler = self.end_doctype
+            self.__prolog.StartElementHandler = self.end_prolog
+
+    def feed(self, data):
+        """Count a chunk of content before it is fed to the xml parser.
+
+        :param data: a chunk of content
+        :raise LimitExceeded: if the content exceeds ``max_bytes`` or ``max_entity_expansion``.
+        """
+        self.__bytes += len(data)
+        if self.__limits.max_bytes is not None and self.__bytes > self.__limits.max_bytes:
+            raise LimitExceeded('max_bytes', self.__limits.max_bytes)
+        if self.__prolog is not None:
+            if isinstance(data, unicode):
+                data = data.encode('utf-8')
+            try:
+                self.__prolog.Parse(data)
+            except (StopIteration, expat.error):
+                # the prolog is over, an error is left to the xml parser
+                self.__prolog = None
+
+    def entity_decl(self, name, is_parameter_entity, value, base, system_id, public_id, notation_name):
+        if not is_parameter_entity and value is not None:
+            self.__entities[name] = value
+
+    def end_doctype(self):
+        sizes = expansion_sizes(self.__entities)
+        if sizes and max(sizes.itervalues()) > self.__limits.max_entity_expansion:
+            raise LimitExceeded('max_entity_expansion', self.__limits.max_entity_expansion)
+
+    def end_prolog(self, tag, attrib):
+        raise StopIteration
+
+    def check(self, events):
+        """Check the events of element tree as they are parsed, see :meth:`Usage.check`.
+
+        :param events: an iterable of the ``('start', element)`` and ``('end', element)`` events
+        :raise LimitExceeded: if the elements exceed ``max_elements``, ``max_depth`` or ``max_text_size``.
+        """
+        self.usage.check(events)
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+
+"""Tag name cache of :class:`~lazyxml.parser.Parser`.
+
+Documents reuse a few distinct tags many times, so the raw tag of parser is split into namespace
+and local name once, and converted to the key of python object by a dict lookup afterwards.
+
+.. versionadded:: 1.4
+"""
+
+import collections
+
+from .consts import Default, Regex
+
+CacheInfo = collections.namedtuple('CacheInfo', 'hits misses maxsize currsize')
+
+
+def get_cache(namespaces=None):
+    """Get the tag cache of namespaces mode, the caches of ``None`` and ``True`` are shared.
+
+    :param namespaces: ``None`` to drop namespaces, ``True`` to keep ``{namespace}tag``
+        or a dict which maps namespace to prefix for ``prefix:tag``.
+    :rtype: TagCache
+    """
+    if not namespaces:
+        return DEFAULT_CACHE
+    if namespaces is True:
+        return CLARK_CACHE
+    return TagCache(namespaces)
+
+
+class TagCache(object):
+    """Bounded cache of raw tags, in ``{namespace}tag`` notation of element tree or
+    ``namespace}tag`` notation of expat.
+
+    Once ``maxsize`` tags are cached, the other tags are converted without cache.
+    The hit and miss counters are not locked, so they are approximate if the cache
+    is shared by threads.
+
+    >>> cache = TagCache({'http://schemas.xmlsoap.org/soap/envelope/': 'soap'})
+    >>> cache.key('{http://schemas.xmlsoap.org/soap/envelope/}Body')
+    'soap:Body'
+    >>> cache.key('{urn:unknown}Body')
+    '{urn:unknown}Body'
+    >>> cache.cache_info()
+    CacheInfo(hits=0, misses=2, maxsize=4096, currsize=2)
+    """
+
+    def __init__(self, namespaces=None, maxsize=None):
+        """Constructor for TagCache.
+
+        :param namespaces: ``None`` to drop namespaces, ``True`` to keep ``{namespace}tag``
+            or a dict which maps namespace to prefix for ``prefix:tag``. An empty prefix drops
+            the namespace, the namespaces out of the dict are kept as ``{namespace}tag``.
+        :param int maxsize: the maximum number of cached tags. if not set, ``consts.Default.TAG_CACHE_SIZE`` used.
+        """
+        self.namespaces = namespaces
+        self.maxsize = maxsize or Default.TAG_CACHE_SIZE
+        self.hits = 0
+        self.misses = 0
+        self.__entries = {}
+
+    def key(self, tag):
+        """Get the key of python object for raw tag.
+
+        :param str tag: raw tag
+        :rtype: str
+        """
+        try:
+            entry = self.__entries[tag]
+        except KeyError:
+            entry = self.lookup(tag)
+        else:
+            self.hits += 1
+        return entry[2]
+
+    def split(self, tag):
+        """Split raw tag to namespace and local name.
+
+        :param str tag: raw tag
+        :return: a pair of (namespace, tag)
+        :rtype: tuple
+        """
+        try:
+            entry = self.__entries[tag]
+        except KeyError:
+            entry = self.lookup(tag)
+        else:
+            self.hits += 1
+        return entry[:2]
+
+    def lookup(self, tag):
+        self.misses += 1
+        if tag[:1] == '{':
+            matchobj = Regex.XML_NS.match(tag)
+            ns, name = matchobj.groups() if matchobj else ('', tag)
+        elif '}' in tag:
+            ns, _, name = tag.rpartition('}')
+        else:
+            ns, name = '', tag
+        entry = (ns, name, self.format(ns, name))
+        if len(self.__entries) < self.maxsize:
+            self.__entries[tag] = entry
+        return entry
+
+    def format(self, ns, name):
+        """Format the key of python object.
+
+        :param str ns: namespace
+        :param str name: local name
+        :rtype: str
+        """
+        if not ns or not self.namespaces:
+            return name
+        prefix = None if self.namespaces is True else self.namespaces.get(ns)
+        if prefix is None:
+            return '{{{}}}{}'.format(ns, name)
+        return '{}:{}'.format(prefix, name) if prefix else name
+
+    def cache_info(self):
+        """Get the cache statistics.
+
+        :rtype: CacheInfo
+        """
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self.__entries))
+
+    def cache_clear(self):
+        """Clear the cache and statistics.
+        """
+        self.__entries.clear()
+        self.hits = self.misses = 0
+
+
+DEFAULT_CACHE = TagCache()
+CLARK_CACHE = TagCache(True)
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+
+"""Compact nodes of :class:`~lazyxml.parser.Parser` with ``compact=True``.
+
+An element with attributes is converted to a :class:`Node` instead of a dict of ``values`` and
+``attrs``. Nodes support read-only mapping access in the same shape, and :func:`to_dict` converts
+them back to the dicts of :meth:`~lazyxml.parser.Parser.parse_full`.
+
+.. versionadded:: 1.4
+"""
+
+import collections
+from itertools import chain
+
+from .consts import Default
+
+
+class Node(object):
+    """Read-only mapping of ``values`` and ``attrs`` keys with ``__slots__``.
+
+    >>> node = Node('1', ('id', '9'))
+    >>> node['values'], node['attrs']
+    ('1', {'id': '9'})
+    >>> dict(node)
+    {'attrs': {'id': '9'}, 'values': '1'}
+    """
+
+    __slots__ = ('value', 'attrs')
+
+    def __init__(self, value, attrs=None):
+        """Constructor for Node.
+
+        :param value: the text of a leaf element or a dict of children.
+        :param tuple attrs: flat ``(name, value, ...)`` pairs of attributes, ``None`` if there is no attribute.
+        """
+        self.value = value
+        self.attrs = attrs
+
+    def __getitem__(self, key):
+        if key == 'values' and (self.value or self.value.__class__ is not dict):
+            return self.value
+        if key == 'attrs':
+            attrs = self.attrs
+            return dict(zip(attrs[::2], attrs[1::2])) if attrs else {}
+        raise KeyError(key)
+
+    def keys(self):
+        if self.value or self.value.__class__ is not dict:
+            return ['values', 'attrs']
+        return ['attrs']
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def __contains__(self, key):
+        return key in self.keys()
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    def values(self):
+        return [self[key] for key in self.keys()]
+
+    def __eq__(self, other):
+        if not isinstance(other, collections.Mapping):
+            return NotImplemented
+        return to_dict(self) == other
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    __hash__ = None
+
+    def __repr__(self):
+        return '{}({!r}, {!r})'.format(self.__class__.__name__, self.value, self.attrs)
+
+
+class Root(Node):
+    """The root node whose attributes are stripped, it only has ``values`` key.
+    """
+
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        if key == 'attrs':
+            raise KeyError(key)
+        return super(Root, self).__getitem__(key)
+
+    def keys(self):
+        return ['values'] if self.value else []
+
+
+collections.Mapping.register(Node)
+
+
+class Interner(dict):
+    """Share the equal names and short values of a document, ``interner[s]`` returns the shared string.
+
+    Unlike :func:`intern`, the strings are released with the interner. Once ``maxsize``
+    strings are shared, the others are returned as they are.
+    """
+
+    def __init__(self, size=None, maxsize=None):
+        """Constructor for Interner.
+
+        :param int size: the maximum length of shared values. if not set, ``consts.Default.INTERN_SIZE`` used.
+        :param int maxsize: the maximum number of shared strings. if not set, ``consts.Default.INTERN_MAXSIZE`` used.
+        """
+        super(Interner, self).__init__()
+        self.size = size or Default.INTERN_SIZE
+        self.maxsize = maxsize or Default.INTERN_MAXSIZE
+
+    def __missing__(self, s):
+        if len(self) < self.maxsize:
+            self[s] = s
+        return s
+
+    def value(self, s):
+        """Share a value if it is short.
+
+        :param str s: text or attribute value
+        :rtype: str
+        """
+        return self[s] if len(s) <= self.size else s
+
+    def attrs(self, attrib):
+        """Convert attributes to flat ``(name, value, ...)`` pairs, the equal pairs are shared.
+
+        :param dict attrib: element attributes
+        :rtype: tuple or None
+        """
+        if not attrib:
+            return None
+        return self[tuple(chain.from_iterable(attrib.iteritems()))]
+
+
+def to_dict(obj):
+    """Convert the nodes of compact result to dicts of :meth:`~lazyxml.parser.Parser.parse_full`.
+
+    :param obj: compact result, or a :class:`Node`
+    :rtype: dict
+    """
+    defaultdict = collections.defaultdict
+    root = {'': obj}
+    stack = [(root, '', obj)]
+    while stack:
+        parent, key, value = stack.pop()
+        if isinstance(value, list):
+            value = parent[key] = list(value)
+            stack.extend((value, index, item) for index, item in enumerate(value))
+        elif isinstance(value, Node):
+            if value.value.__class__ is dict:
+                node = parent[key] = defaultdict(dict, value)
+                if 'values' in node:
+                    node['values'] = dict(node['values'])
+                    stack.extend((node['values'], k, v) for k, v in node['values'].iteritems())
+            else:
+                parent[key] = dict(value)
+        elif isinstance(value, dict):
+            value = parent[key] = dict(value)
+            stack.extend((value, k, v) for k, v in value.iteritems())
+    return root['']
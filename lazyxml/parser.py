@@ -1,14 +1,25 @@
 # -*- coding: utf-8 -*-
 
+import codecs
 import collections
+import contextlib
+import itertools
 
-try:
-    import xml.etree.cElementTree as ET
-except ImportError:
-    import xml.etree.ElementTree as ET
-
-from . import utils
+from . import backends, columnar, compression as compress, entities, lazy as lazy_result, limits as resource_limits, namespaces as ns_cache, nodes, utils
 from .consts import Default, Regex
+from .projection import Projection
+
+
+#: the byte order marks, and the first bytes ``<?`` of UTF-16 without byte order mark, to encodings.
+BOMS = (
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF8, 'utf-8'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+    ('<\x00?\x00', 'utf-16-le'),
+    ('\x00<\x00?', 'utf-16-be'),
+)
 
 
 class Parser(object):
@@ -16,7 +27,9 @@ class Parser(object):
     """
 
     def __init__(self, encoding=None, unescape=False, strip_root=True,
-                 strip_attr=True, strip=True, errors='strict'):
+                 strip_attr=True, strip=True, errors='strict', backend=None,
+                 record_path=None, include=None, exclude=None, namespaces=None,
+                 compact=False, lazy=False, limits=None):
         """Constructor for Parser, with sensible defaults.
 
         :param str encoding: xml content encoding. if not set, will guess from xml header declare if possible.
@@ -25,6 +38,22 @@ class Parser(object):
         :param bool strip_attr: strip tag attrs. Default to ``True``.
         :param bool strip: strip whitespace. Default to ``True``.
         :param string errors: xml content decode error handling scheme. Default to ``strict``.
+        :param str backend: parse backend name registered in :data:`lazyxml.backends.BACKENDS`. if not set, ``consts.Default.BACKEND`` used.
+        :param str record_path: record path of :meth:`feed` and :meth:`iterparse`. if not set, the root element is the only record.
+        :param list include: element paths from the root (or record) to include, other elements are skipped. Default to ``None``.
+        :param list exclude: element paths from the root (or record) to exclude. Default to ``None``.
+        :param namespaces: keep namespaces in keys, ``True`` for ``{namespace}tag`` or a dict which maps
+            namespace to prefix for ``prefix:tag``. Default to ``None``, the namespaces are dropped.
+        :param bool compact: build :class:`~lazyxml.nodes.Node` with shared names and short values instead
+            of dicts if ``strip_attr`` is ``False``. Default to ``False``.
+        :param bool lazy: :meth:`xml2object` returns a read-only mapping which converts the children on first
+            access, see :mod:`lazyxml.lazy`. Only backends building element tree support it. Default to ``False``.
+        :param limits: the resource limits of a document, a :class:`~lazyxml.limits.Limits` or a dict of its arguments,
+            :class:`~lazyxml.limits.LimitExceeded` is raised as soon as a limit is crossed. Default to ``None``, unlimited.
+
+        .. versionchanged:: 1.4
+            The ``backend``, ``record_path``, ``include``, ``exclude``, ``namespaces``, ``compact``, ``lazy``
+            and ``limits`` options supported.
         """
         self.__encoding = encoding
         self.__unescape = unescape
@@ -32,6 +61,16 @@ class Parser(object):
         self.__strip_attr = strip_attr
         self.__strip = strip
         self.__errors = errors
+        self.__backend = backends.get_backend(backend or Default.BACKEND)
+        self.__record_path = record_path
+        self.__projection = Projection(include, exclude) if include or exclude else None
+        self.__names = ns_cache.get_cache(namespaces)
+        self.__compact = compact
+        self.__lazy = lazy
+        self.__limits = resource_limits.get_limits(limits)
+        if lazy and not self.__backend.element_tree:
+            raise ValueError('lazy result is not supported by parse backend: {!r}'.format(self.__backend.name))
+        self.__stream = None
 
     def xml2dict(self, content):
         """Convert xml content to dict.
@@ -46,19 +85,73 @@ class Parser(object):
     def xml2object(self, content):
         """Convert xml content to python object.
 
-        :param content: xml content
+        :param content: xml content, a :class:`mmap.mmap` of it, or a file or file-like object that support ``.read()``
         :rtype: dict
 
         .. versionadded:: 1.2
+
+        .. versionchanged:: 1.4
+            A :mod:`lazyxml.lazy` mapping is returned with the ``lazy`` option. The entities of
+            ``unescape`` are decoded per text node after parsing, see :mod:`lazyxml.entities`.
+            The ``limits`` are checked as the content is fed, see :mod:`lazyxml.limits`.
         """
-        content = self.xml_filter(content)
-        element = ET.fromstring(content)
-        tree = self.parse(element) if self.__strip_attr else self.parse_full(element)
+        builder = None
+        if not self.__backend.element_tree:
+            builder = RecordBuilder(unescape=self.__unescape,
+                                    strip_root=self.__strip_root,
+                                    strip_attr=self.__strip_attr,
+                                    strip=self.__strip,
+                                    projection=self.__projection,
+                                    names=self.__names,
+                                    compact=self.__compact,
+                                    limits=self.__limits)
+        usage = None
+        if self.__limits is None:
+            target = self.__backend.create_parser(builder)
+            for chunk in self.filter_chunks(content):
+                target.feed(chunk)
+            element = target.close()
+        else:
+            meter = self.create_meter()
+            element = self.feed_limited(self.filter_chunks(content), builder, meter)
+            if self.__limits.element_limits:
+                # the fragments of unescape are counted after the elements of document
+                usage = meter.usage
+        if builder is not None:
+            return builder.pop_records()[0]
+        unescape = self.__unescape
+        attrib = element.attrib
+        if unescape and attrib:
+            attrib = entities.decode_attrs(attrib)
+        if unescape and not len(element) and '<' in (element.text or ''):
+            fragment = entities.parse_fragment(element.text.strip(), usage, 1)
+            if fragment is not None and len(fragment):
+                # the elements of fragment are decoded already
+                fragment.tag, element, unescape = element.tag, fragment, False
+        tag = self.__names.key(element.tag)
+        state = None
+        if self.__projection is not None:
+            state = self.__projection.root_state(tag)
+        if self.__lazy:
+            tree = lazy_result.LazyTree(element, state, self.__strip, self.__names,
+                                        not self.__strip_attr, unescape, usage)
+            if not self.__strip_attr:
+                tree = lazy_result.LazyNode(tree, None if self.__strip_root else attrib)
+            return tree if self.__strip_root else lazy_result.LazyRoot(tag, tree)
+        if self.__strip_attr:
+            tree = self.parse(element, state, self.__strip, self.__names, unescape, usage)
+        elif self.__compact:
+            interner = nodes.Interner()
+            tree = self.parse_compact(element, state, self.__strip, self.__names, interner, unescape, usage)
+            if not self.__strip_root:
+                return {tag: nodes.Node(tree, interner.attrs(attrib))}
+            return nodes.Root(tree)
+        else:
+            tree = self.parse_full(element, state, self.__strip, self.__names, unescape, usage)
         if not self.__strip_root:
-            node = self.get_node(element)
             if not self.__strip_attr:
-                tree['attrs'] = node['attr']
-            return {node['tag']: tree}
+                tree['attrs'] = attrib
+            return {tag: tree}
         return tree
 
     def xml_filter(self, content):
@@ -66,25 +159,310 @@ class Parser(object):
 
         :param content: xml content
         :rtype: str
+
+        .. versionchanged:: 1.4
+            The whitespace of text is stripped by :meth:`parse` and :meth:`parse_full` instead, and
+            the result is always encoded with ``consts.Default.ENCODING`` or native encoding of xml parser.
+            The entities of ``unescape`` are decoded per text node by :meth:`unescape_text` instead.
+        """
+        return ''.join(self.filter_chunks(content))
+
+    def filter_chunks(self, content):
+        """Iterate the preprocessed chunks of xml content in a single pass.
+
+        The content is yielded untouched if it needs no conversion, otherwise it is converted
+        in slices of ``consts.Default.CHUNK_SIZE``, so there is no full copy of the content.
+        A :class:`mmap.mmap` content is always sliced by ``consts.Default.MMAP_CHUNK_SIZE``,
+        and a file is read and converted chunk by chunk. With ``unescape``, the named entities
+        which are undefined in xml are escaped by :class:`StreamDecoder`.
+
+        :param content: xml content, a :class:`mmap.mmap` of it, or a file or file-like object that support ``.read()``
+        :rtype: generator
+
+        .. versionadded:: 1.4
+        """
+        if utils.is_file(content):
+            return self.filter_stream(utils.read_chunks(content))
+        return self.convert_chunks(content)
+
+    def convert_chunks(self, content):
+        """Iterate the chunks of xml content converted to the native encoding of xml parser.
+
+        :param content: xml content, or a :class:`mmap.mmap` of it
+        :rtype: generator
+
+        .. versionadded:: 1.4
+        """
+        mapped = not isinstance(content, basestring)
+        size = Default.MMAP_CHUNK_SIZE if mapped else Default.CHUNK_SIZE
+        start = Regex.LEADING_SPACE.match(content).end()
+        end = len(content)
+        decoder = StreamDecoder(self.__encoding, self.__errors, self.__unescape)
+        head = decoder.decode(content[start:start + size], start + size >= end)
+        if decoder.passthrough:
+            if start == 0 and not mapped:
+                yield content
+                return
+            yield head
+            for i in xrange(start + size, end, size):
+                yield content[i:i + size]
+            return
+        yield head
+        for i in xrange(start + size, end, size):
+            yield decoder.decode(content[i:i + size], i + size >= end)
+
+    def filter_stream(self, chunks):
+        """Iterate the preprocessed chunks of the chunks of xml content.
+
+        :param chunks: the chunks of xml content
+        :rtype: generator
+
+        .. versionadded:: 1.4
+        """
+        decoder = StreamDecoder(self.__encoding, self.__errors, self.__unescape)
+        chunks = itertools.chain((decoder.decode(chunk) for chunk in chunks), [decoder.flush()])
+        return itertools.ifilter(None, chunks)
+
+    def iterparse(self, fp, record_path=None, mmap=False, compression=None):
+        """Iterate the records of xml content read from file incrementally.
+
+        Every element matched by ``record_path`` is converted the same way as :meth:`xml2object`
+        converts the root element, and released as soon as it has been yielded.
+
+        :param fp: a file or file-like object that support ``.read()`` to read the xml content, or a filename
+        :param str record_path: slash separated element names from the root, e.g. ``catalog/item``.
+            ``*`` matches any element. if not set, the ``record_path`` option used.
+        :param bool mmap: feed the slices of a memory mapping of the file instead of reading it,
+            ``fp`` must be a filename or support ``.fileno()``. Default to ``False``.
+        :param str compression: the compression of file, see :mod:`lazyxml.compression`. if not set,
+            the compressed file is detected by magic bytes and decompressed as it is parsed.
+        :rtype: generator
+
+        .. versionadded:: 1.4
+        """
+        stream = self.create_stream(record_path)
+        with self.open_content(fp, mmap, compression) as content:
+            if utils.is_file(content):
+                chunks = utils.read_chunks(content)
+            else:
+                chunks = utils.iter_slices(content, Default.MMAP_CHUNK_SIZE)
+            for chunk in chunks:
+                for record in stream.feed(chunk):
+                    yield record
+        for record in stream.close():
+            yield record
+
+    def load(self, fp, mmap=False, compression=None):
+        """Convert xml content of file to python object.
+
+        :param fp: a file or file-like object that support ``.read()`` to read the xml content, or a filename
+        :param bool mmap: parse a memory mapping of the file instead of reading it to a string,
+            ``fp`` must be a filename or support ``.fileno()``. Default to ``False``.
+        :param str compression: the compression of file, see :mod:`lazyxml.compression`. if not set,
+            the compressed file is detected by magic bytes and decompressed as it is parsed.
+        :rtype: dict
+
+        .. versionadded:: 1.4
+        """
+        with self.open_content(fp, mmap, compression) as content:
+            if isinstance(content, compress.DecompressReader) or not utils.is_file(content):
+                return self.xml2object(content)
+            return self.xml2object(content.read())
+
+    @staticmethod
+    @contextlib.contextmanager
+    def open_content(fp, mmap=False, compression=None):
+        """Open the content of file for parsing.
+
+        :param fp: a file or file-like object that support ``.read()``, or a filename
+        :param bool mmap: map the file. Default to ``False``.
+        :param str compression: the compression of file. if not set, detected by magic bytes.
+        :return: a context manager of the :class:`mmap.mmap` of an uncompressed mapped file,
+            otherwise a file-like object of the decompressed content.
+
+        .. versionadded:: 1.4
+        """
+        if isinstance(fp, basestring):
+            with open(fp, 'rb') as fobj:
+                with Parser.open_content(fobj, mmap, compression) as content:
+                    yield content
+        elif mmap:
+            with utils.map_file(fp) as mapping:
+                yield compress.open_reader(mapping, compression) if mapping else mapping
+        else:
+            yield compress.open_reader(fp, compression)
+
+    def xml2columns(self, content, columns, record_path=None, use_numpy=True):
+        """Convert the records of xml content to columns.
+
+        The texts of columns are collected by a streaming parser, so no python object is built
+        for records, and every column is converted at once.
+
+        >>> parser = Parser()
+        >>> xml = '<rows><row id="1"><price>1.5</price></row><row id="2"><price>2</price></row></rows>'
+        >>> parser.xml2columns(xml, {'@id': int, 'price': float}, 'rows/row', use_numpy=False)
+        {'@id': array('l', [1, 2]), 'price': array('d', [1.5, 2.0])}
+
+        :param content: xml content, or a file or file-like object that support ``.read()`` to read the xml content
+        :param columns: a dict of column name to type, or a list of column names of ``str`` type. A column name
+            is a slash separated element path from the record element, the last name can be an ``@attribute``.
+        :param str record_path: slash separated element names from the root, e.g. ``rows/row``.
+            if not set, the ``record_path`` option used.
+        :param bool use_numpy: build numpy arrays if numpy is installed. Default to ``True``.
+        :return: a dict of column name to :class:`array.array` or numpy array of ``int`` and ``float`` columns,
+            list of the others. The missing cells are ``nan`` of ``float`` columns, ``None`` of ``str`` columns.
+        :rtype: dict
+
+        .. versionadded:: 1.4
+        """
+        if not isinstance(columns, dict):
+            columns = dict.fromkeys(columns, str)
+        names = list(columns)
+        builder = columnar.ColumnBuilder(names, record_path or self.__record_path,
+                                         unescape=self.__unescape,
+                                         strip=self.__strip,
+                                         names=self.__names,
+                                         limits=self.__limits)
+        stream = RecordStream(self.__backend.create_parser(builder), builder,
+                              StreamDecoder(self.__encoding, self.__errors, self.__unescape),
+                              self.create_meter())
+        if hasattr(content, 'read'):
+            chunks = utils.read_chunks(content)
+        else:
+            chunks = utils.iter_slices(content)
+        for chunk in chunks:
+            stream.feed(chunk)
+        stream.close()
+        return dict((name, columnar.convert_column(name, texts, columns[name], use_numpy))
+                    for name, texts in zip(names, builder.columns()))
+
+    def feed(self, chunk):
+        """Feed a chunk of xml content.
+
+        The chunk can be split anywhere, even in the middle of xml header declaration or a
+        multibyte character.
+
+        >>> parser = Parser(record_path='catalog/item')
+        >>> parser.feed('<catalog><item><id>1</id></item><it')
+        [{'id': '1'}]
+        >>> parser.feed('em><id>2</id></item></catalog>')
+        [{'id': '2'}]
+        >>> parser.close()
+        []
+
+        :param chunk: a chunk of xml content
+        :return: the records completed by this chunk.
+        :rtype: list
+
+        .. versionadded:: 1.4
+        """
+        if self.__stream is None:
+            self.__stream = self.create_stream()
+        return self.__stream.feed(chunk)
+
+    def close(self):
+        """Finish feeding xml content, the parser can be fed with another xml content after that.
+
+        :return: the remaining records.
+        :rtype: list
+
+        .. versionadded:: 1.4
+        """
+        stream, self.__stream = self.__stream, None
+        if stream is None:
+            return []
+        return stream.close()
+
+    def create_stream(self, record_path=None):
+        """Create a push parser of records with the options of this parser.
+
+        :param str record_path: record path. if not set, the ``record_path`` option used.
+        :rtype: RecordStream
+
+        .. versionadded:: 1.4
         """
-        content = utils.strip_whitespace(content, True) if self.__strip else content.strip()
+        builder = RecordBuilder(record_path or self.__record_path,
+                                unescape=self.__unescape,
+                                strip_root=self.__strip_root,
+                                strip_attr=self.__strip_attr,
+                                strip=self.__strip,
+                                projection=self.__projection,
+                                names=self.__names,
+                                compact=self.__compact,
+                                limits=self.__limits)
+        decoder = StreamDecoder(self.__encoding, self.__errors, self.__unescape)
+        return RecordStream(self.__backend.create_parser(builder), builder, decoder, self.create_meter())
 
-        if not self.__encoding:
-            self.__encoding = self.guess_xml_encoding(content) or Default.ENCODING
-        if self.__encoding.lower() != Default.ENCODING:
-            content = self.strip_xml_header(content.decode(self.__encoding, errors=self.__errors))
-        if self.__unescape:
-            content = utils.html_entity_decode(content)
-        return content
+    def create_meter(self):
+        """Create the meter of a document if the ``limits`` option is set.
+
+        :return: a :class:`~lazyxml.limits.Meter`, or ``None`` if there is no limit.
+
+        .. versionadded:: 1.4
+        """
+        if self.__limits is None:
+            return None
+        return resource_limits.Meter(self.__limits)
+
+    def feed_limited(self, chunks, builder=None, meter=None):
+        """Feed the chunks of xml content to a parser of backend and check the ``limits`` option.
+
+        The element tree is built by the ``iterparse`` of backend, whose events are checked
+        as every ``consts.Default.CHUNK_SIZE`` bytes are fed.
+
+        :param chunks: the preprocessed chunks of xml content
+        :param builder: the parser target. if not set, the element tree is built.
+        :param meter: the :class:`~lazyxml.limits.Meter` of the document. if not set, a new one used.
+        :return: the result of the parser, the root element of element tree.
+
+        .. versionadded:: 1.4
+        """
+        if meter is None:
+            meter = self.create_meter()
+        if builder is None and self.__limits.element_limits:
+            events = self.__backend.iterparse(self.iter_metered(chunks, meter))
+            meter.check(events)
+            return events.root
+        target = self.__backend.create_parser(builder)
+        for chunk in chunks:
+            meter.feed(chunk)
+            target.feed(chunk)
+        return target.close()
+
+    @staticmethod
+    def iter_metered(chunks, meter):
+        """Iterate the slices of chunks of xml content counted by a meter.
+
+        :param chunks: the chunks of xml content
+        :param meter: the :class:`~lazyxml.limits.Meter`
+        :rtype: generator
+
+        .. versionadded:: 1.4
+        """
+        for chunk in chunks:
+            for data in utils.iter_slices(chunk):
+                meter.feed(data)
+                yield data
 
     @staticmethod
     def guess_xml_encoding(content):
-        """Guess encoding from xml header declaration.
+        """Guess encoding from the byte order mark or xml header declaration.
+
+        Only the first ``consts.Default.SNIFF_SIZE`` bytes of content are read.
 
         :param content: xml content
         :rtype: str or None
+
+        .. versionchanged:: 1.4
+            The byte order marks of UTF-8, UTF-16 and UTF-32, and UTF-16 without byte order mark
+            are detected, the header declaration is searched in the head of content only.
         """
-        matchobj = Regex.XML_ENCODING.match(content)
+        head = content[:Default.SNIFF_SIZE]
+        if isinstance(head, str):
+            for bom, encoding in BOMS:
+                if head.startswith(bom):
+                    return encoding
+        matchobj = Regex.XML_ENCODING.match(head)
         return matchobj and matchobj.group(1).lower()
 
     @staticmethod
@@ -97,47 +475,287 @@ class Parser(object):
         return Regex.XML_HEADER.sub('', content)
 
     @classmethod
-    def parse(cls, element):
+    def parse(cls, element, projection=None, strip=False, names=None, unescape=False, usage=None, depth=1):
         """Parse xml element.
 
+        The element tree is walked with an explicit stack, so the depth of the tree is not limited
+        by the recursion limit.
+
         :param element: an :class:`~xml.etree.ElementTree.Element` instance
+        :param projection: the :class:`~lazyxml.projection.ProjectionState` of element. if not set, all elements are kept.
+        :param bool strip: remove whitespace ``\\r\\n\\t\\x0B`` from text, too. Default to ``False``.
+        :param names: the :class:`~lazyxml.namespaces.TagCache` which converts tags to keys. if not set, the namespaces are dropped.
+        :param bool unescape: decode the entities of text by :meth:`unescape_text`. Default to ``False``.
+        :param usage: the :class:`~lazyxml.limits.Usage` of the document, which counts the fragments
+            parsed with ``unescape``. Default to ``None``.
+        :param int depth: the depth of element in the document. Default to ``1``.
         :rtype: dict
+
+        .. versionchanged:: 1.4
+            Non-recursive implementation, the ``projection``, ``strip``, ``names`` and ``unescape`` options supported.
         """
-        values = {}
-        for child in element:
-            node = cls.get_node(child)
-            subs = cls.parse(child)
-            value = subs or node['value']
-            if node['tag'] not in values:
-                values[node['tag']] = value
+        strip_whitespace = utils.strip_whitespace
+        key = (names or ns_cache.DEFAULT_CACHE).key
+        tree = {}
+        if unescape and len(element) and element.text and '<' in element.text:
+            cls.unescape_mixed(tree, element.text, projection, strip, names,
+                               usage=usage, depth=depth)
+        stack = [(iter(element), tree, projection)]
+        while stack:
+            children, values, state = stack[-1]
+            for child in children:
+                tag = key(child.tag)
+                if state is not None:
+                    child_state = state.step(tag)
+                    if child_state is False:
+                        if unescape and child.tail and '<' in child.tail:
+                            cls.unescape_mixed(values, child.tail, state, strip, names,
+                                               usage=usage, depth=depth + len(stack) - 1)
+                        continue
+                else:
+                    child_state = None
+                if len(child):
+                    value = {}
+                    if unescape and child.text and '<' in child.text:
+                        cls.unescape_mixed(value, child.text, child_state, strip, names,
+                                           usage=usage, depth=depth + len(stack))
+                else:
+                    value = (child.text or '').strip()
+                    if strip and value:
+                        value = strip_whitespace(value)
+                    if unescape and ('&' in value or '<' in value):
+                        value = cls.unescape_text(value, child_state, strip, names,
+                                                  usage=usage, depth=depth + len(stack))
+                if tag not in values:
+                    values[tag] = value
+                else:
+                    if not isinstance(values[tag], list):
+                        values[tag] = [values.pop(tag)]
+                    values[tag].append(value)
+                if unescape and child.tail and '<' in child.tail:
+                    cls.unescape_mixed(values, child.tail, state, strip, names,
+                                       usage=usage, depth=depth + len(stack) - 1)
+                if value.__class__ is dict:
+                    stack.append((iter(child), value, child_state))
+                    break
             else:
-                if not isinstance(values[node['tag']], list):
-                    values[node['tag']] = [values.pop(node['tag'])]
-                values[node['tag']].append(value)
-        return values
+                stack.pop()
+        return tree
 
     @classmethod
-    def parse_full(cls, element):
+    def parse_full(cls, element, projection=None, strip=False, names=None, unescape=False, usage=None, depth=1):
         """Parse xml element include the node attributes.
 
+        The element tree is walked with an explicit stack, so the depth of the tree is not limited
+        by the recursion limit.
+
         :param element: an :class:`~xml.etree.ElementTree.Element` instance
+        :param projection: the :class:`~lazyxml.projection.ProjectionState` of element. if not set, all elements are kept.
+        :param bool strip: remove whitespace ``\\r\\n\\t\\x0B`` from text, too. Default to ``False``.
+        :param names: the :class:`~lazyxml.namespaces.TagCache` which converts tags to keys. if not set, the namespaces are dropped.
+        :param bool unescape: decode the entities of text by :meth:`unescape_text`. Default to ``False``.
+        :param usage: the :class:`~lazyxml.limits.Usage` of the document, which counts the fragments
+            parsed with ``unescape``. Default to ``None``.
+        :param int depth: the depth of element in the document. Default to ``1``.
         :rtype: dict
 
         .. versionadded:: 1.2.1
+
+        .. versionchanged:: 1.4
+            Non-recursive implementation, the ``projection``, ``strip``, ``names`` and ``unescape`` options supported.
+        """
+        defaultdict = collections.defaultdict
+        strip_whitespace = utils.strip_whitespace
+        key = (names or ns_cache.DEFAULT_CACHE).key
+        tree = defaultdict(dict)
+        if unescape and len(element) and element.text and '<' in element.text:
+            cls.unescape_mixed(tree['values'], element.text, projection, strip, names, full=True,
+                               usage=usage, depth=depth)
+        stack = [(iter(element), tree, projection)]
+        while stack:
+            children, node, state = stack[-1]
+            for child in children:
+                tag = key(child.tag)
+                if state is not None:
+                    child_state = state.step(tag)
+                    if child_state is False:
+                        if unescape and child.tail and '<' in child.tail:
+                            cls.unescape_mixed(node['values'], child.tail, state, strip, names, full=True,
+                                               usage=usage, depth=depth + len(stack) - 1)
+                        continue
+                else:
+                    child_state = None
+                if len(child):
+                    value = defaultdict(dict)
+                    if unescape and child.text and '<' in child.text:
+                        cls.unescape_mixed(value['values'], child.text, child_state, strip, names, full=True,
+                                           usage=usage, depth=depth + len(stack))
+                else:
+                    text = (child.text or '').strip()
+                    if strip and text:
+                        text = strip_whitespace(text)
+                    if unescape and ('&' in text or '<' in text):
+                        text = cls.unescape_text(text, child_state, strip, names, full=True,
+                                                 usage=usage, depth=depth + len(stack))
+                    value = {'values': text}
+                value['attrs'] = entities.decode_attrs(child.attrib) if unescape else child.attrib
+                values = node['values']
+                if tag not in values:
+                    values[tag] = value
+                else:
+                    if not isinstance(values[tag], list):
+                        values[tag] = [values.pop(tag)]
+                    values[tag].append(value)
+                if unescape and child.tail and '<' in child.tail:
+                    cls.unescape_mixed(values, child.tail, state, strip, names, full=True,
+                                       usage=usage, depth=depth + len(stack) - 1)
+                if value.__class__ is defaultdict:
+                    stack.append((iter(child), value, child_state))
+                    break
+            else:
+                stack.pop()
+        return tree
+
+    @classmethod
+    def parse_compact(cls, element, projection=None, strip=False, names=None, interner=None, unescape=False,
+                      usage=None, depth=1):
+        """Parse xml element include the node attributes to compact nodes.
+
+        The result is the ``values`` of :meth:`parse_full`, but every child element is converted
+        to a :class:`~lazyxml.nodes.Node` whose names and short values are shared.
+
+        :param element: an :class:`~xml.etree.ElementTree.Element` instance
+        :param projection: the :class:`~lazyxml.projection.ProjectionState` of element. if not set, all elements are kept.
+        :param bool strip: remove whitespace ``\\r\\n\\t\\x0B`` from text, too. Default to ``False``.
+        :param names: the :class:`~lazyxml.namespaces.TagCache` which converts tags to keys. if not set, the namespaces are dropped.
+        :param interner: the :class:`~lazyxml.nodes.Interner` of the document. if not set, a new one used.
+        :param bool unescape: decode the entities of text by :meth:`unescape_text`. Default to ``False``.
+        :param usage: the :class:`~lazyxml.limits.Usage` of the document, which counts the fragments
+            parsed with ``unescape``. Default to ``None``.
+        :param int depth: the depth of element in the document. Default to ``1``.
+        :rtype: dict
+
+        .. versionadded:: 1.4
         """
-        values = collections.defaultdict(dict)
-        for child in element:
-            node = cls.get_node(child)
-            subs = cls.parse_full(child)
-            value = subs or {'values': node['value']}
-            value['attrs'] = node['attr']
-            if node['tag'] not in values['values']:
-                values['values'][node['tag']] = value
+        Node = nodes.Node
+        strip_whitespace = utils.strip_whitespace
+        key = (names or ns_cache.DEFAULT_CACHE).key
+        if interner is None:
+            interner = nodes.Interner()
+        value_of, attrs_of = interner.value, interner.attrs
+        tree = {}
+        if unescape and len(element) and element.text and '<' in element.text:
+            cls.unescape_mixed(tree, element.text, projection, strip, names, interner=interner,
+                               usage=usage, depth=depth)
+        stack = [(iter(element), tree, projection)]
+        while stack:
+            children, values, state = stack[-1]
+            for child in children:
+                tag = key(child.tag)
+                if state is not None:
+                    child_state = state.step(tag)
+                    if child_state is False:
+                        if unescape and child.tail and '<' in child.tail:
+                            cls.unescape_mixed(values, child.tail, state, strip, names, interner=interner,
+                                               usage=usage, depth=depth + len(stack) - 1)
+                        continue
+                else:
+                    child_state = None
+                attrib = child.attrib
+                if unescape and attrib:
+                    attrib = entities.decode_attrs(attrib)
+                if len(child):
+                    value = Node({}, attrs_of(attrib))
+                    if unescape and child.text and '<' in child.text:
+                        cls.unescape_mixed(value.value, child.text, child_state, strip, names, interner=interner,
+                                           usage=usage, depth=depth + len(stack))
+                else:
+                    text = (child.text or '').strip()
+                    if strip and text:
+                        text = strip_whitespace(text)
+                    if unescape and ('&' in text or '<' in text):
+                        text = cls.unescape_text(text, child_state, strip, names, interner=interner,
+                                                 usage=usage, depth=depth + len(stack))
+                    value = Node(text if text.__class__ is dict else value_of(text), attrs_of(attrib))
+                if tag not in values:
+                    values[tag] = value
+                else:
+                    if not isinstance(values[tag], list):
+                        values[tag] = [values.pop(tag)]
+                    values[tag].append(value)
+                if unescape and child.tail and '<' in child.tail:
+                    cls.unescape_mixed(values, child.tail, state, strip, names, interner=interner,
+                                       usage=usage, depth=depth + len(stack) - 1)
+                if value.value.__class__ is dict:
+                    stack.append((iter(child), value.value, child_state))
+                    break
             else:
-                if not isinstance(values['values'][node['tag']], list):
-                    values['values'][node['tag']] = [values['values'].pop(node['tag'])]
-                values['values'][node['tag']].append(value)
-        return values
+                stack.pop()
+        return tree
+
+    @classmethod
+    def unescape_text(cls, text, projection=None, strip=False, names=None, full=False, interner=None,
+                      usage=None, depth=0):
+        """Unescape the text of a leaf element.
+
+        The text which contains markup is parsed as an xml fragment to the children of element,
+        otherwise the entities of text are decoded by :func:`lazyxml.entities.decode`.
+
+        :param text: element text
+        :param projection: the projection state of element. if not set, all children are kept.
+        :param bool strip: remove whitespace ``\\r\\n\\t\\x0B`` from text, too. Default to ``False``.
+        :param names: the :class:`~lazyxml.namespaces.TagCache` which converts tags to keys. if not set, the namespaces are dropped.
+        :param bool full: convert the children include the attributes. Default to ``False``.
+        :param interner: convert the children to compact nodes with the :class:`~lazyxml.nodes.Interner`. Default to ``None``.
+        :param usage: the :class:`~lazyxml.limits.Usage` of the document, which counts the elements and
+            texts of the fragment, see :func:`lazyxml.entities.parse_fragment`. Default to ``None``.
+        :param int depth: the depth of the element of text in the document.
+        :return: the children of :meth:`parse`, the ``values`` of :meth:`parse_full` or :meth:`parse_compact`, or the decoded text.
+        :rtype: dict or str
+
+        .. versionadded:: 1.4
+        """
+        if '<' in text:
+            element = entities.parse_fragment(text, usage, depth)
+            if element is not None and len(element):
+                if interner is not None:
+                    return cls.parse_compact(element, projection, strip, names, interner)
+                if full:
+                    return cls.parse_full(element, projection, strip, names).get('values', {})
+                return cls.parse(element, projection, strip, names)
+        return entities.decode(text)
+
+    @classmethod
+    def unescape_mixed(cls, values, text, projection=None, strip=False, names=None, full=False, interner=None,
+                       usage=None, depth=0):
+        """Unescape the text around the children of an element, the text before the first child or
+        the tail of a child. The markup of text is parsed as an xml fragment, and its elements are
+        added to the children of element as if they were in the document, the other text is dropped.
+
+        :param dict values: the children of element, in the shape of the result of :meth:`unescape_text`.
+        :param text: the text which contains markup
+        :param projection: the projection state of element. if not set, all children are kept.
+        :param bool strip: remove whitespace ``\\r\\n\\t\\x0B`` from text, too. Default to ``False``.
+        :param names: the :class:`~lazyxml.namespaces.TagCache` which converts tags to keys. if not set, the namespaces are dropped.
+        :param bool full: convert the children include the attributes. Default to ``False``.
+        :param interner: convert the children to compact nodes with the :class:`~lazyxml.nodes.Interner`. Default to ``None``.
+        :param usage: the :class:`~lazyxml.limits.Usage` of the document, which counts the elements and
+            texts of the fragment, see :func:`lazyxml.entities.parse_fragment`. Default to ``None``.
+        :param int depth: the depth of the element of text in the document.
+
+        .. versionadded:: 1.4
+        """
+        children = cls.unescape_text(text.strip(), projection, strip, names, full, interner, usage, depth)
+        if children.__class__ is not dict:
+            return
+        for tag, value in children.iteritems():
+            for item in value if isinstance(value, list) else [value]:
+                if tag not in values:
+                    values[tag] = item
+                else:
+                    if not isinstance(values[tag], list):
+                        values[tag] = [values.pop(tag)]
+                    values[tag].append(item)
 
     @classmethod
     def get_node(cls, element):
@@ -163,6 +781,564 @@ class Parser(object):
         :param tag: tag name
         :return: a pair of (namespace, tag)
         :rtype: tuple
+
+        .. versionchanged:: 1.4
+            The result is cached by :data:`lazyxml.namespaces.DEFAULT_CACHE`.
+        """
+        return ns_cache.DEFAULT_CACHE.split(tag)
+
+
+class CompiledParser(object):
+    """Parser whose options are validated and prepared once.
+
+    It keeps no state of calls, so an instance can be reused and shared by threads.
+    Use :meth:`create_stream` to get a push parser of a document.
+
+    >>> parser = CompiledParser(strip_root=False)
+    >>> parser.loads('<demo><foo>foo</foo></demo>')
+    {'demo': {'foo': 'foo'}}
+
+    .. versionadded:: 1.4
+    """
+
+    def __init__(self, **options):
+        """Constructor for CompiledParser.
+
+        :param options: the options of :class:`Parser`
+        :raise ValueError: if an option is invalid.
+        """
+        encoding = options.get('encoding')
+        errors = options.get('errors') or 'strict'
+        try:
+            if encoding:
+                codecs.lookup(encoding)
+            codecs.lookup_error(errors)
+        except LookupError as e:
+            raise ValueError(str(e))
+        self.__parser = Parser(**options)
+        self.__options = options
+
+    @property
+    def options(self):
+        """The options of parser.
+
+        :rtype: dict
+        """
+        return dict(self.__options)
+
+    def loads(self, content):
+        """Load xml content to python object, see :func:`lazyxml.loads`.
+
+        :param content: xml content
+        :rtype: dict
+        """
+        return self.__parser.xml2object(content)
+
+    def load(self, fp, mmap=False, compression=None):
+        """Load xml content from file, see :func:`lazyxml.load`.
+
+        :param fp: a file or file-like object that support ``.read()`` to read the xml content, or a filename
+        :param bool mmap: parse a memory mapping of the file. Default to ``False``.
+        :param str compression: the compression of file. if not set, detected by magic bytes.
+        :rtype: dict
+        """
+        return self.__parser.load(fp, mmap, compression)
+
+    def iterload(self, fp, record_path=None, mmap=False, compression=None):
+        """Iterate the records of xml content read from file, see :func:`lazyxml.iterload`.
+
+        :param fp: a file or file-like object that support ``.read()`` to read the xml content, or a filename
+        :param str record_path: slash separated element names from the root. if not set, the ``record_path`` option used.
+        :param bool mmap: feed the slices of a memory mapping of the file. Default to ``False``.
+        :param str compression: the compression of file. if not set, detected by magic bytes.
+        :rtype: generator
+        """
+        return self.__parser.iterparse(fp, record_path, mmap, compression)
+
+    def loads_columnar(self, content, record_path, columns, use_numpy=True):
+        """Load the records of xml content to typed columns, see :func:`lazyxml.loads_columnar`.
+
+        :rtype: dict
+        """
+        return self.__parser.xml2columns(content, columns, record_path, use_numpy)
+
+    def create_stream(self, record_path=None):
+        """Create a push parser of records which is owned by the caller.
+
+        :param str record_path: record path. if not set, the ``record_path`` option used.
+        :rtype: RecordStream
+        """
+        return self.__parser.create_stream(record_path)
+
+
+class RecordStream(object):
+    """Push parser which converts chunks of xml content to records.
+
+    .. versionadded:: 1.4
+    """
+
+    def __init__(self, target, builder, decoder, meter=None):
+        """Constructor for RecordStream.
+
+        :param target: the incremental parser created by backend which drives ``builder``
+        :param RecordBuilder builder: the records builder
+        :param StreamDecoder decoder: the xml content decoder
+        :param meter: the :class:`~lazyxml.limits.Meter` which counts the content fed. Default to ``None``.
+        """
+        self.__target = target
+        self.__builder = builder
+        self.__decoder = decoder
+        self.__meter = meter
+
+    def feed(self, chunk):
+        """Feed a chunk of xml content.
+
+        :param chunk: a chunk of xml content
+        :return: the records completed by this chunk.
+        :rtype: list
+        """
+        data = self.__decoder.decode(chunk)
+        if data:
+            if self.__meter is not None:
+                self.__meter.feed(data)
+            self.__target.feed(data)
+        return self.__builder.pop_records()
+
+    def close(self):
+        """Finish feeding xml content.
+
+        :return: the remaining records.
+        :rtype: list
+        """
+        data = self.__decoder.flush()
+        if data:
+            if self.__meter is not None:
+                self.__meter.feed(data)
+            self.__target.feed(data)
+        self.__target.close()
+        return self.__builder.pop_records()
+
+
+class StreamDecoder(object):
+    """Incremental xml content decoder.
+
+    Buffer the head of the content until the xml header declaration is complete, then convert
+    every chunk to bytes the underlying xml parser is able to consume, the same way as
+    :meth:`Parser.xml_filter` does for the whole content.
+
+    The encodings which xml parsers support natively, UTF-8, ISO-8859-1, US-ASCII and UTF-16 with
+    byte order mark, are fed as they are, with the xml header declaration rewritten if the ``encoding``
+    option overrides the declared one. The other encodings are decoded and encoded with
+    ``consts.Default.ENCODING`` chunk by chunk.
+
+    .. versionadded:: 1.4
+    """
+
+    #: the codec names of the encodings which xml parsers support natively to the names in xml declaration.
+    NATIVE_ENCODINGS = {'utf-8': 'UTF-8', 'iso8859-1': 'ISO-8859-1', 'ascii': 'US-ASCII'}
+    #: the names of UTF-16 in xml declaration which xml parsers support natively.
+    UTF16_ENCODINGS = ('UTF-16', 'UTF-16LE', 'UTF-16BE')
+
+    def __init__(self, encoding=None, errors='strict', unescape=False):
+        """Constructor for StreamDecoder.
+
+        :param str encoding: xml content encoding. if not set, will guess from xml header declare if possible.
+        :param string errors: xml content decode error handling scheme. Default to ``strict``.
+        :param bool unescape: escape the named entities which are undefined in xml for the ``unescape``
+            option of parser, see :func:`lazyxml.entities.escape_undefined`. Default to ``False``.
+        """
+        self.encoding = encoding
+        self.errors = errors
+        self.unescape = unescape
+        self.__head = None
+        self.__decoder = None
+        self.__started = False
+        self.__rewritten = False
+        self.__pending = ''
+        self.__cdata = False
+
+    @property
+    def passthrough(self):
+        """Whether the chunks are returned untouched after the head.
+
+        :rtype: bool
+        """
+        return self.__started and self.__decoder is None and not self.__rewritten and not self.unescape
+
+    def decode(self, chunk, final=False):
+        """Decode a chunk of xml content.
+
+        :param chunk: a chunk of xml content
+        :param bool final: whether it is the last chunk. Default to ``False``.
+        :rtype: str
+        """
+        if not self.__started:
+            head = (self.__head + chunk) if self.__head else chunk
+            head = head.lstrip()
+            if not final and not self.is_head_complete(head):
+                self.__head = head
+                return ''
+            self.__head = None
+            self.__started = True
+            data = self.start(head, final)
+        else:
+            data = self.convert(chunk, final)
+        return self.escape(data, final) if self.unescape else data
+
+    def flush(self):
+        """Decode the remaining buffered content.
+
+        :rtype: str
+        """
+        return self.decode('', True)
+
+    @staticmethod
+    def is_head_complete(head):
+        """Check whether the head of xml content is enough to guess encoding.
+
+        :param head: the head of xml content
+        :rtype: bool
+        """
+        if len(head) < 4:
+            return False
+        encoding = Parser.guess_xml_encoding(head[:4])
+        if encoding == 'utf-8':
+            head = head[len(codecs.BOM_UTF8):]
+        elif encoding:
+            head = head.decode(encoding, 'ignore').lstrip(u'\ufeff')
+        if head.startswith('<?xml'):
+            return '?>' in head or len(head) >= Default.SNIFF_SIZE
+        return len(head) >= 5 or not '<?xml'.startswith(head)
+
+    @staticmethod
+    def codec_name(encoding):
+        """Get the normalized codec name of encoding, e.g. ``iso8859-1`` of ``latin-1``.
+
+        :param str encoding: encoding name
+        :return: the codec name, or the lower case encoding if there is no codec of it.
+        :rtype: str
+        """
+        try:
+            return codecs.lookup(encoding).name
+        except LookupError:
+            return encoding.lower()
+
+    def start(self, head, final=False):
+        if isinstance(head, unicode):
+            self.__decoder = False
+            return self.convert(self.strip_xml_header(head), final)
+        guessed = Parser.guess_xml_encoding(head)
+        if not self.encoding:
+            self.encoding = guessed or Default.ENCODING
+        codec = self.codec_name(self.encoding)
+        declared = guessed or Default.ENCODING
+        if guessed == 'utf-16' and codec.startswith('utf-16') and not self.unescape:
+            # the byte order mark tells the byte order, the declared name must be known by xml parser
+            order = 'utf-16-le' if head.startswith(codecs.BOM_UTF16_LE) else 'utf-16-be'
+            matchobj = Regex.XML_ENCODING.match(head[2:Default.SNIFF_SIZE].decode(order, 'ignore'))
+            if not matchobj or matchobj.group(1).upper() in self.UTF16_ENCODINGS:
+                return head
+        if codec in self.NATIVE_ENCODINGS:
+            if declared.upper() == self.NATIVE_ENCODINGS[codec]:
+                return head
+            self.__rewritten = True
+            return '<?xml version="1.0" encoding="{}"?>{}'.format(
+                self.NATIVE_ENCODINGS[codec], self.strip_xml_header(head))
+        self.__decoder = codecs.getincrementaldecoder(self.encoding)(errors=self.errors)
+        text = self.__decoder.decode(head, final)
+        return self.strip_xml_header(text).encode(Default.ENCODING)
+
+    @staticmethod
+    def strip_xml_header(head):
+        """Strip xml header at the beginning of head.
+
+        :param head: the head of xml content
+        :rtype: str
+        """
+        if head.startswith('<?xml'):
+            index = head.find('?>')
+            if index != -1:
+                return head[index + 2:]
+        return head
+
+    def convert(self, chunk, final=False):
+        if isinstance(chunk, unicode):
+            return chunk.encode(Default.ENCODING)
+        if self.__decoder:
+            return self.__decoder.decode(chunk, final).encode(Default.ENCODING)
+        return chunk
+
+    def escape(self, data, final=False):
+        """Escape the named entities which are undefined in xml out of CDATA sections, an entity,
+        a CDATA start or end split by chunks is kept until the next chunk.
+
+        :param str data: the converted chunk
+        :param bool final: whether it is the last chunk. Default to ``False``.
+        :rtype: str
+        """
+        if self.__pending:
+            data = self.__pending + data
+            self.__pending = ''
+        parts = []
+        offset = 0
+        while True:
+            if self.__cdata:
+                index = data.find(']]>', offset)
+                if index == -1:
+                    end = len(data) if final else max(offset, len(data) - 2)
+                    parts.append(data[offset:end])
+                    offset = end
+                    break
+                parts.append(data[offset:index + 3])
+                offset = index + 3
+                self.__cdata = False
+            else:
+                index = data.find('<![CDATA[', offset)
+                if index == -1:
+                    end = len(data)
+                    if not final:
+                        amp = data.rfind('&', max(offset, end - 32))
+                        if amp != -1 and ';' not in data[amp:]:
+                            end = amp
+                        lt = data.rfind('<', max(offset, len(data) - 8))
+                        if lt != -1 and '<![CDATA['.startswith(data[lt:]):
+                            end = min(end, lt)
+                    parts.append(entities.escape_undefined(data[offset:end]))
+                    offset = end
+                    break
+                parts.append(entities.escape_undefined(data[offset:index]))
+                parts.append('<![CDATA[')
+                offset = index + 9
+                self.__cdata = True
+        self.__pending = data[offset:]
+        return ''.join(parts)
+
+
+class RecordBuilder(object):
+    """Xml parser target which builds the matched records directly.
+
+    The output of every record is the same as :meth:`Parser.xml2object` for the record element.
+    Elements out of the records are never built.
+
+    .. versionadded:: 1.4
+    """
+
+    def __init__(self, record_path=None, unescape=False, strip_root=True,
+                 strip_attr=True, strip=True, projection=None, names=None, compact=False, limits=None):
+        """Constructor for RecordBuilder.
+
+        :param str record_path: slash separated element names from the root. if not set, the root element is the only record.
+        :param bool unescape: unescape xml html entity character of text. Default to ``False``.
+        :param bool strip_root: strip record root. Default to ``True``.
+        :param bool strip_attr: strip tag attrs. Default to ``True``.
+        :param bool strip: strip whitespace. Default to ``True``.
+        :param projection: the :class:`~lazyxml.projection.Projection` of records. Default to ``None``.
+        :param names: the :class:`~lazyxml.namespaces.TagCache` which converts tags to keys. if not set, the namespaces are dropped.
+        :param bool compact: build :class:`~lazyxml.nodes.Node` instead of dicts if ``strip_attr`` is ``False``. Default to ``False``.
+        :param limits: the :class:`~lazyxml.limits.Limits` of elements. Default to ``None``.
+        """
+        self.__path = self.split_path(record_path)
+        self.__names = names or ns_cache.DEFAULT_CACHE
+        self.__interner = nodes.Interner() if compact and not strip_attr else None
+        self.__projection = projection
+        self.__skip = 0
+        self.__unescape = unescape
+        self.__strip_root = strip_root
+        self.__strip_attr = strip_attr
+        self.__strip = strip
+        self.__depth = 0
+        self.__matched = 0
+        self.__frames = []
+        self.__records = []
+        self.__usage = resource_limits.Usage(limits) if limits is not None and limits.element_limits else None
+
+    @staticmethod
+    def split_path(record_path):
+        """Split record path to element names.
+
+        :param str record_path: slash separated element names
+        :rtype: tuple
         """
-        matchobj = Regex.XML_NS.search(tag)
-        return matchobj.groups() if matchobj else ('', tag)
+        names = tuple(name for name in (record_path or '').split('/') if name)
+        return names or ('*',)
+
+    def pop_records(self):
+        """Pop the completed records.
+
+        :rtype: list
+        """
+        records, self.__records = self.__records, []
+        return records
+
+    #: accept the ``namespace}tag`` names of expat as well as ``{namespace}tag``.
+    expat_names = True
+
+    def start(self, tag, attrib):
+        usage = self.__usage
+        if usage is not None:
+            usage.elements += 1
+            usage.depth += 1
+            usage.text_size = 0
+            if usage.elements > usage.max_elements or usage.depth > usage.max_depth:
+                usage.exceed()
+        if self.__skip:
+            self.__skip += 1
+            return
+        tag = self.__names.key(tag)
+        if attrib and not self.__strip_attr:
+            attrib = self.fix_attrib(attrib)
+            if self.__unescape:
+                attrib = entities.decode_attrs(attrib)
+        interner = self.__interner
+        if interner is not None:
+            tag = interner[tag]
+            attrib = interner.attrs(attrib)
+        frames = self.__frames
+        if frames:
+            parent = frames[-1]
+            if parent[3] is not None:
+                if self.__unescape:
+                    # the text around the children, which may contain markup
+                    parent[5] = parent[3]
+                parent[3] = None
+            if parent[5]:
+                # the elements of the text before the child are in the document order
+                self.merge_mixed(parent, usage.depth - 1 if usage is not None else 0)
+            state = parent[4]
+            if state is not None:
+                state = state.step(tag)
+                if state is False:
+                    self.__skip = 1
+                    return
+            frames.append([tag, attrib, {}, [], state, None])
+            return
+        depth = self.__depth
+        self.__depth += 1
+        if (self.__matched == depth < len(self.__path)
+                and self.__path[depth] in ('*', tag)):
+            self.__matched += 1
+            if self.__matched == len(self.__path):
+                state = None
+                if self.__projection is not None:
+                    state = self.__projection.root_state(tag)
+                frames.append([tag, attrib, {}, [], state, None])
+
+    def data(self, data):
+        usage = self.__usage
+        if usage is not None:
+            usage.text_size += len(data)
+            if usage.text_size > usage.max_text_size:
+                usage.exceed()
+        frames = self.__frames
+        if frames and not self.__skip:
+            texts = frames[-1][3]
+            if texts is not None:
+                texts.append(data)
+            elif self.__unescape:
+                frames[-1][5].append(data)
+
+    def end(self, tag):
+        usage = self.__usage
+        if usage is not None:
+            usage.depth -= 1
+            usage.text_size = 0
+        if self.__skip:
+            self.__skip -= 1
+            return
+        frames = self.__frames
+        if frames:
+            frame = frames.pop()
+            tag, attrib, values, texts, state, mixed = frame
+            if texts is not None:
+                values = self.text_value(''.join(texts), state)
+            elif mixed:
+                self.merge_mixed(frame, usage.depth + 1 if usage is not None else 0)
+            if frames:
+                if self.__strip_attr:
+                    value = values
+                elif self.__interner is not None:
+                    if values.__class__ is not dict:
+                        values = self.__interner.value(values)
+                    value = nodes.Node(values, attrib)
+                elif values.__class__ is dict:
+                    value = collections.defaultdict(dict, attrs=attrib)
+                    if values:
+                        value['values'] = values
+                else:
+                    value = {'values': values, 'attrs': attrib}
+                parent = frames[-1][2]
+                if tag not in parent:
+                    parent[tag] = value
+                else:
+                    if not isinstance(parent[tag], list):
+                        parent[tag] = [parent.pop(tag)]
+                    parent[tag].append(value)
+                return
+            self.__records.append(self.build_record(tag, attrib, values))
+        self.__depth -= 1
+        if self.__matched > self.__depth:
+            self.__matched = self.__depth
+
+    def close(self):
+        return None
+
+    @staticmethod
+    def fix_attrib(attrib):
+        """Convert the ``namespace}name`` attribute names to ``{namespace}name``.
+
+        :param dict attrib: element attributes
+        :rtype: dict
+        """
+        for key in [key for key in attrib if '}' in key and key[0] != '{']:
+            attrib['{' + key] = attrib.pop(key)
+        return attrib
+
+    def merge_mixed(self, frame, depth):
+        """Merge the elements of the pending text around the children of a frame into its values,
+        the text is consumed.
+
+        :param list frame: the frame of element
+        :param int depth: the depth of element in the document.
+        """
+        mixed = frame[5]
+        text = ''.join(mixed)
+        del mixed[:]
+        if '<' in text:
+            Parser.unescape_mixed(frame[2], text, frame[4], self.__strip, self.__names,
+                                  full=not self.__strip_attr, interner=self.__interner,
+                                  usage=self.__usage, depth=depth)
+
+    def text_value(self, text, state=None):
+        """Get the value of a leaf element from its text.
+
+        :param text: element text
+        :param state: the projection state of element.
+        :rtype: str or dict
+        """
+        text = utils.strip_whitespace(text, True) if self.__strip else text.strip()
+        if self.__unescape and ('&' in text or '<' in text):
+            usage = self.__usage
+            # the element of text is ended already
+            return Parser.unescape_text(text, state, self.__strip, self.__names,
+                                        full=not self.__strip_attr, interner=self.__interner,
+                                        usage=usage, depth=usage.depth + 1 if usage is not None else 0)
+        return text
+
+    def build_record(self, tag, attrib, values):
+        if not isinstance(values, dict):
+            values = {}
+        if self.__interner is not None:
+            if not self.__strip_root:
+                return {tag: nodes.Node(values, attrib)}
+            return nodes.Root(values)
+        if self.__strip_attr:
+            tree = values
+        else:
+            tree = collections.defaultdict(dict)
+            if values:
+                tree['values'] = values
+        if not self.__strip_root:
+            if not self.__strip_attr:
+                tree['attrs'] = attrib
+            return {tag: tree}
+        return tree
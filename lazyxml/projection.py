@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+
+"""Element path projection of :class:`~lazyxml.parser.Parser`.
+
+The ``include`` and ``exclude`` paths are compiled once into a matcher. Every element is matched
+by a state transition from its parent, the transitions are cached, so the cost of matching is a
+dict lookup per element.
+
+.. versionadded:: 1.4
+"""
+
+
+class Projection(object):
+    """Compiled include and exclude element paths.
+
+    A path is slash separated element names from the root, ``*`` matches any element.
+    The result is the same as the full result with the elements which are not included
+    or are excluded removed. An included element keeps its whole subtree, and the ancestors
+    of an included element are kept only for the path to it.
+
+    >>> projection = Projection(include=['order/id', 'order/lines/line/sku'])
+    >>> state = projection.start.step('order')
+    >>> state.step('id') is Projection.ALL
+    True
+    >>> state.step('note') is Projection.SKIP
+    True
+    """
+
+    #: the state of elements whose subtree is kept entirely.
+    ALL = None
+    #: the state of elements which are skipped.
+    SKIP = False
+
+    def __init__(self, include=None, exclude=None):
+        """Constructor for Projection.
+
+        :param list include: element paths to include. if not set, all elements are included.
+        :param list exclude: element paths to exclude. Default to ``None``.
+        """
+        self.__states = {}
+        include = (self.compile(include),) if include else None
+        exclude = (self.compile(exclude),) if exclude else ()
+        self.start = self.get_state(include, exclude)
+
+    @staticmethod
+    def compile(paths):
+        """Compile paths to a trie.
+
+        :param list paths: slash separated element paths
+        :rtype: PathNode
+        """
+        if isinstance(paths, basestring):
+            paths = [paths]
+        root = PathNode()
+        for path in paths:
+            node = root
+            for name in path.split('/'):
+                if name:
+                    node = node.children.setdefault(name, PathNode())
+            node.terminal = True
+        return root
+
+    def root_state(self, tag):
+        """Get the state of the root element, the root element is always kept.
+
+        :param str tag: the root element tag name
+        :return: :attr:`ALL` if all elements of the tree are kept.
+        :rtype: ProjectionState or None
+        """
+        if self.start is self.ALL:
+            return self.ALL
+        state = self.start.step(tag)
+        if state is self.SKIP:
+            return self.get_state((), ())
+        return state
+
+    def get_state(self, include, exclude):
+        """Get the shared state of trie nodes.
+
+        :param include: the matched include trie nodes, ``None`` if all elements are included.
+        :param exclude: the matched exclude trie nodes.
+        :return: :attr:`ALL` if all elements of the subtree are kept.
+        :rtype: ProjectionState or None
+        """
+        if include is None and not exclude:
+            return self.ALL
+        key = (include, exclude)
+        state = self.__states.get(key)
+        if state is None:
+            state = self.__states[key] = ProjectionState(self, include, exclude)
+        return state
+
+
+class PathNode(object):
+    """Trie node of compiled paths.
+    """
+
+    __slots__ = ('children', 'terminal')
+
+    def __init__(self):
+        self.children = {}
+        self.terminal = False
+
+    def match(self, tag):
+        """Get the child nodes matched by tag.
+
+        :param str tag: element tag name
+        :rtype: list
+        """
+        nodes = []
+        for name in (tag, '*'):
+            node = self.children.get(name)
+            if node is not None:
+                nodes.append(node)
+        return nodes
+
+
+class ProjectionState(object):
+    """Projection state of an element, which decides the children to keep.
+    """
+
+    __slots__ = ('projection', 'include', 'exclude', 'transitions')
+
+    def __init__(self, projection, include, exclude):
+        self.projection = projection
+        self.include = include
+        self.exclude = exclude
+        self.transitions = {}
+
+    def step(self, tag):
+        """Get the state of a child element.
+
+        :param str tag: the child element tag name
+        :return: :attr:`Projection.SKIP` if the child is skipped, :attr:`Projection.ALL` if the whole child is kept.
+        """
+        try:
+            return self.transitions[tag]
+        except KeyError:
+            state = self.transitions[tag] = self.transit(tag)
+            return state
+
+    def transit(self, tag):
+        include = None
+        if self.include is not None:
+            nodes = [node for parent in self.include for node in parent.match(tag)]
+            if not nodes:
+                return Projection.SKIP
+            if not any(node.terminal for node in nodes):
+                include = tuple(nodes)
+        nodes = [node for parent in self.exclude for node in parent.match(tag)]
+        if any(node.terminal for node in nodes):
+            return Projection.SKIP
+        return self.projection.get_state(include, tuple(nodes))
@@ -0,0 +1,399 @@
+# -*- coding: utf-8 -*-
+
+"""Serializers compiled from the schema of documents of a fixed shape.
+
+A schema declares the shape of the data of :func:`lazyxml.dumps` once, the data is dumped by
+python code generated for it: the static markup, i.e. the header, the tags, the indents and the
+attribute names, is rendered at compile time and merged into constants, the elements are dumped
+in a fixed order, and the type of every value is checked instead of dispatched. The data which
+does not match the schema, e.g. a missing key or a generator in place of a list, is detected
+before anything of it is consumed and dumped by the generic :class:`~lazyxml.builder.Builder`.
+
+The schema mirrors the data:
+
+* a mapping is an element of the children of its keys. The children are dumped in the key order
+  of the data as the generic builder does, the items of a ``dict`` schema are dispatched by key.
+  The fixed order is rendered into the static markup with the ``ksort`` option, in the sorted order,
+  or for an ``OrderedDict`` schema, in its order: the data matches only if its keys iterate in the
+  same order, e.g. an ``OrderedDict`` built in the order of schema. So the order never depends on
+  whether the data matches. Without ``ksort``, a ``dict`` schema is dispatched per key and the
+  static markup is merged only within the elements of its children.
+* ``[schema]`` is a list or tuple of values of ``schema``, dumped as repeated elements.
+* ``{attrkey: {name: type}, valuekey: schema}`` is an element with attributes if ``hasattr`` is set.
+* ``str``, ``unicode`` or ``basestring`` is a text value, ``None`` is dumped as empty text.
+  ``int``, ``long``, ``float`` or ``bool`` is a value of the type, which is never escaped.
+
+>>> builder = SchemaBuilder({'user': {'id': int, 'tags': [str]}}, header_declare=False, ksort=True)
+>>> builder.dumps({'user': {'id': 1, 'tags': ['a', 'b']}})
+u'<user><id><![CDATA[1]]></id><tags><![CDATA[a]]></tags><tags><![CDATA[b]]></tags></user>'
+
+.. versionadded:: 1.4
+"""
+
+import collections
+import itertools
+
+from . import compression as compress, escaping
+from .builder import Builder, CompiledBuilder, IndentTable
+from .consts import Default
+
+TEXT_TYPES = frozenset([str, unicode])
+DICT_TYPES = frozenset([dict, collections.OrderedDict])
+SEQUENCE_TYPES = frozenset([list, tuple])
+#: the leaf types of schema to the types of values which match them.
+LEAF_TYPES = {
+    str: TEXT_TYPES,
+    unicode: TEXT_TYPES,
+    basestring: TEXT_TYPES,
+    int: frozenset([int, long]),
+    long: frozenset([int, long]),
+    float: frozenset([float]),
+    bool: frozenset([bool]),
+}
+
+
+class SchemaMismatch(Exception):
+    """The data does not match the schema, it is dumped by the generic builder.
+    """
+
+
+class SchemaCompiler(object):
+    """Generate the python code of the serializer of a schema.
+    """
+
+    def __init__(self, options):
+        """Constructor for SchemaCompiler.
+
+        :param dict options: the options of :class:`~lazyxml.builder.Builder`
+        """
+        self.__cdata = options.get('cdata', True)
+        self.__ksort = options.get('ksort', False)
+        self.__reverse = options.get('reverse', False)
+        self.__hasattr = options.get('hasattr', False)
+        self.__attrkey = options.get('attrkey') or Default.KEY_ATTR
+        self.__valuekey = options.get('valuekey') or Default.KEY_VALUE
+        self.__indents = IndentTable(options.get('indent'))
+        self.__lines = []
+        self.__pieces = []
+        self.__names = {}
+        self.__counter = itertools.count()
+        self.namespace = {
+            'Mismatch': SchemaMismatch,
+            'TEXT_TYPES': TEXT_TYPES,
+            'DICT_TYPES': DICT_TYPES,
+            'SEQUENCE_TYPES': SEQUENCE_TYPES,
+            'escape_text': escaping.escape_text,
+            'escape_attr': escaping.escape_attr,
+        }
+
+    def compile(self, schema, root=None, header=''):
+        """Compile the serializer of schema.
+
+        :param schema: the schema of data, a mapping of the root to its schema if ``root`` is not set.
+        :param str root: the ``root`` option of builder.
+        :param str header: the xml header.
+        :return: a function which returns the list of xml fragments of data.
+        :raise ValueError: if the schema is invalid.
+        """
+        self.static(header)
+        self.line(0, 'def serialize(data):')
+        self.line(1, 'fragments = []')
+        self.line(1, 'append = fragments.append')
+        self.line(1, 'extend = fragments.extend')
+        if root:
+            self.node(schema, root, 'data', 0, 1)
+        else:
+            if not isinstance(schema, collections.Mapping) or len(schema) != 1:
+                raise ValueError('if root not specified, the schema must be a mapping of one root: {!r}'.format(schema))
+            root, schema = schema.items()[0]
+            self.line(1, 'if type(data) not in DICT_TYPES or len(data) != 1:')
+            self.line(2, 'raise Mismatch')
+            self.node(schema, root, self.lookup('data', root, 1), 0, 1)
+        self.flush(1)
+        self.line(1, 'return fragments')
+        source = '\n'.join(self.__lines)
+        exec compile(source, '<schema>', 'exec') in self.namespace
+        serialize = self.namespace['serialize']
+        serialize.source = source
+        return serialize
+
+    def node(self, schema, tagname, var, depth, level, attrs=None):
+        """Generate the code of a node.
+
+        :param schema: the schema of node
+        :param tagname: element tag name
+        :param str var: the variable of the value of node
+        :param int depth: element depth of the hierarchy
+        :param int level: the indent level of the code
+        :param attrs: a pair of the variable and the schema of the attributes of node, or ``None``.
+        """
+        if isinstance(schema, list):
+            if len(schema) != 1:
+                raise ValueError('a list schema must have one item schema: {!r}'.format(schema))
+            self.line(level, 'if type({}) not in SEQUENCE_TYPES:'.format(var))
+            self.line(level + 1, 'raise Mismatch')
+            item = self.variable()
+            self.flush(level)
+            self.line(level, 'for {} in {}:'.format(item, var))
+            self.node(schema[0], tagname, item, depth, level + 1, attrs)
+            self.flush(level + 1)
+        elif isinstance(schema, collections.Mapping):
+            if self.__hasattr and set(schema) <= {self.__attrkey, self.__valuekey}:
+                self.attr_node(schema, tagname, var, depth, level)
+                return
+            keys = self.keys(schema)
+            fixed = self.__ksort or isinstance(schema, collections.OrderedDict)
+            if fixed and not self.__ksort:
+                self.line(level, 'if type({}) not in DICT_TYPES or tuple({}) != {}:'.format(
+                    var, var, self.constant(tuple(keys))))
+            else:
+                self.line(level, 'if type({}) not in DICT_TYPES or len({}) != {}:'.format(var, var, len(keys)))
+            self.line(level + 1, 'raise Mismatch')
+            indent = self.__indents[depth]
+            self.static(indent)
+            self.start_tag(tagname, attrs, level)
+            if fixed:
+                for key in keys:
+                    self.node(schema[key], key, self.lookup(var, key, level), depth + 1, level)
+            elif keys:
+                self.children(schema, keys, var, depth + 1, level)
+            self.static(indent + Builder.tag_end(tagname))
+        elif schema is None or schema in LEAF_TYPES:
+            self.leaf(schema, tagname, var, depth, level, attrs)
+        else:
+            raise ValueError('unknown schema of {!r}: {!r}'.format(tagname, schema))
+
+    def children(self, schema, keys, var, depth, level):
+        """Generate the children of a mapping node in the key order of data, as the generic builder does.
+
+        The items of data are dispatched by key, the length of data is checked before, so every key
+        of schema is dumped once if no key is unknown.
+        """
+        key, value = self.variable(), self.variable()
+        self.flush(level)
+        self.line(level, 'for {}, {} in {}.iteritems():'.format(key, value, var))
+        for i, name in enumerate(keys):
+            self.line(level + 1, '{} {} == {}:'.format('elif' if i else 'if', key, self.constant(name)))
+            self.node(schema[name], name, value, depth, level + 2)
+            self.flush(level + 2)
+        self.line(level + 1, 'else:')
+        self.line(level + 2, 'raise Mismatch')
+
+    def attr_node(self, schema, tagname, var, depth, level):
+        """Generate the code of a node whose value is its attributes and values.
+        """
+        attr_schema = schema.get(self.__attrkey) or {}
+        value_schema = schema.get(self.__valuekey)
+        if not isinstance(attr_schema, collections.Mapping) or not all(
+                value in LEAF_TYPES for value in attr_schema.itervalues()):
+            raise ValueError('the attributes schema of {!r} must be a mapping of types: {!r}'.format(tagname, attr_schema))
+        if isinstance(value_schema, collections.Mapping) and set(value_schema) <= {self.__attrkey, self.__valuekey}:
+            raise ValueError('the values schema of {!r} must not have attributes: {!r}'.format(tagname, value_schema))
+        self.line(level, 'if type({}) not in DICT_TYPES or len({}) != 2:'.format(var, var))
+        self.line(level + 1, 'raise Mismatch')
+        attr_var = self.lookup(var, self.__attrkey, level)
+        value_var = self.lookup(var, self.__valuekey, level)
+        self.line(level, 'if type({}) not in DICT_TYPES or len({}) != {} or not {}:'.format(
+            attr_var, attr_var, len(attr_schema), value_var))
+        self.line(level + 1, 'raise Mismatch')
+        self.node(value_schema, tagname, value_var, depth, level, (attr_var, attr_schema))
+
+    def leaf(self, schema, tagname, var, depth, level, attrs):
+        """Generate the code of a scalar node.
+        """
+        if schema is None:
+            self.line(level, 'if {} is not None:'.format(var))
+            self.line(level + 1, 'raise Mismatch')
+            text = None
+        elif LEAF_TYPES[schema] is TEXT_TYPES:
+            text = self.text_expr(var, level)
+        else:
+            self.line(level, 'if type({}) not in {}:'.format(var, self.constant(LEAF_TYPES[schema])))
+            self.line(level + 1, 'raise Mismatch')
+            text = 'str({})'.format(var)
+        self.static(self.__indents[depth])
+        self.start_tag(tagname, attrs, level)
+        if self.__cdata:
+            self.static('<![CDATA[')
+        if text is not None:
+            self.piece(text)
+        if self.__cdata:
+            self.static(']]>')
+        self.static(Builder.tag_end(tagname))
+
+    def text_expr(self, var, level):
+        """Generate the checks of a text value and return the expression of its escaped text.
+        """
+        self.line(level, 'if type({}) not in TEXT_TYPES:'.format(var))
+        self.line(level + 1, 'if {} is not None:'.format(var))
+        self.line(level + 2, 'raise Mismatch')
+        self.line(level + 1, "{} = ''".format(var))
+        if self.__cdata:
+            return "({0} if ']]>' not in {0} else {0}.replace(']]>', ']]]]><![CDATA[>'))".format(var)
+        return ("({0} if '&' not in {0} and '<' not in {0} and '>' not in {0} and '\"' not in {0} "
+                "else escape_text({0}))".format(var))
+
+    def start_tag(self, tagname, attrs, level):
+        """Generate the started tag, the attribute values are looked up in the sorted order of names.
+        """
+        if not attrs or not attrs[1]:
+            self.static(Builder.tag_start(tagname))
+            return
+        attr_var, attr_schema = attrs
+        self.static('<%s' % tagname)
+        for name in sorted(attr_schema):
+            value = self.lookup(attr_var, name, level)
+            if LEAF_TYPES[attr_schema[name]] is TEXT_TYPES:
+                self.line(level, 'if type({}) not in TEXT_TYPES:'.format(value))
+                self.line(level + 1, 'raise Mismatch')
+                self.static(' %s="' % name)
+                self.piece('escape_attr({})'.format(value))
+            else:
+                self.line(level, 'if type({}) not in {}:'.format(value, self.constant(LEAF_TYPES[attr_schema[name]])))
+                self.line(level + 1, 'raise Mismatch')
+                self.static(' %s="' % name)
+                self.piece('str({})'.format(value))
+            self.static('"')
+        self.static('>')
+
+    def keys(self, schema):
+        """Get the keys of a mapping schema, in the order of elements with the ``ksort`` option or
+        of an ``OrderedDict`` schema.
+        """
+        if self.__ksort:
+            return sorted(schema, reverse=self.__reverse)
+        return list(schema)
+
+    def lookup(self, var, key, level):
+        """Generate the lookup of key in the variable of a dict, and return the variable of the value.
+        """
+        value = self.variable()
+        self.line(level, '{} = {}[{}]'.format(value, var, self.constant(key)))
+        return value
+
+    def variable(self):
+        return 'v{}'.format(next(self.__counter))
+
+    def constant(self, value):
+        """Get the name of a constant of the generated code.
+        """
+        key = (type(value), value)
+        name = self.__names.get(key)
+        if name is None:
+            name = self.__names[key] = 'K{}'.format(len(self.__names))
+            self.namespace[name] = value
+        return name
+
+    def static(self, text):
+        """Add static markup to the pending pieces, it is merged with the static markup before it.
+        """
+        if not text:
+            return
+        if self.__pieces and isinstance(self.__pieces[-1], tuple):
+            self.__pieces[-1] = (self.__pieces[-1][0] + text,)
+        else:
+            self.__pieces.append((text,))
+
+    def piece(self, expr):
+        """Add the expression of a dynamic piece to the pending pieces.
+        """
+        self.__pieces.append(expr)
+
+    def flush(self, level):
+        """Generate the appending of the pending pieces.
+        """
+        pieces = [self.constant(piece[0]) if isinstance(piece, tuple) else piece for piece in self.__pieces]
+        self.__pieces = []
+        if len(pieces) == 1:
+            self.line(level, 'append({})'.format(pieces[0]))
+        elif pieces:
+            self.line(level, 'extend(({}))'.format(', '.join(pieces)))
+
+    def line(self, level, code):
+        self.__lines.append('    ' * level + code)
+
+
+class SchemaBuilder(CompiledBuilder):
+    """Compiled builder with a serializer generated for the schema of data.
+
+    :meth:`dumps` dumps the data which matches the schema by the generated code, and the other
+    data by the generic builder of :class:`~lazyxml.builder.CompiledBuilder`.
+    :meth:`iterdumps` and :meth:`dump` write the result of :meth:`dumps`, the documents of a fixed
+    shape are small; the large documents of generators are streamed by the generic builder.
+
+    >>> builder = SchemaBuilder({'user': {'id': int}}, header_declare=False)
+    >>> builder.dumps({'user': {'id': 1}})
+    u'<user><id><![CDATA[1]]></id></user>'
+    >>> builder.dumps({'user': {'id': 1, 'name': 'foo'}})  # falls back to the generic builder
+    u'<user><id><![CDATA[1]]></id><name><![CDATA[foo]]></name></user>'
+
+    .. versionadded:: 1.4
+    """
+
+    def __init__(self, schema, **options):
+        """Constructor for SchemaBuilder.
+
+        :param schema: the schema of data, see :mod:`lazyxml.schema`.
+        :param options: the options of :class:`~lazyxml.builder.Builder`
+        :raise ValueError: if the schema or an option is invalid.
+        """
+        super(SchemaBuilder, self).__init__(**options)
+        encoding = options.get('encoding') or Default.ENCODING
+        header = ''
+        if options.get('header_declare', True):
+            header = Builder.build_xml_header(encoding, options.get('version'))
+        self.__serialize = SchemaCompiler(options).compile(schema, options.get('root'), header)
+        self.__encoding = encoding if encoding != Default.ENCODING else None
+        self.__errors = options.get('errors') or 'strict'
+        self.__schema = schema
+
+    @property
+    def schema(self):
+        """The schema of data.
+        """
+        return self.__schema
+
+    @property
+    def source(self):
+        """The python source of the generated serializer.
+
+        :rtype: str
+        """
+        return self.__serialize.source
+
+    def dumps(self, obj):
+        """Dump python object to xml, see :func:`lazyxml.dumps`.
+
+        :param obj: data for dump to xml.
+        :rtype: str
+        """
+        try:
+            fragments = self.__serialize(obj)
+        except (SchemaMismatch, KeyError):
+            return super(SchemaBuilder, self).dumps(obj)
+        xml = unicode(''.join(fragments).strip())
+        if self.__encoding is not None:
+            xml = xml.encode(self.__encoding, errors=self.__errors)
+        return xml
+
+    def iterdumps(self, obj, chunk_size=None):
+        """Dump python object to the encoded chunks of xml, see :func:`lazyxml.iterdumps`.
+
+        :param obj: data for dump to xml.
+        :param int chunk_size: the size of chunk. if not set, ``consts.Default.CHUNK_SIZE`` used.
+        :rtype: iterator
+        """
+        xml = self.dumps(obj)
+        if isinstance(xml, unicode):
+            xml = xml.encode(Default.ENCODING)
+        chunk_size = chunk_size or Default.CHUNK_SIZE
+        return (xml[i:i + chunk_size] for i in xrange(0, len(xml), chunk_size))
+
+    def dump(self, obj, fp, compression=None):
+        """Dump python object to file, see :func:`lazyxml.dump`.
+
+        :param obj: data for dump to xml.
+        :param fp: a filename or a file or file-like object that support ``.write()`` to write the xml content.
+        :param str compression: the compression of file. if not set, detected by the file extension.
+        """
+        compress.write_file(fp, self.dumps(obj), compression)
@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+
+"""Sharded parallel parsing of a single large xml file.
+
+The file is split at record boundaries by a scan of the memory mapping, a boundary is the end
+tag of a record which is not in a comment, cdata section or processing instruction. Every shard is wrapped in the envelope of the document, the xml
+declaration and the start tags of the ancestors of records with their namespace declarations,
+and parsed in the shared process pool.
+
+The records after the parent element of the first record can not be wrapped in its envelope,
+such a document is parsed serially by the path of records at the depth of the first record.
+The records must not be nested in records of the same tag, and the content must be in an ascii
+compatible encoding.
+
+.. versionadded:: 1.4
+"""
+
+import codecs
+import collections
+import functools
+import os
+import re
+
+from . import executor, namespaces as ns_cache, parser, utils
+from .consts import Default
+
+Envelope = collections.namedtuple('Envelope', 'head tail record_path start end outside')
+
+# comments, cdata, doctype and processing instructions, which may contain tags
+MARKUP = re.compile(r'<!--.*?-->|<!\[CDATA\[.*?\]\]>|<![^>]*>|<\?.*?\?>', re.S)
+# the markup, or a tag of (slash, name, attributes, self closing slash)
+TOKEN = re.compile(MARKUP.pattern + r'|<(/?)([^\s/>]+)((?:"[^"]*"|\'[^\']*\'|[^\'">])*?)(/?)>', re.S)
+ATTRS = r'(?:"[^"]*"|\'[^\']*\'|[^\'">])*?'
+XMLNS = re.compile(r'xmlns(?::([^\s=]+))?\s*=\s*(?:"([^"]*)"|\'([^\']*)\')')
+UNSUPPORTED_BOMS = (codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE, codecs.BOM_UTF32_LE, codecs.BOM_UTF32_BE)
+
+
+def find_envelope(content, record_tag, namespaces=None):
+    """Find the envelope of records.
+
+    :param content: xml content, or a :class:`mmap.mmap` of it
+    :param str record_tag: the raw tag of records in the document, e.g. ``item`` or ``ns:item``.
+    :param namespaces: the ``namespaces`` option of parser, to format the key of records.
+    :return: the envelope, ``head`` and ``tail`` wrap every shard, records of the shards are
+        matched by ``record_path``, the records lie in ``content[start:end]``. ``outside`` is set
+        if there are records after ``end``, which are not in the parent element of the first record.
+    :rtype: Envelope
+    :raise ValueError: if there is no record, or the encoding is not supported.
+    """
+    if content[:4].startswith(UNSUPPORTED_BOMS):
+        raise ValueError('sharded parsing only supports ascii compatible encodings')
+    declaration = ''
+    stack = []
+    for matchobj in TOKEN.finditer(content):
+        slash, name, attrs, closed = matchobj.groups()
+        if name is None:
+            if matchobj.group(0).startswith('<?xml'):
+                declaration = matchobj.group(0)
+            continue
+        if slash:
+            stack.pop()
+        elif name == record_tag:
+            start = matchobj.start()
+            break
+        elif not closed:
+            stack.append((name, matchobj.group(0)))
+    else:
+        raise ValueError('record tag is not found: {!r}'.format(record_tag))
+    end, outside = len(content), False
+    if stack:
+        scanner = TagScanner(content, start)
+        end = find_end(scanner, stack[-1][0], start)
+        records = re.compile(r'<{}(?=[\s/>])'.format(re.escape(record_tag)))
+        outside = scanner.search(records, end) is not None
+    head = declaration + ''.join(tag for _, tag in stack)
+    tail = ''.join('</{}>'.format(name) for name, _ in reversed(stack))
+    key = record_key(record_tag, head + content[start:start + 4096], namespaces)
+    record_path = '/'.join(['*'] * len(stack) + [key])
+    return Envelope(head, tail, record_path, start, end, outside)
+
+
+class TagScanner(object):
+    """Search the tags of content forward, the tags in comments, cdata sections and processing
+    instructions are skipped.
+
+    The tags are searched by regular expressions in C, and the next markup which may contain tags
+    is tracked aside, so there is no python code per element.
+    """
+
+    def __init__(self, content, start, end=None):
+        """Constructor for TagScanner.
+
+        :param content: xml content, or a :class:`mmap.mmap` of it
+        :param int start: the offset to scan from, which is not in markup.
+        :param int end: the offset to scan to. if not set, the end of content.
+        """
+        self.__content = content
+        self.__end = len(content) if end is None else end
+        self.__markup = MARKUP.search(content, start, self.__end)
+
+    def search(self, pattern, pos):
+        """Search the first match of a tag pattern at or after ``pos`` which is not in markup.
+
+        :param pattern: the compiled pattern of tags
+        :param int pos: the offset to search from, which is not before the offsets searched from before.
+        :return: the match object, or ``None`` if not found.
+        """
+        content, end = self.__content, self.__end
+        while True:
+            matchobj = pattern.search(content, pos, end)
+            if matchobj is None:
+                return None
+            markup = self.__markup
+            while markup is not None and markup.end() <= matchobj.start():
+                markup = MARKUP.search(content, markup.end(), end)
+            self.__markup = markup
+            if markup is None or markup.start() >= matchobj.end():
+                return matchobj
+            pos = markup.end()
+
+
+def find_end(scanner, parent_tag, start):
+    """Find the end tag of the parent element of records.
+
+    :param TagScanner scanner: the scanner of content
+    :param str parent_tag: the raw tag of the parent element
+    :param int start: the offset of the first record
+    :return: the offset of the end tag
+    :rtype: int
+    :raise ValueError: if the end tag is not found.
+    """
+    pattern = re.compile(r'<(/?){}(?=[\s/>]){}(/?)>'.format(re.escape(parent_tag), ATTRS))
+    depth = 0
+    matchobj = scanner.search(pattern, start)
+    while matchobj is not None:
+        slash, closed = matchobj.groups()
+        if not slash:
+            depth += 0 if closed else 1
+        elif depth:
+            depth -= 1
+        else:
+            return matchobj.start()
+        matchobj = scanner.search(pattern, matchobj.end())
+    raise ValueError('the end tag of records is not found: {!r}'.format(parent_tag))
+
+
+def record_key(record_tag, head, namespaces=None):
+    """Get the key of records in the python object.
+
+    :param str record_tag: the raw tag of records
+    :param str head: the content which declares the namespace of records
+    :param namespaces: the ``namespaces`` option of parser.
+    :rtype: str
+    """
+    prefix, _, name = record_tag.rpartition(':')
+    if not namespaces:
+        return name
+    uri = ''
+    for matchobj in XMLNS.finditer(head):
+        if (matchobj.group(1) or '') == prefix:
+            uri = matchobj.group(2) if matchobj.group(2) is not None else matchobj.group(3)
+    return ns_cache.get_cache(namespaces).format(uri, name)
+
+
+def split_shards(content, record_tag, envelope, size):
+    """Split the records of content to shards at record boundaries.
+
+    :param content: xml content, or a :class:`mmap.mmap` of it
+    :param str record_tag: the raw tag of records
+    :param Envelope envelope: the envelope of records
+    :param int size: the approximate size of a shard in bytes
+    :return: a list of ``(start, end)`` offsets of shards
+    :rtype: list
+    """
+    boundary = re.compile(r'</{0}\s*>|<{0}(?=[\s/>]){1}/>'.format(re.escape(record_tag), ATTRS))
+    shards = []
+    start, end = envelope.start, envelope.end
+    scanner = TagScanner(content, start, end)
+    while end - start > size:
+        matchobj = scanner.search(boundary, start + size)
+        if matchobj is None:
+            break
+        shards.append((start, matchobj.end()))
+        start = matchobj.end()
+    shards.append((start, end))
+    return shards
+
+
+def parse_shard(options, path, envelope, shard):
+    """Parse the records of a shard of file, it runs in worker process.
+
+    :param dict options: the options of :class:`~lazyxml.parser.Parser`
+    :param str path: the xml file path
+    :param Envelope envelope: the envelope of records
+    :param tuple shard: the ``(start, end)`` offsets of shard
+    :return: the records of shard
+    :rtype: list
+    """
+    try:
+        with utils.map_file(path) as mapping:
+            body = mapping[shard[0]:shard[1]]
+        stream = parser.Parser(**options).create_stream(envelope.record_path)
+        records = stream.feed(envelope.head)
+        for chunk in utils.iter_slices(body, Default.MMAP_CHUNK_SIZE):
+            records.extend(stream.feed(chunk))
+        records.extend(stream.feed(envelope.tail))
+        records.extend(stream.close())
+    except Exception as e:
+        raise executor.portable_error(e)
+    return records
+
+
+def imap_shards(path, record_tag, options, workers=None, ordered=True, shard_size=None):
+    """Iterate the records of a large xml file parsed in shards by the shared process pool.
+
+    :param str path: the xml file path
+    :param str record_tag: the raw tag of records in the document, e.g. ``item`` or ``ns:item``.
+    :param dict options: the options of :class:`~lazyxml.parser.Parser`
+    :param int workers: the number of worker processes. if not set, ``consts.Default.WORKERS`` used.
+    :param bool ordered: yield records in document order, or the records of shards in completion order. Default to ``True``.
+    :param int shard_size: the approximate size of a shard in bytes. if not set, the file is split into
+        four shards per worker of at most ``consts.Default.SHARD_SIZE``.
+    :rtype: generator
+
+    .. note::
+        If there are records outside the parent element of the first record, the file is parsed
+        serially by the path of records at the depth of the first record.
+    """
+    workers = workers or Default.WORKERS
+    with utils.map_file(path) as mapping:
+        envelope = find_envelope(mapping, record_tag, options.get('namespaces'))
+        if not envelope.outside:
+            if not shard_size:
+                shard_size = max(Default.CHUNK_SIZE, min(Default.SHARD_SIZE, len(mapping) // (workers * 4) + 1))
+            shards = split_shards(mapping, record_tag, envelope, shard_size)
+    if envelope.outside:
+        # the records under the other parents are not wrapped by the envelope of the first record
+        for record in parser.Parser(**options).iterparse(path, envelope.record_path):
+            yield record
+        return
+    task = functools.partial(parse_shard, options, os.path.abspath(path), envelope)
+    for records in executor.imap_bounded(task, shards, 'process', workers, ordered):
+        for record in records:
+            yield record
@@ -1,26 +1,79 @@
 # -*- coding: utf-8 -*-
 
-import htmlentitydefs
+import contextlib
+import itertools
+import mmap
+import os
 
-from .consts import Default, Regex
+from . import entities
+from .consts import Default
 
 
-def html_entity_decode_char(matchobj, defs=htmlentitydefs.entitydefs):
-    try:
-        return defs[matchobj.group(1)]
-    except KeyError:
-        return matchobj.group(0)
+def html_entity_decode(s):
+    return entities.decode(s)
 
 
-def html_entity_decode(s):
-    return Regex.HTML_ENTITY.sub(html_entity_decode_char, s)
+WHITESPACE = '\r\n\t\x0B'
+WHITESPACE_TABLE = dict.fromkeys(ord(c) for c in WHITESPACE)
 
 
 def strip_whitespace(s, strict=False):
-    s = s.replace('\r', '').replace('\n', '').replace('\t', '').replace('\x0B', '')
+    if isinstance(s, unicode):
+        s = s.translate(WHITESPACE_TABLE)
+    else:
+        s = s.translate(None, WHITESPACE)
     return s.strip() if strict else s
 
 
+def read_chunks(fp, size=Default.CHUNK_SIZE):
+    while True:
+        chunk = fp.read(size)
+        if not chunk:
+            break
+        yield chunk
+
+
+@contextlib.contextmanager
+def map_file(fp):
+    """Map the whole file read-only, the slices of mapping are read from the page cache.
+
+    :param fp: a filename, or a file object that support ``.fileno()``
+    :return: a context manager of the :class:`mmap.mmap`, or an empty string of an empty file.
+    """
+    fobj = open(fp, 'rb') if isinstance(fp, basestring) else fp
+    try:
+        fileno = fobj.fileno()
+        mapping = ''
+        if os.fstat(fileno).st_size:
+            mapping = mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+        try:
+            yield mapping
+        finally:
+            if mapping:
+                mapping.close()
+    finally:
+        if fobj is not fp:
+            fobj.close()
+
+
+def is_file(obj):
+    return hasattr(obj, 'read') and not isinstance(obj, mmap.mmap)
+
+
+def iter_slices(s, size=Default.CHUNK_SIZE):
+    for i in xrange(0, len(s), size):
+        yield s[i:i + size]
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            break
+        yield batch
+
+
 def is_iterable(obj):
     try:
         iter(obj)
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+
+import sys
+reload(sys)
+sys.setdefaultencoding('utf-8')
+import unittest
+
+import lazyxml
+from lazyxml.backends import BACKENDS
+from lazyxml.consts import Default
+from tests import test_parser
+
+
+class BackendMixin(object):
+    backend = None
+
+    def setUp(self):
+        self.default_backend, Default.BACKEND = Default.BACKEND, self.backend
+
+    def tearDown(self):
+        Default.BACKEND = self.default_backend
+
+
+class ExpatParserTest(BackendMixin, test_parser.ParserTest):
+    backend = 'expat'
+
+
+@unittest.skipUnless('lxml' in BACKENDS, 'lxml is not installed')
+class LxmlParserTest(BackendMixin, test_parser.ParserTest):
+    backend = 'lxml'
+
+
+class BackendTest(unittest.TestCase):
+
+    def test_unknown_backend(self):
+        self.assertRaises(ValueError, lazyxml.loads, '<demo/>', backend='unknown')
+
+    def test_parse_error(self):
+        for backend in BACKENDS:
+            self.assertRaises(SyntaxError, lazyxml.loads, '<demo><foo></demo>', backend=backend)
+
+    def test_comment(self):
+        xml = '<demo><!-- comment --><foo>f<!-- comment -->oo</foo><?pi data?><bar a="1"/></demo>'
+        a = {'foo': 'foo', 'bar': ''}
+        for backend in BACKENDS:
+            self.assertEqual(lazyxml.loads(xml, backend=backend), a)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -42,6 +42,241 @@ class BuilderTest(unittest.TestCase):
         self.assertEqual(buf.getvalue(), self.xml)
         buf.close()
 
+    def test_reuse(self):
+        builder = lazyxml.builder.Builder()
+        self.assertEqual(builder.object2xml(self.data), self.xml)
+        self.assertEqual(builder.object2xml(self.data), self.xml)
+
+    def test_compile_builder(self):
+        import threading
+        self.assertRaises(ValueError, lazyxml.compile_builder, encoding='unknown')
+        self.assertRaises(ValueError, lazyxml.compile_builder, indent=4)
+        self.assertRaises(ValueError, lazyxml.compile_builder, attrkey='{a}', valuekey='{a}')
+        builder = lazyxml.compile_builder()
+        docs = [(self.data, self.xml)] + [
+            ({'demo': {'id': str(i)}}, u'<?xml version="1.0" encoding="utf-8"?><demo><id><![CDATA[{}]]></id></demo>'.format(i))
+            for i in xrange(5)]
+        failures = []
+
+        def worker(offset):
+            try:
+                for i in xrange(200):
+                    data, expected = docs[(i + offset) % len(docs)]
+                    xml = builder.dumps(data)
+                    if xml != expected:
+                        failures.append(xml)
+            except Exception as e:
+                failures.append(e)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in xrange(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(failures, [])
+        buf = io.StringIO()
+        builder.dump(self.data, buf)
+        self.assertEqual(buf.getvalue(), self.xml)
+
+    def test_dump_compression(self):
+        import bz2
+        import gzip
+        import os
+        import shutil
+        import tempfile
+        buf = io.BytesIO()
+        lazyxml.dump(self.data, buf, compression='gzip')
+        buf.seek(0)
+        self.assertEqual(gzip.GzipFile(fileobj=buf).read().decode('utf-8'), self.xml)
+        self.assertRaises(ValueError, lazyxml.dump, self.data, io.BytesIO(), compression='unknown')
+        path = tempfile.mkdtemp()
+        try:
+            lazyxml.dump(self.data, os.path.join(path, 'demo.xml.bz2'))
+            with open(os.path.join(path, 'demo.xml.bz2'), 'rb') as fp:
+                self.assertEqual(bz2.decompress(fp.read()).decode('utf-8'), self.xml)
+            with open(os.path.join(path, 'demo.xml.gz'), 'wb') as fp:
+                lazyxml.compile_builder().dump(self.data, fp)
+            self.assertEqual(lazyxml.load(os.path.join(path, 'demo.xml.gz')), lazyxml.loads(self.xml))
+        finally:
+            shutil.rmtree(path)
+
+    def test_iterdumps(self):
+        def rows(count):
+            for i in xrange(count):
+                yield {'id': str(i), 'tags': iter(['a', 'b'])}
+
+        for options in ({}, {'indent': ' ' * 4}, {'header_declare': False, 'indent': ' '}, {'encoding': 'gbk'}):
+            xml = lazyxml.dumps({'rows': {'row': list(rows(300))}}, **options)
+            if isinstance(xml, unicode):
+                xml = xml.encode('utf-8')
+            for chunk_size in (None, 1, 256):
+                chunks = list(lazyxml.iterdumps({'rows': {'row': rows(300)}}, chunk_size=chunk_size, **options))
+                self.assertTrue(all(isinstance(chunk, str) for chunk in chunks))
+                self.assertEqual(''.join(chunks), xml)
+                if chunk_size:
+                    self.assertTrue(all(len(chunk) >= chunk_size for chunk in chunks[:-1]))
+        self.assertEqual(''.join(lazyxml.compile_builder().iterdumps(self.data)), self.xml)
+        self.assertRaises(AssertionError, lazyxml.iterdumps, {'foo': 1, 'bar': 2})
+
+        # the generator is consumed as the chunks are iterated
+        consumed = []
+
+        def tracked(count):
+            for i in xrange(count):
+                consumed.append(i)
+                yield i
+
+        chunks = lazyxml.iterdumps({'rows': {'row': tracked(100000)}}, chunk_size=1024)
+        next(chunks)
+        self.assertLess(len(consumed), 10000)
+
+        buf = io.StringIO()
+        lazyxml.dump({'rows': {'row': rows(300)}}, buf)
+        self.assertEqual(buf.getvalue(), lazyxml.dumps({'rows': {'row': list(rows(300))}}))
+
+    def test_adump(self):
+        import threading
+
+        class Writer(object):
+            """A writer whose buffer is drained by the consumer."""
+
+            def __init__(self):
+                self.chunks = []
+                self.drains = 0
+                self.released = threading.Event()
+
+            def write(self, chunk):
+                self.chunks.append(chunk)
+
+            def drain(self):
+                self.released.wait(10)
+                self.drains += 1
+
+        rows = ({'id': str(i)} for i in xrange(1000))
+        writer = Writer()
+        results = []
+        result = lazyxml.adump({'rows': {'row': rows}}, writer, chunk_size=1024, callback=results.append)
+        # the caller is not blocked by the writer which is not drained yet
+        self.assertFalse(result.ready())
+        writer.released.set()
+        xml = lazyxml.dumps({'rows': {'row': [{'id': str(i)} for i in xrange(1000)]}}).encode('utf-8')
+        self.assertEqual(result.get(10), len(xml))
+        self.assertEqual(''.join(writer.chunks), xml)
+        self.assertEqual(writer.drains, len(writer.chunks))
+        self.assertGreater(writer.drains, 1)
+        self.assertEqual(results, [len(xml)])
+
+        # the writers blocked by slow consumers do not stall the parses
+        blocked = [Writer() for _ in xrange(lazyxml.consts.Default.WORKERS * 2)]
+        dumps = [lazyxml.adump({'demo': 1}, w) for w in blocked]
+        self.assertEqual(lazyxml.aloads('<demo><foo>1</foo></demo>').get(10), {'foo': '1'})
+        self.assertFalse(any(r.ready() for r in dumps))
+        for w in blocked:
+            w.released.set()
+        self.assertTrue(all(r.get(10) for r in dumps))
+
+        buf = io.BytesIO()
+        self.assertEqual(lazyxml.adump(self.data, buf, encoding='gbk').get(10), len(buf.getvalue()))
+        self.assertEqual(buf.getvalue(), lazyxml.dumps(self.data, encoding='gbk'))
+        self.assertRaises(AssertionError, lazyxml.adump, {'foo': 1, 'bar': 2}, buf)
+
+        def broken():
+            yield {'id': '1'}
+            raise IOError('cursor closed')
+
+        self.assertRaises(IOError, lazyxml.adump({'rows': {'row': broken()}}, io.BytesIO()).get, 10)
+
+    def test_tag_cache(self):
+        def items():
+            attrs = {'a': '1'}
+            for i in xrange(3):
+                # the same attributes dict is changed between items
+                attrs['a'] = str(i % 2)
+                yield {'{attrs}': attrs, '{values}': str(i)}
+            yield {'{attrs}': {'a': ['x']}, '{values}': '3'}
+            yield {'{attrs}': {'a': '1', 'b': '2'}, '{values}': '4'}
+            yield '5'
+            # the equal values of different types are rendered by their types
+            for value in (1, True, 1.0):
+                yield {'{attrs}': {'k': value}, '{values}': '6'}
+
+        xml = lazyxml.dumps({'demo': {'item': items()}}, hasattr=True, cdata=False, header_declare=False, indent=' ')
+        self.assertEqual(xml, u'<demo>\n <item a="0">0</item>\n <item a="1">1</item>\n <item a="0">2</item>'
+                              u'\n <item a="[\'x\']">3</item>\n <item a="1" b="2">4</item>\n <item>5</item>'
+                              u'\n <item k="1">6</item>\n <item k="True">6</item>\n <item k="1.0">6</item>\n</demo>')
+        self.assertEqual(lazyxml.dumps({'a': [{1: 'x'}, {True: 'x'}, {1.0: 'x'}]}, cdata=False, header_declare=False),
+                         u'<a><1>x</1></a><a><True>x</True></a><a><1.0>x</1.0></a>')
+
+    def test_compile_schema(self):
+        from collections import OrderedDict
+        schema = {'demo': {'id': int, 'name': unicode, 'score': float, 'tags': [str],
+                           'item': {'{attrs}': {'x': str}, '{values}': str}}}
+        data = {'demo': {'id': 1, 'name': u'caf\xe9 <1>', 'score': 0.5, 'tags': ['a', 'b&c'],
+                         'item': {'{attrs}': {'x': '"2"'}, '{values}': 'v]]>'}}}
+        for options in ({}, {'cdata': False}, {'indent': '  '}, {'header_declare': False}, {'reverse': True}):
+            options.update(ksort=True, hasattr=True)
+            builder = lazyxml.compile_builder(schema, **options)
+            self.assertIsInstance(builder, lazyxml.schema_builder.SchemaBuilder)
+            self.assertIn('def serialize(data):', builder.source)
+            self.assertEqual(builder.dumps(data), lazyxml.dumps(data, **options))
+            self.assertEqual(''.join(builder.iterdumps(data, chunk_size=16)),
+                             ''.join(lazyxml.iterdumps(data, **options)))
+
+        # the data which does not match the schema is dumped by the generic builder
+        builder = lazyxml.compile_builder(schema, ksort=True, hasattr=True)
+        mismatches = [
+            lambda: {'demo': dict(data['demo'], extra='x')},
+            lambda: {'demo': dict(data['demo'], id='1')},
+            lambda: {'demo': dict(data['demo'], tags=(tag for tag in ['a', 'b']))},
+            lambda: {'demo': dict((k, v) for k, v in data['demo'].iteritems() if k != 'score')},
+            lambda: {'other': data['demo']},
+        ]
+        for mismatch in mismatches:
+            self.assertEqual(builder.dumps(mismatch()), lazyxml.dumps(mismatch(), ksort=True, hasattr=True))
+
+        # without ksort, the elements follow the key order of data whether it matches or not
+        for schema in ({'demo': {'b': str, 'a': None, 'c': [int]}},
+                       {'demo': OrderedDict([('c', [int]), ('b', str), ('a', None)])}):
+            builder = lazyxml.compile_builder(schema, header_declare=False)
+            matched = {'demo': {'a': None, 'b': 'x', 'c': [1, 2]}}
+            mismatched = {'demo': {'a': None, 'b': 'x', 'c': ['1', '2']}}
+            # the text of 1 and '1' is the same, the mismatched data is dumped by the generic builder
+            self.assertEqual(builder.dumps(matched), builder.dumps(mismatched))
+            self.assertEqual(builder.dumps(matched), lazyxml.dumps(matched, header_declare=False))
+            for order in (['c', 'b', 'a'], ['a', 'b', 'c']):
+                ordered = {'demo': OrderedDict((key, matched['demo'][key]) for key in order)}
+                self.assertEqual(builder.dumps(ordered), lazyxml.dumps(ordered, header_declare=False))
+        # an OrderedDict schema is rendered in its order, without the dispatch of the keys of data
+        builder = lazyxml.compile_builder({'demo': OrderedDict([('c', [int]), ('b', str), ('a', None)])})
+        self.assertNotIn('iteritems', builder.source)
+        self.assertRaises(ValueError, lazyxml.compile_builder, {'a': int, 'b': int})
+        self.assertRaises(ValueError, lazyxml.compile_builder, {'a': [int, int]})
+        self.assertRaises(ValueError, lazyxml.compile_builder, {'a': object})
+
+    def test_escaping(self):
+        from lazyxml import escaping
+        clean = 'item number 1'
+        self.assertIs(escaping.escape_text(clean), clean)
+        self.assertIs(escaping.escape_attr(clean), clean)
+        self.assertEqual(escaping.escape_text(u'<caf\xe9 & "co">'), u'&lt;caf\xe9 &amp; &quot;co&quot;&gt;')
+        self.assertEqual(escaping.escape_cdata('a]]>b]]>'), '<![CDATA[a]]]]><![CDATA[>b]]]]><![CDATA[>]]>')
+        self.assertEqual(lazyxml.builder.Builder.safedata(1.5, False), '1.5')
+        self.assertIsInstance(lazyxml.builder.Builder.safedata(u'caf\xe9'), unicode)
+
+        data = {'demo': {'text': 'a]]>b <c> & "d"', 'item': {'{attrs}': {'x': '<1> & "2"\n\t3'}, '{values}': 'v'}}}
+        for cdata in (True, False):
+            xml = lazyxml.dumps(data, hasattr=True, cdata=cdata)
+            result = lazyxml.loads(xml, strip_attr=False)
+            self.assertEqual(result['values']['text']['values'], 'a]]>b <c> & "d"')
+            self.assertEqual(result['values']['item']['attrs'], {'x': '<1> & "2"\n\t3'})
+
+    def test_deep(self):
+        data = 'leaf'
+        for _ in xrange(5000):
+            data = {'node': data}
+        xml = lazyxml.dumps(data, header_declare=False)
+        self.assertEqual(xml, u'<node>' * 5000 + u'<![CDATA[leaf]]>' + u'</node>' * 5000)
+
 
 if __name__ == '__main__':
     unittest.main()
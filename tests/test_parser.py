@@ -26,6 +26,88 @@ class ParserTest(unittest.TestCase):
         self.assertDictEqual(lazyxml.loads(xml, unescape=True), a)
         self.assertDictEqual(lazyxml.loads(xml, unescape=False), b)
 
+    def test_unescape_entities(self):
+        from lazyxml import entities
+        from lazyxml.backends import get_backend
+        from lazyxml.consts import Default
+        text = 'plain text'
+        self.assertIs(entities.decode(text), text)
+        self.assertEqual(entities.decode('&#60;&#x3C;&#X3c;&lt;&copy;&#169;&unknown;&#xFFFFFFFF;'),
+                         u'<<<<\xa9\xa9&unknown;&#xFFFFFFFF;')
+        self.assertEqual(entities.escape_undefined('&amp;&nbsp;&#160;'), '&amp;&amp;nbsp;&#160;')
+        xml = '<demo><a>&amp;#x3C;b&amp;gt;</a><b>&copy; 2024&nbsp;&amp;amp;</b><c>no entity</c></demo>'
+        a = {'a': '<b>', 'b': u'\xa9 2024\xa0&', 'c': 'no entity'}
+        self.assertEqual(lazyxml.loads(xml, unescape=True), a)
+        self.assertRaises(Exception, lazyxml.loads, xml, unescape=False)
+        parser = lazyxml.parser.Parser(unescape=True, strip_root=False)
+        records = parser.feed('<r><a>&co') + parser.feed('py; &amp') + parser.feed(';</a></r>') + parser.close()
+        self.assertEqual(records, [{'r': {'a': u'\xa9 &'}}])
+        xml = '<demo><msg id="1">&lt;item&gt;&lt;name&gt;a &amp;amp; b&lt;/name&gt;&lt;/item&gt;</msg><n>1</n></demo>'
+        a = {'msg': {'item': {'name': 'a & b'}}, 'n': '1'}
+        self.assertEqual(lazyxml.loads(xml, unescape=True), a)
+        self.assertEqual(list(lazyxml.iterload(io.BytesIO(xml), 'demo/msg', unescape=True)), [a['msg']])
+        b = lazyxml.loads(xml, unescape=True, strip_attr=False)
+        self.assertEqual(b['values']['msg']['attrs'], {'id': '1'})
+        self.assertEqual(b['values']['msg']['values']['item']['values']['name']['values'], 'a & b')
+        c = lazyxml.loads(xml, unescape=True, strip_attr=False, compact=True)
+        self.assertEqual(c, b)
+        if not get_backend(Default.BACKEND).element_tree:
+            return
+        for strip_attr in (True, False):
+            lazy = lazyxml.loads(xml, unescape=True, strip_attr=strip_attr, lazy=True)
+            self.assertEqual(lazy, lazyxml.loads(xml, unescape=True, strip_attr=strip_attr))
+        lazy = lazyxml.loads(xml, unescape=True, lazy=True)
+        self.assertEqual(lazy['msg']['item']['name'], 'a & b')
+        self.assertEqual(lazy['msg'].materialize(), a['msg'])
+
+    def test_unescape_document(self):
+        from lazyxml.backends import get_backend
+        from lazyxml.consts import Default
+        # the results are the same as decoding the whole document before parsing it
+        xml = '<demo x="1&amp;amp;2"><a y="&copy;">1</a>&lt;b&gt;2&lt;/b&gt;<c><![CDATA[&copy; &amp;]]></c></demo>'
+        a = {'a': '1', 'b': '2', 'c': u'\xa9 &'}
+        b = {'demo': {'attrs': {'x': '1&2'}, 'values': {
+            'a': {'values': '1', 'attrs': {'y': u'\xa9'}},
+            'b': {'values': '2', 'attrs': {}},
+            'c': {'values': u'\xa9 &', 'attrs': {}}}}}
+        self.assertEqual(lazyxml.loads(xml, unescape=True), a)
+        self.assertEqual(lazyxml.loads(xml, unescape=True, strip_root=False, strip_attr=False), b)
+        self.assertEqual(lazyxml.loads(xml, unescape=True, strip_root=False, strip_attr=False, compact=True), b)
+        self.assertEqual(list(lazyxml.iterload(io.BytesIO(xml), 'demo', unescape=True)), [a])
+        self.assertEqual(list(lazyxml.iterload(io.BytesIO(xml), 'demo', unescape=True, strip_root=False,
+                                               strip_attr=False)), [b])
+        parser = lazyxml.parser.Parser(unescape=True)
+        records = [record for i in xrange(0, len(xml), 3) for record in parser.feed(xml[i:i + 3])]
+        self.assertEqual(records + parser.close(), [a])
+        self.assertEqual(lazyxml.loads_columnar(xml, 'demo/a', ['@y'], unescape=True), {'@y': [u'\xa9']})
+
+        # the markup before, between and after the children
+        xml = '<demo>&lt;a&gt;0&lt;/a&gt;<x>1</x>&lt;a&gt;2&lt;/a&gt;<skip/>&lt;y&gt;3&lt;/y&gt;</demo>'
+        a = {'a': ['0', '2'], 'x': '1', 'y': '3'}
+        self.assertEqual(lazyxml.loads('<demo><x>1</x>&lt;a&gt;1&lt;/a&gt;</demo>', unescape=True), {'a': '1', 'x': '1'})
+        self.assertEqual(lazyxml.loads(xml, unescape=True, exclude=['demo/skip']), a)
+        self.assertEqual(lazyxml.loads(xml, unescape=True, strip_attr=False)['values']['a'],
+                         [{'values': '0', 'attrs': {}}, {'values': '2', 'attrs': {}}])
+        self.assertEqual(lazyxml.loads(xml, unescape=True, strip_attr=False),
+                         lazyxml.loads(xml, unescape=True, strip_attr=False, compact=True))
+        self.assertEqual(lazyxml.loads('<r>' + xml + '</r>', unescape=True, exclude=['r/demo/skip']), {'demo': a})
+        self.assertEqual(list(lazyxml.iterload(io.BytesIO(xml), 'demo', unescape=True, exclude=['demo/skip'])), [a])
+        self.assertEqual(lazyxml.loads(xml, unescape=False), {'x': '1', 'skip': ''})
+        # the elements of the markup are in the document order with the elements after it
+        ordered = '<a xmlns:ns="urn:x">&lt;b&gt;1&lt;/b&gt;<ns:d>..</ns:d><b>&#65;</b></a>'
+        expected = {'b': ['1', 'A'], 'd': '..'}
+        self.assertEqual(lazyxml.loads(ordered, unescape=True), expected)
+        self.assertEqual(lazyxml.loads(ordered, unescape=True, strip_attr=False)['values']['b'],
+                         [{'values': '1', 'attrs': {}}, {'values': 'A', 'attrs': {}}])
+        self.assertEqual(list(lazyxml.iterload(io.BytesIO(ordered), 'a', unescape=True)), [expected])
+        if not get_backend(Default.BACKEND).element_tree:
+            return
+        for strip_attr in (True, False):
+            lazy = lazyxml.loads(xml, unescape=True, strip_attr=strip_attr, lazy=True, exclude=['demo/skip'])
+            self.assertEqual(lazy.materialize(), lazyxml.loads(xml, unescape=True, strip_attr=strip_attr, exclude=['demo/skip']))
+        lazy = lazyxml.loads(xml, unescape=True, lazy=True, exclude=['demo/skip'])
+        self.assertEqual(dict(lazy), a)
+
     def test_strip_attr(self):
         xml = """
         <demo depth="1" show="demo">
@@ -100,6 +182,109 @@ class ParserTest(unittest.TestCase):
         }
         self.assertDictEqual(lazyxml.loads(xml), a)
 
+    def test_encoding_sniff(self):
+        import codecs
+        from lazyxml.parser import Parser
+        guess = Parser.guess_xml_encoding
+        self.assertEqual(guess(codecs.BOM_UTF8 + '<a/>'), 'utf-8')
+        self.assertEqual(guess(u'<a/>'.encode('utf-16')), 'utf-16')
+        self.assertEqual(guess(u'<?xml version="1.0"?><a/>'.encode('utf-16-be')), 'utf-16-be')
+        self.assertEqual(guess(u'<a/>'.encode('utf-32')), 'utf-32')
+        self.assertEqual(guess("<?xml version='1.0' encoding = 'Shift_JIS'?><a/>"), 'shift_jis')
+        self.assertIsNone(guess('<?xml version="1.0"?><a>{}encoding="gbk"</a>'.format(' ' * 2048)))
+        text = u'<demo><foo>中文 café</foo><bar>1</bar></demo>'
+        a = {'foo': u'中文 café', 'bar': '1'}
+        for encoding in ('gbk', 'shift_jis', 'utf-16', 'utf-16-le', 'utf-16-be', 'utf-32'):
+            declared = u'<?xml version="1.0" encoding="{}"?>{}'.format(encoding, text)
+            if encoding == 'shift_jis':
+                declared = declared.replace(u'中文 café', u'日本語')
+                b = dict(a, foo=u'日本語')
+            else:
+                b = a
+            content = declared.encode(encoding)
+            self.assertEqual(lazyxml.loads(content), b)
+            self.assertEqual(list(lazyxml.iterload(io.BytesIO(content), 'demo')), [b])
+            parser = Parser(record_path='demo')
+            records = sum((parser.feed(content[i:i + 3]) for i in xrange(0, len(content), 3)), [])
+            self.assertEqual(records + parser.close(), [b])
+        latin = u'<?xml version="1.0" encoding="ISO-8859-1"?><demo><foo>café</foo></demo>'.encode('latin-1')
+        self.assertIs(Parser().xml_filter(latin), latin)
+        self.assertEqual(lazyxml.loads(latin), {'foo': u'café'})
+        self.assertEqual(lazyxml.loads(latin.replace('ISO-8859-1', 'latin1')), {'foo': u'café'})
+        self.assertEqual(lazyxml.loads(latin[latin.index('?>') + 2:], encoding='latin-1'), {'foo': u'café'})
+        utf8 = u'<?xml version="1.0" encoding="gbk"?><demo><foo>café</foo></demo>'.encode('utf-8')
+        self.assertEqual(lazyxml.loads(utf8, encoding='utf-8'), {'foo': u'café'})
+        utf16 = u'<demo><foo>a &nbsp;</foo></demo>'.encode('utf-16')
+        self.assertEqual(lazyxml.loads(utf16, unescape=True), {'foo': u'a \xa0'})
+
+    def test_limits(self):
+        from lazyxml import Limits, LimitExceeded
+        from lazyxml.backends import get_backend
+        from lazyxml.consts import Default
+        xml = '<demo><foo><bar>1</bar></foo><baz>{}</baz></demo>'.format('x' * 100)
+        a = {'foo': {'bar': '1'}, 'baz': 'x' * 100}
+        limits = Limits(max_bytes=len(xml), max_elements=4, max_depth=3, max_text_size=100)
+        self.assertEqual(lazyxml.loads(xml, limits=limits), a)
+        self.assertEqual(lazyxml.loads(xml, limits=limits._asdict(), strip_attr=False),
+                         lazyxml.loads(xml, strip_attr=False))
+        self.assertEqual(list(lazyxml.iterload(io.BytesIO(xml), 'demo/foo', limits=limits)), [{'bar': '1'}])
+        self.assertEqual(lazyxml.loads_columnar(xml, 'demo', ['baz'], limits=limits), {'baz': ['x' * 100]})
+        for name in ('max_bytes', 'max_elements', 'max_depth', 'max_text_size'):
+            exceeded = limits._replace(**{name: getattr(limits, name) - 1})
+            for load in (lambda: lazyxml.loads(xml, limits=exceeded),
+                         lambda: list(lazyxml.iterload(io.BytesIO(xml), 'demo/foo', limits=exceeded)),
+                         lambda: lazyxml.loads_columnar(xml, 'demo', ['baz'], limits=exceeded)):
+                with self.assertRaises(LimitExceeded) as cm:
+                    load()
+                self.assertEqual((cm.exception.limit, cm.exception.value), (name, getattr(exceeded, name)))
+        # the tail of an element is a text of its parent
+        mixed = '<a><b/>' + 'x' * 5000 + '</a>'
+        with self.assertRaises(LimitExceeded) as cm:
+            lazyxml.loads(mixed, limits={'max_text_size': 100})
+        self.assertEqual(cm.exception.limit, 'max_text_size')
+        self.assertEqual(lazyxml.loads(mixed, limits={'max_text_size': 5000}), lazyxml.loads(mixed))
+        # the fragments of unescape are counted as if they were in the document
+        nested = '<root><p>' + '&lt;x&gt;' * 50 + '&lt;/x&gt;' * 50 + '</p></root>'
+        limits = {'max_depth': 5, 'max_elements': 10}
+        loads = [lambda: lazyxml.loads(nested, unescape=True, limits=limits),
+                 lambda: lazyxml.loads(nested, unescape=True, limits=limits, strip_attr=False),
+                 lambda: lazyxml.loads(nested, unescape=True, limits=limits, strip_attr=False, compact=True),
+                 lambda: list(lazyxml.iterload(io.BytesIO(nested), 'root/p', unescape=True, limits=limits))]
+        if get_backend(Default.BACKEND).element_tree:
+            loads.append(lambda: lazyxml.loads(nested, unescape=True, limits=limits, lazy=True)['p'])
+        for load in loads:
+            with self.assertRaises(LimitExceeded) as cm:
+                load()
+            self.assertEqual(cm.exception.limit, 'max_depth')
+        fragment = '<root><p>&lt;x&gt;&lt;y&gt;1&lt;/y&gt;&lt;/x&gt;</p></root>'
+        self.assertEqual(lazyxml.loads(fragment, unescape=True, limits={'max_depth': 4, 'max_elements': 4}),
+                         {'p': {'x': {'y': '1'}}})
+        self.assertRaises(LimitExceeded, lazyxml.loads, fragment, unescape=True, limits={'max_elements': 3})
+        self.assertRaises(ValueError, Limits, max_depth=0)
+        self.assertRaises(ValueError, lazyxml.loads, xml, limits={'max_size': 1})
+
+        class Endless(object):
+            def __init__(self):
+                self.head = '<demo>'
+
+            def read(self, size=-1):
+                head, self.head = self.head, ''
+                return head + '<foo>1</foo>' * 1000
+
+        # the endless document is aborted as soon as the limit is crossed
+        self.assertRaises(LimitExceeded, lazyxml.loads, Endless(), limits={'max_elements': 100000})
+        self.assertRaises(LimitExceeded, lazyxml.loads, Endless(), limits={'max_bytes': 1 << 20})
+        self.assertRaises(LimitExceeded, list, lazyxml.iterload(Endless(), 'demo/foo', limits={'max_elements': 100000}))
+
+        entities = ['<!ENTITY lol0 "lol">'] + ['<!ENTITY lol{} "{}">'.format(i, '&lol{};'.format(i - 1) * 10)
+                                              for i in xrange(1, 10)]
+        lol = '<?xml version="1.0"?><!DOCTYPE lolz [{}]><lolz><a>&lol{};</a></lolz>'
+        with self.assertRaises(LimitExceeded) as cm:
+            lazyxml.loads(lol.format(''.join(entities), 9), limits={'max_entity_expansion': 1 << 20})
+        self.assertEqual(cm.exception.limit, 'max_entity_expansion')
+        self.assertEqual(lazyxml.loads(lol.format(''.join(entities[:3]), 2), limits={'max_entity_expansion': 300}),
+                         {'a': 'lol' * 100})
+
     def test_namespace(self):
         xml = """
         <?xml version="1.0" encoding="UTF-8"?>
@@ -155,6 +340,512 @@ class ParserTest(unittest.TestCase):
         self.assertDictEqual(lazyxml.load(buf), a)
         buf.close()
 
+    def test_load_mmap(self):
+        import os
+        import tempfile
+        from lazyxml.consts import Default
+        items = ''.join('<item><id>{}</id><name>名字&amp;{}</name></item>'.format(i, i) for i in xrange(3000))
+        xml = u'\n<?xml version="1.0" encoding="gbk"?><catalog>{}</catalog>'.format(items.decode('utf-8')).encode('gbk')
+        self.assertGreater(len(xml), Default.MMAP_CHUNK_SIZE / 16)
+        fd, path = tempfile.mkstemp(suffix='.xml')
+        try:
+            with os.fdopen(fd, 'wb') as fp:
+                fp.write(xml)
+            expected = lazyxml.loads(xml)
+            self.assertEqual(lazyxml.load(path, mmap=True), expected)
+            self.assertEqual(lazyxml.load(path), expected)
+            with open(path, 'rb') as fp:
+                self.assertEqual(lazyxml.load(fp, mmap=True), expected)
+            self.assertEqual(lazyxml.load(path, strip_root=False, mmap=True), lazyxml.loads(xml, strip_root=False))
+            records = list(lazyxml.iterload(path, 'catalog/item', mmap=True))
+            self.assertEqual(records, expected['item'])
+            with open(path, 'rb') as fp:
+                self.assertEqual(list(lazyxml.iterload(fp, 'catalog/item')), records)
+            parser = lazyxml.compile_parser(strip=True)
+            self.assertEqual(parser.load(path, mmap=True), expected)
+            self.assertEqual(list(parser.iterload(path, 'catalog/item', mmap=True)), expected['item'])
+        finally:
+            os.remove(path)
+
+    def test_load_compression(self):
+        import bz2
+        import gzip
+        items = ''.join('<item><id>{}</id><name>名字</name></item>'.format(i) for i in xrange(2000))
+        xml = '<?xml version="1.0" encoding="utf-8"?><catalog>{}</catalog>'.format(items)
+        expected = lazyxml.loads(xml)
+
+        def gzipped(content):
+            buf = io.BytesIO()
+            with gzip.GzipFile(fileobj=buf, mode='wb') as fp:
+                fp.write(content)
+            return buf.getvalue()
+
+        class Pipe(object):
+            def __init__(self, content):
+                self.buf = io.BytesIO(content)
+
+            def read(self, size=-1):
+                return self.buf.read(size)
+
+        for content in [gzipped(xml), bz2.compress(xml),
+                        gzipped(xml[:1000]) + gzipped(xml[1000:]),
+                        bz2.compress(xml[:5]) + bz2.compress(xml[5:])]:
+            self.assertEqual(lazyxml.load(io.BytesIO(content)), expected)
+            self.assertEqual(lazyxml.load(Pipe(content)), expected)
+            self.assertEqual(list(lazyxml.iterload(io.BytesIO(content), 'catalog/item')), expected['item'])
+            self.assertEqual(lazyxml.load(io.BytesIO(content), cache=True), expected)
+        self.assertEqual(lazyxml.load(io.BytesIO(gzipped(xml)), compression='gzip'), expected)
+        # the trailing zero padding or garbage after the last stream is ignored
+        for content in [gzipped(xml) + '\x00' * 512, gzipped(xml) + 'garbage', gzipped(xml) + '\x1f',
+                        bz2.compress(xml) + '\x00' * 512]:
+            self.assertEqual(lazyxml.load(io.BytesIO(content)), expected)
+            self.assertEqual(list(lazyxml.iterload(io.BytesIO(content), 'catalog/item')), expected['item'])
+        self.assertEqual(lazyxml.load(Pipe(xml)), expected)
+        self.assertRaises(ValueError, lazyxml.load, io.BytesIO(xml), compression='unknown')
+
+    def test_load_parallel(self):
+        import os
+        import tempfile
+        items = ''.join(u'<c:item id="{0}"><c:name>名字{0}</c:name><c:item2/></c:item>\n'.format(i) for i in xrange(2000))
+        xml = (u'<?xml version="1.0" encoding="gbk"?><!-- <c:item> --><feed xmlns:c="urn:c">'
+               u'<head><title>x</title></head><c:items>{}</c:items><tail/></feed>').format(items).encode('gbk')
+        fd, path = tempfile.mkstemp(suffix='.xml')
+        try:
+            with os.fdopen(fd, 'wb') as fp:
+                fp.write(xml)
+            expected = list(lazyxml.iterload(path, 'feed/items/item'))
+            self.assertEqual(len(expected), 2000)
+            self.assertEqual(list(lazyxml.load_parallel(path, 'c:item', workers=2, shard_size=4096)), expected)
+            records = list(lazyxml.load_parallel(path, 'c:item', workers=2, shard_size=4096, ordered=False,
+                                                 namespaces={'urn:c': 'c'}, strip_root=False))
+            self.assertEqual(sorted(records, key=lambda record: record['c:item']['c:name']),
+                             sorted([{'c:item': {'c:name': item['name'], 'c:item2': ''}} for item in expected],
+                                    key=lambda record: record['c:item']['c:name']))
+            self.assertRaises(ValueError, list, lazyxml.load_parallel(path, 'record'))
+            # the boundaries in cdata are skipped, and the records under another parent are not dropped
+            items = ''.join('<item id="{0}"><![CDATA[</item> <item>{0}]]></item>'.format(i) for i in xrange(20))
+            for xml, record_path in [('<root>{}</root>'.format(items), 'root/item'),
+                                     ('<root><a><item>1</item></a><b><item>2</item></b></root>', 'root/*/item')]:
+                with open(path, 'wb') as fp:
+                    fp.write(xml)
+                self.assertEqual(list(lazyxml.load_parallel(path, 'item', workers=2, shard_size=100)),
+                                 list(lazyxml.iterload(path, record_path)))
+        finally:
+            os.remove(path)
+
+    def test_deep_tree(self):
+        depth = sys.getrecursionlimit() * 2
+        xml = '{}leaf{}'.format('<node a="1">' * depth, '</node>' * depth)
+        tree = lazyxml.loads(xml)
+        for _ in xrange(depth - 2):
+            tree = tree['node']
+        self.assertEqual(tree, {'node': 'leaf'})
+        tree = lazyxml.loads(xml, strip_attr=False)
+        for _ in xrange(depth - 2):
+            tree = tree['values']['node']
+        self.assertEqual(tree['values'], {'node': {'attrs': {'a': '1'}, 'values': 'leaf'}})
+
+    def test_feed(self):
+        xml = u"""
+        <?xml version="1.0" encoding="gbk"?>
+        <root><item><name>保存成功</name></item><item><name>2</name></item></root>
+        """.encode('gbk')
+        parser = lazyxml.parser.Parser(record_path='root/item')
+        records = []
+        for i in xrange(len(xml)):
+            records.extend(parser.feed(xml[i:i + 1]))
+        records.extend(parser.close())
+        self.assertEqual(records, [{'name': u'\u4fdd\u5b58\u6210\u529f'}, {'name': '2'}])
+
+        end = xml.index('</item>') + len('</item>')
+        self.assertEqual(parser.feed(xml[:end]), [{'name': u'\u4fdd\u5b58\u6210\u529f'}])
+        self.assertEqual(parser.feed(xml[end:]), [{'name': '2'}])
+        self.assertEqual(parser.close(), [])
+
+        parser = lazyxml.parser.Parser()
+        self.assertEqual(parser.feed(xml) + parser.close(), [lazyxml.loads(xml)])
+
+    def test_aloads(self):
+        xml = '<demo><foo>foo</foo><bar>1</bar><bar>2</bar></demo>'
+        results = []
+        async_results = [lazyxml.aloads(xml, workers=2, callback=results.append) for _ in xrange(5)]
+        self.assertEqual([r.get(10) for r in async_results], [lazyxml.loads(xml)] * 5)
+        self.assertEqual(len(results), 5)
+        self.assertRaises(SyntaxError, lazyxml.aloads('<demo>').get, 10)
+
+    def test_loads_many(self):
+        docs = ['<demo><foo>{}</foo></demo>'.format(i) for i in xrange(50)]
+        docs[7] = '<demo>'
+        for executor in ('thread', 'process'):
+            results = list(lazyxml.loads_many(iter(docs), workers=2, executor=executor, chunksize=3))
+            self.assertEqual(len(results), 50)
+            self.assertIsInstance(results[7], SyntaxError)
+            self.assertEqual(results[:7] + results[8:], [lazyxml.loads(doc) for doc in docs[:7] + docs[8:]])
+            results = lazyxml.loads_many(docs, workers=2, executor=executor, chunksize=3, ordered=False)
+            self.assertEqual(sorted(index for index, _ in results), range(50))
+        self.assertRaises(ValueError, next, lazyxml.loads_many(docs, executor='unknown'))
+
+    def test_shared_pool(self):
+        from multiprocessing.pool import RUN
+        from lazyxml import executor
+        executor.shutdown()
+        pool = executor.get_pool('thread', 2)
+        self.assertIs(executor.get_pool('thread', 1), pool)
+        self.assertIs(executor.get_pool('thread', 2), pool)
+        docs = ['<demo><foo>{}</foo></demo>'.format(i) for i in xrange(10)]
+        for workers in (3, 1, 3, 2):
+            self.assertEqual(len(list(lazyxml.loads_many(docs, workers=workers, executor='thread'))), 10)
+        # a larger pool replaces the shared pool, the replaced pool is closed instead of kept
+        larger = executor.get_pool('thread')
+        self.assertIsNot(larger, pool)
+        self.assertEqual(len([p for _, p in executor._pools.values() if p is larger]), 1)
+        self.assertNotEqual(pool._state, RUN)
+        # aloads runs in a pool of its own
+        result = lazyxml.aloads(docs[0], workers=lazyxml.consts.Default.WORKERS + 1)
+        self.assertEqual(result.get(10), {'foo': '0'})
+        self.assertIs(executor.get_pool('thread'), larger)
+        self.assertEqual(len(list(lazyxml.loads_many(docs, workers=lazyxml.consts.Default.WORKERS + 1,
+                                                     executor='thread'))), 10)
+        self.assertNotEqual(larger._state, RUN)
+
+    def test_bounded_concurrency(self):
+        import threading
+        import time
+        lock = threading.Lock()
+        running = [0, 0]
+
+        class Slow(object):
+            """A content whose read is counted while it is running."""
+
+            def __init__(self):
+                self.data = '<demo><foo>1</foo></demo>'
+
+            def read(self, size=-1):
+                with lock:
+                    running[0] += 1
+                    running[1] = max(running)
+                time.sleep(0.02)
+                with lock:
+                    running[0] -= 1
+                data, self.data = self.data, ''
+                return data
+
+        # the shared pools are larger than the workers of the callers after
+        self.assertEqual(len(list(lazyxml.loads_many(['<a/>'] * 8, workers=8, executor='thread'))), 8)
+        self.assertEqual(lazyxml.aloads('<a><b>1</b></a>', workers=8).get(10), {'b': '1'})
+        results = [lazyxml.aloads(Slow(), workers=2) for _ in xrange(8)]
+        self.assertEqual([result.get(10) for result in results], [{'foo': '1'}] * 8)
+        self.assertEqual(running[1], 2)
+        running[1] = 0
+        self.assertEqual(list(lazyxml.loads_many((Slow() for _ in xrange(8)), workers=3, executor='thread',
+                                                 chunksize=1)), [{'foo': '1'}] * 8)
+        self.assertLessEqual(running[1], 3)
+
+    def test_projection(self):
+        xml = """
+        <order id="9">
+            <id>1</id>
+            <note>note</note>
+            <lines>
+                <line><sku>A</sku><qty>1</qty></line>
+                <line><sku>B</sku><qty>2</qty><extra><sku>C</sku></extra></line>
+                <line><qty>3</qty></line>
+            </lines>
+        </order>
+        """
+        a = {'id': '1', 'lines': {'line': [{'sku': 'A'}, {'sku': 'B'}, {}]}}
+        b = {'id': '1', 'note': 'note', 'lines': {'line': [{'sku': 'A'}, {'sku': 'B', 'extra': {'sku': 'C'}}, {}]}}
+        c = {'id': '1', 'lines': {'line': [{'sku': 'A'}, {'sku': 'B', 'extra': {'sku': 'C'}}, {}]}}
+        self.assertEqual(lazyxml.loads(xml, include=['order/id', 'order/lines/line/sku']), a)
+        self.assertEqual(lazyxml.loads(xml, exclude=['order/lines/line/qty']), b)
+        self.assertEqual(lazyxml.loads(xml, include=['order/id', 'order/lines'], exclude=['*/*/*/qty']), c)
+        self.assertEqual(lazyxml.loads(xml, include='other/id'), {})
+        self.assertEqual(lazyxml.loads(xml, include='order/id', strip_root=False, strip_attr=False),
+                         {'order': {'attrs': {'id': '9'}, 'values': {'id': {'attrs': {}, 'values': '1'}}}})
+        self.assertEqual(list(lazyxml.iterload(io.BytesIO(xml), 'order/lines/line', include='line/sku')),
+                         [{'sku': 'A'}, {'sku': 'B'}, {}])
+
+    def test_namespaces(self):
+        xml = """
+        <s:Envelope xmlns:s="urn:soap" xmlns:a="urn:a" xmlns:b="urn:b">
+            <s:Body><a:id>1</a:id><b:id>2</b:id><id>3</id></s:Body>
+        </s:Envelope>
+        """
+        a = {'Body': {'id': ['1', '2', '3']}}
+        b = {'{urn:soap}Body': {'{urn:a}id': '1', '{urn:b}id': '2', 'id': '3'}}
+        c = {'soap:Envelope': {'soap:Body': {'a:id': '1', '{urn:b}id': '2', 'id': '3'}}}
+        prefixes = {'urn:soap': 'soap', 'urn:a': 'a'}
+        self.assertEqual(lazyxml.loads(xml), a)
+        self.assertEqual(lazyxml.loads(xml, namespaces=True), b)
+        self.assertEqual(lazyxml.loads(xml, namespaces=prefixes, strip_root=False), c)
+        self.assertEqual(lazyxml.loads(xml, namespaces=prefixes, include='soap:Envelope/soap:Body/a:id'),
+                         {'soap:Body': {'a:id': '1'}})
+        self.assertEqual(list(lazyxml.iterload(io.BytesIO(xml), 'soap:Envelope/soap:Body', namespaces=prefixes)),
+                         [c['soap:Envelope']['soap:Body']])
+
+    def test_tag_cache(self):
+        from lazyxml.namespaces import TagCache
+        cache = TagCache({'urn:a': 'a', 'urn:b': ''}, maxsize=2)
+        self.assertEqual(cache.key('{urn:a}id'), 'a:id')
+        self.assertEqual(cache.key('urn:a}id'), 'a:id')
+        self.assertEqual(cache.key('{urn:b}id'), 'id')
+        self.assertEqual(cache.key('{urn:a}id'), 'a:id')
+        self.assertEqual(cache.split('{urn:c}id'), ('urn:c', 'id'))
+        self.assertEqual(tuple(cache.cache_info()), (1, 4, 2, 2))
+        cache.cache_clear()
+        self.assertEqual(tuple(cache.cache_info()), (0, 0, 2, 0))
+
+    def test_compact(self):
+        from collections import Mapping
+        from lazyxml.nodes import Node, to_dict
+        xml = """
+        <order id="9">
+            <id>1</id>
+            <lines>
+                <line n="1" unit="pcs"><sku>A</sku><qty unit="pcs">1</qty></line>
+                <line n="2" unit="pcs"><sku>B</sku><qty unit="pcs">2</qty></line>
+            </lines>
+            <empty a="1"><x/></empty>
+        </order>
+        """
+        for strip_root in (True, False):
+            for exclude in (None, 'order/empty/x'):
+                a = lazyxml.loads(xml, strip_attr=False, strip_root=strip_root, exclude=exclude)
+                b = lazyxml.loads(xml, strip_attr=False, strip_root=strip_root, exclude=exclude, compact=True)
+                self.assertEqual(to_dict(b), a)
+                self.assertEqual(b, a)
+        b = lazyxml.loads(xml, strip_attr=False, compact=True)
+        lines = b['values']['lines']['values']['line']
+        self.assertIsInstance(lines[0], Node)
+        self.assertIsInstance(lines[0], Mapping)
+        self.assertEqual(lines[1]['attrs'], {'n': '2', 'unit': 'pcs'})
+        self.assertEqual(lines[1]['values']['qty'], {'values': '2', 'attrs': {'unit': 'pcs'}})
+        self.assertIs(lines[0]['values']['qty'].attrs, lines[1]['values']['qty'].attrs)
+        self.assertNotIn('attrs', b)
+        self.assertRaises(KeyError, lambda: b['attrs'])
+        records = list(lazyxml.iterload(io.BytesIO(xml), 'order/lines/line', strip_attr=False, compact=True))
+        self.assertEqual(records, list(lazyxml.iterload(io.BytesIO(xml), 'order/lines/line', strip_attr=False)))
+
+    def test_lazy(self):
+        from lazyxml.backends import get_backend
+        from lazyxml.consts import Default
+        if not get_backend(Default.BACKEND).element_tree:
+            self.assertRaises(ValueError, lazyxml.loads, '<demo/>', lazy=True)
+            return
+        xml = """
+        <resp code="0">
+            <header><status>ok</status></header>
+            <body><item id="1"><name>a</name></item><item id="2"><name>b</name></item><empty><x/></empty></body>
+        </resp>
+        """
+        for strip_root in (True, False):
+            for strip_attr in (True, False):
+                for exclude in (None, 'resp/body/empty/x'):
+                    kwargs = dict(strip_root=strip_root, strip_attr=strip_attr, exclude=exclude)
+                    a = lazyxml.loads(xml, **kwargs)
+                    b = lazyxml.loads(xml, lazy=True, **kwargs)
+                    self.assertEqual(b.materialize(), a)
+                    self.assertEqual(b, a)
+        b = lazyxml.loads(xml, lazy=True)
+        self.assertEqual(b['header']['status'], 'ok')
+        self.assertIs(b['header'], b['header'])
+        self.assertEqual(len(b['body']['item']), 2)
+        self.assertEqual(sorted(b), ['body', 'header'])
+        with self.assertRaises(TypeError):
+            b['header'] = None
+        b = lazyxml.loads(xml, lazy=True, strip_attr=False, strip_root=False)
+        self.assertEqual(b['resp']['attrs'], {'code': '0'})
+        self.assertEqual(b['resp']['values']['body']['values']['item'][1]['attrs'], {'id': '2'})
+        # the memoised values are read-only as well
+        items = b['resp']['values']['body']['values']['item']
+        leaf = b['resp']['values']['header']['values']['status']
+        for mutate in (lambda: items.append(None), lambda: items.__setitem__(0, None),
+                       lambda: items[0]['attrs'].update(id='3'), lambda: b['resp']['attrs'].clear(),
+                       lambda: leaf.__setitem__('values', 'failed'), lambda: leaf['attrs'].update(x='1')):
+            self.assertRaises(TypeError, mutate)
+        self.assertEqual(b.materialize(), lazyxml.loads(xml, strip_attr=False, strip_root=False))
+        self.assertRaises(TypeError, lazyxml.loads(xml, lazy=True)['body']['item'].append, None)
+
+    def test_loads_columnar(self):
+        import array
+        import math
+        xml = """
+        <rows>
+            <row id="1"><price>1.5</price><qty>2</qty><sku>A &amp; B</sku></row>
+            <skip><row id="9"><price>9</price><qty>9</qty></row></skip>
+            <row id="2"><price> 3 </price><qty>4</qty><qty>5</qty><sku>C</sku></row>
+            <row id="3"><qty>6</qty><stock><sku>D</sku></stock></row>
+        </rows>
+        """
+        columns = {'@id': int, 'price': float, 'qty': int, 'sku': str, 'stock/sku': str}
+        for fp in (False, True):
+            content = io.BytesIO(xml) if fp else xml
+            result = lazyxml.loads_columnar(content, 'rows/row', columns, unescape=True, use_numpy=False)
+            self.assertEqual(result['@id'], array.array('l', [1, 2, 3]))
+            self.assertEqual(list(result['price'][:2]), [1.5, 3.0])
+            self.assertTrue(math.isnan(result['price'][2]))
+            self.assertEqual(result['qty'], array.array('l', [2, 4, 6]))
+            self.assertEqual(result['sku'], ['A & B', 'C', None])
+            self.assertEqual(result['stock/sku'], [None, None, 'D'])
+        self.assertEqual(lazyxml.loads_columnar(xml, '*/row', ['@id']), {'@id': ['1', '2', '3']})
+        self.assertRaises(ValueError, lazyxml.loads_columnar, xml, 'rows/row', {'sku': int})
+        self.assertRaises(ValueError, lazyxml.loads_columnar, xml, 'rows/row', {'stock/sku': float})
+        self.assertRaises(ValueError, lazyxml.loads_columnar, xml, 'rows/row', ['/'])
+        for use_numpy in (False, True):
+            self.assertRaises(ValueError, lazyxml.loads_columnar, '<rows><row><n>{}</n></row></rows>'.format(2 ** 80),
+                              'rows/row', {'n': int}, use_numpy=use_numpy)
+
+        # bool columns are parsed from the texts of xsd:boolean
+        flags = '<rows><row><on>true</on></row><row><on>0</on></row><row><on>1</on></row><row><on>false</on></row></rows>'
+        self.assertEqual(lazyxml.loads_columnar(flags, 'rows/row', {'on': bool}), {'on': [True, False, True, False]})
+        for invalid in ('<rows><row><on>yes</on></row></rows>', '<rows><row><on>1</on></row><row/></rows>'):
+            self.assertRaises(ValueError, lazyxml.loads_columnar, invalid, 'rows/row', {'on': bool})
+
+        # a column nested in another column collects its own text
+        xml = '<rows><row><item>a<sub>1</sub>b</item></row><row><item><sub>2</sub></item><sub>x</sub></row></rows>'
+        self.assertEqual(lazyxml.loads_columnar(xml, 'rows/row', ['item', 'item/sub']),
+                         {'item': ['a1b', '2'], 'item/sub': ['1', '2']})
+
+    def test_reuse(self):
+        parser = lazyxml.parser.Parser()
+        gbk = u'<?xml version="1.0" encoding="gbk"?><demo><foo>中文</foo></demo>'.encode('gbk')
+        utf8 = u'<demo><foo>中文</foo></demo>'.encode('utf-8')
+        self.assertEqual(parser.xml2object(gbk), {'foo': u'中文'})
+        self.assertEqual(parser.xml2object(utf8), {'foo': u'中文'})
+
+    def test_compile_parser(self):
+        import threading
+        self.assertRaises(ValueError, lazyxml.compile_parser, encoding='unknown')
+        self.assertRaises(ValueError, lazyxml.compile_parser, errors='unknown')
+        self.assertRaises(ValueError, lazyxml.compile_parser, backend='unknown')
+        parser = lazyxml.compile_parser(strip_root=False)
+        docs = [
+            (u'<?xml version="1.0" encoding="gbk"?><demo><foo>中文</foo></demo>'.encode('gbk'), {'demo': {'foo': u'中文'}}),
+            (u'<demo><foo>中文</foo><bar>1</bar></demo>'.encode('utf-8'), {'demo': {'foo': u'中文', 'bar': '1'}}),
+            ('<?xml version="1.0" encoding="latin-1"?><demo><foo>\xe9</foo></demo>', {'demo': {'foo': u'\xe9'}}),
+        ]
+        failures = []
+
+        def worker(offset):
+            try:
+                for i in xrange(200):
+                    content, expected = docs[(i + offset) % len(docs)]
+                    if parser.loads(content) != expected:
+                        failures.append((content, parser.loads(content)))
+                    records = list(parser.iterload(io.BytesIO(content), 'demo'))
+                    if records != [expected]:
+                        failures.append((content, records))
+            except Exception as e:
+                failures.append(e)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in xrange(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(failures, [])
+
+    def test_cache(self):
+        import copy
+        from lazyxml.cache import ParseCache
+        cache = ParseCache(maxsize=2)
+        xml = '<demo><foo>1</foo><foo>2</foo><bar><baz>3</baz></bar></demo>'
+        a = lazyxml.loads(xml, cache=cache)
+        self.assertEqual(a, lazyxml.loads(xml))
+        self.assertIs(lazyxml.loads(xml, cache=cache), a)
+        self.assertEqual(lazyxml.loads(xml, strip_root=False, cache=cache), lazyxml.loads(xml, strip_root=False))
+        self.assertEqual(lazyxml.loads(xml.decode('utf-8'), cache=cache), a)
+        info = cache.cache_info()
+        self.assertEqual((info.hits, info.misses, info.evictions, info.currsize), (1, 3, 1, 2))
+        self.assertEqual(info.hit_rate, 0.25)
+        self.assertGreater(info.currbytes, 0)
+        with self.assertRaises(TypeError):
+            a['foo'] = '3'
+        with self.assertRaises(TypeError):
+            a['foo'].append('3')
+        with self.assertRaises(TypeError):
+            a['bar'].update(baz='4')
+        b = copy.deepcopy(a)
+        b['bar']['baz'] = '4'
+        self.assertEqual(lazyxml.loads(xml, cache=cache), {'bar': {'baz': '3'}, 'foo': ['1', '2']})
+        node = lazyxml.loads('<demo><foo id="1"><bar>2</bar></foo></demo>', strip_attr=False, compact=True, cache=cache)
+        with self.assertRaises(TypeError):
+            node['values']['foo']['values']['baz'] = '3'
+        with self.assertRaises(TypeError):
+            node['values']['foo'].value = {}
+        self.assertEqual(copy.deepcopy(node), lazyxml.loads('<demo><foo id="1"><bar>2</bar></foo></demo>',
+                                                            strip_attr=False, compact=True))
+        # the hits equal the uncached results, the defaults of parse_full are kept
+        xml = '<demo><foo id="1"><bar>2</bar></foo><baz>3</baz></demo>'
+        for options in ({'strip_attr': False}, {'strip_attr': False, 'compact': True},
+                        {'strip_attr': False, 'strip_root': False}):
+            expected = lazyxml.loads(xml, **options)
+            miss = lazyxml.loads(xml, cache=cache, **options)
+            hit = lazyxml.loads(xml, cache=cache, **options)
+            self.assertIs(hit, miss)
+            self.assertEqual(hit, expected)
+            self.assertEqual(miss, expected)
+        hit = lazyxml.loads(xml, strip_attr=False, cache=cache)
+        self.assertEqual(hit['attrs'], lazyxml.loads(xml, strip_attr=False)['attrs'])
+        self.assertEqual(hit['values']['foo']['attrs'], {'id': '1'})
+        self.assertNotIn('attrs', hit)
+        small = ParseCache(maxbytes=1)
+        lazyxml.loads(xml, cache=small)
+        self.assertEqual(small.cache_info().currsize, 0)
+        cache.cache_clear()
+        self.assertEqual(cache.cache_info()[:5], (0, 0, 0, 0.0, 2))
+
+    def test_iterload(self):
+        xml = """
+        <catalog>
+            <item id="1"><name>foo</name><tag>a</tag><tag>b</tag></item>
+            <skip><item><name>ignored</name></item></skip>
+            <item id="2"><name>bar</name></item>
+        </catalog>
+        """
+        a = [{'name': 'foo', 'tag': ['a', 'b']}, {'name': 'bar'}]
+        b = [{'item': {'name': 'bar'}}]
+        self.assertEqual(list(lazyxml.iterload(io.BytesIO(xml), 'catalog/item')), a)
+        self.assertEqual(list(lazyxml.iterload(io.BytesIO(xml), '/catalog/item/')), a)
+        self.assertEqual(list(lazyxml.iterload(io.BytesIO(xml), '*/*/item')), [{'name': 'ignored'}])
+        self.assertEqual(list(lazyxml.iterload(io.BytesIO(xml), 'catalog/item', strip_root=False))[1:], b)
+        self.assertEqual(list(lazyxml.iterload(io.BytesIO(xml))), [lazyxml.loads(xml)])
+
+    def test_iterload_options(self):
+        xml = u"""
+        <?xml version="1.0" encoding="gbk"?>
+        <root xmlns="http://www.w3.org/TR/html4/">
+            <item show="1"><name>保存成功</name></item>
+            <item>&lt;demo&gt;&lt;foo&gt;foo&lt;/foo&gt;&lt;/demo&gt;</item>
+        </root>
+        """.encode('gbk')
+        a = [
+            {'item': {'attrs': {'show': '1'}, 'values': {'name': {'attrs': {}, 'values': u'\u4fdd\u5b58\u6210\u529f'}}}},
+            {'item': {'attrs': {}, 'values': {'demo': {'attrs': {}, 'values': {'foo': {'attrs': {}, 'values': 'foo'}}}}}}
+        ]
+        records = lazyxml.iterload(io.BytesIO(xml), 'root/item', unescape=True,
+                                   strip_root=False, strip_attr=False)
+        self.assertEqual(list(records), a)
+        records = lazyxml.iterload(io.BytesIO(xml), 'root/item', unescape=False)
+        self.assertEqual(list(records), [{'name': u'\u4fdd\u5b58\u6210\u529f'}, {}])
+
+    def test_iterload_incremental(self):
+        def chunks():
+            yield '<catalog><item><id>1</id></item>'
+            yield '<item><id>2</id></item>'
+            raise AssertionError('read too much')
+
+        class Reader(object):
+            def __init__(self):
+                self.chunks = chunks()
+
+            def read(self, size):
+                return next(self.chunks)
+
+        records = lazyxml.iterload(Reader(), 'catalog/item')
+        self.assertEqual(next(records), {'id': '1'})
+        self.assertEqual(next(records), {'id': '2'})
+
 
 if __name__ == '__main__':
     unittest.main()